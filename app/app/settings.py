@@ -51,9 +51,12 @@ INSTALLED_APPS = [
     "core",
     "user",
     "recipe",
+    "benchmark",
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -97,6 +100,56 @@ DATABASES = {
     }
 }
 
+# Optional read replica of the default database (see core/routers.py).
+# Safe requests read from it, except for clients that wrote less than
+# STICKY_SECONDS ago.
+DATABASE_REPLICA = {
+    "ALIAS": None,
+    "STICKY_SECONDS": int(os.environ.get("DB_REPLICA_STICKY_SECONDS", 5)),
+    "STICKY_COOKIE": "db_primary_until",
+    # Cache pinning users who wrote to the primary; must be shared by all
+    # workers (checked at startup when a replica is configured)
+    "STICKY_CACHE": os.environ.get("DB_REPLICA_STICKY_CACHE", "recipe"),
+}
+if os.environ.get("DB_REPLICA_HOST"):
+    DATABASE_REPLICA["ALIAS"] = "replica"
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.environ.get("DB_REPLICA_HOST"),
+        "USER": os.environ.get(
+            "DB_REPLICA_USER", DATABASES["default"]["USER"]
+        ),
+        "PASSWORD": os.environ.get(
+            "DB_REPLICA_PASS", DATABASES["default"]["PASSWORD"]
+        ),
+        # Tests read the default database through this alias
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The local memory backend evicts least recently used entries once
+# MAX_ENTRIES is reached; point RECIPE_CACHE_BACKEND at a shared cache
+# (e.g. memcached) to share responses between workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "recipe": {
+        "BACKEND": os.environ.get(
+            "RECIPE_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("RECIPE_CACHE_LOCATION", "recipe"),
+        "TIMEOUT": int(os.environ.get("RECIPE_CACHE_TIMEOUT", 300)),
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -144,6 +197,20 @@ MEDIA_ROOT = "/vol/web/media"
 # 127.0.0.1:8000/media/ --> map to media directory
 # media 파일을 upload 했을 때 accessible URL을 통해 web server에서 파일을 가져옴
 
+# Recipe image processing (see recipe/images.py)
+RECIPE_IMAGE = {
+    # name: bounding box of the rendition
+    "RENDITIONS": {
+        "thumb": (200, 200),
+        "medium": (800, 800),
+        "large": (1600, 1600),
+    },
+    "FORMATS": ["JPEG", "WEBP"],
+    "QUALITY": 85,
+    # Seconds after which jobs claimed by a dead worker are claimed again
+    "CLAIM_TIMEOUT": int(os.environ.get("RECIPE_IMAGE_CLAIM_TIMEOUT", 900)),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -158,6 +225,53 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Render and parse API JSON with orjson when installed (core/renderers.py)
+FAST_JSON = bool(int(os.environ.get("FAST_JSON", 1)))
+if FAST_JSON:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ]
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = [
+        "core.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ]
+
+# Prometheus endpoint of core.middleware.RequestMetricsMiddleware; when
+# TOKEN is set scrapers must send "Authorization: Bearer <TOKEN>",
+# otherwise only logged in staff users can read it
+METRICS = {
+    "TOKEN": os.environ.get("METRICS_TOKEN", ""),
+}
+
+# Per-user versioned response cache of the recipe API
+RECIPE_RESPONSE_CACHE = {
+    "CACHE_ALIAS": "recipe",
+    "ENABLED": bool(int(os.environ.get("RECIPE_CACHE_ENABLED", 1))),
+}
+
+# Render recipe lists from values() rows (see recipe/fastpath.py)
+RECIPE_FAST_LIST = bool(int(os.environ.get("RECIPE_FAST_LIST", 1)))
+
+# Tag/ingredient name suggestions (see recipe/suggest.py)
+RECIPE_SUGGEST = {
+    "DEFAULT_LIMIT": 10,
+    "MAX_LIMIT": 50,
+    # Users with a cached prefix trie per process
+    "TRIE_MAX_USERS": int(os.environ.get("RECIPE_SUGGEST_TRIE_USERS", 256)),
+    # Users owning more names are always answered by the database
+    "TRIE_MAX_NAMES": 10000,
+    # Names held in the tries of all users of a process
+    "TRIE_MAX_TOTAL_NAMES": int(
+        os.environ.get("RECIPE_SUGGEST_TRIE_NAMES", 100000)
+    ),
+    # Entries kept per trie node; larger limits query the database
+    "TRIE_DEPTH": 10,
+    # Lookups before a user's names are loaded into a trie
+    "TRIE_HOT_AFTER": 3,
+}
+
 SPECTACULAR_SETTINGS = {
     "COMPONENT_SPLIT_REQUEST": True,
 }
@@ -168,4 +282,10 @@ AUTH_TOKEN = {
     "AUTH_COOKIE_SECURE": False,
     "AUTH_COOKIE_HTTP_ONLY": True,
     "AUTH_COOKIE_SAMESITE": "Lax",
+    # token -> user lookup cache (see user/cache.py)
+    "CACHE_TTL": int(os.environ.get("AUTH_TOKEN_CACHE_TTL", 60)),
+    "CACHE_MAX_ENTRIES": 10000,
+    "SHARED_CACHE_ALIAS": os.environ.get("AUTH_TOKEN_SHARED_CACHE"),
+    # Seconds between checks for invalidations by other workers
+    "GENERATION_CHECK_INTERVAL": 1,
 }
@@ -0,0 +1,125 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from benchmark import report
+from benchmark.runner import run_workload
+from benchmark.seed import delete_seeded_users, seed_users
+from benchmark.transport import InProcessServer, UWSGIServer
+from benchmark.workloads import WORKLOADS
+
+
+# Options recorded with a saved baseline
+RUN_OPTIONS = (
+    "users",
+    "recipes",
+    "tags",
+    "ingredients",
+    "per_recipe",
+    "seed",
+    "workload",
+    "requests",
+    "concurrency",
+    "transport",
+    "uwsgi_workers",
+)
+
+
+class Command(BaseCommand):
+    """Django command to load test the API with a scripted workload
+
+    Seeds N users x M recipes (committed, so a uWSGI server can read
+    them), runs a weighted workload in-process or against a local uWSGI
+    socket and reports latency percentiles, queries per request and
+    throughput. With --baseline the run fails on regressions.
+    """
+
+    help = "Run a reproducible load test against the recipe API"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--tags", type=int, default=50)
+        parser.add_argument("--ingredients", type=int, default=200)
+        parser.add_argument("--per-recipe", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--workload", choices=sorted(WORKLOADS), default="mixed"
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--transport", choices=["inprocess", "uwsgi"], default="inprocess"
+        )
+        parser.add_argument("--uwsgi-workers", type=int, default=4)
+        parser.add_argument(
+            "--baseline", help="Fail on regressions against this JSON file"
+        )
+        parser.add_argument(
+            "--save-baseline", help="Write the results to this JSON file"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed latency/throughput regression ratio",
+        )
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Keep the seeded users after the run",
+        )
+
+    def handle(self, *args, **options):
+        delete_seeded_users()
+        with transaction.atomic():
+            seeded = seed_users(
+                options["users"],
+                options["recipes"],
+                options["tags"],
+                options["ingredients"],
+                options["per_recipe"],
+                options["seed"],
+            )
+        self.stdout.write(
+            f"Seeded {options['users']} users x {options['recipes']} recipes"
+        )
+
+        if options["transport"] == "uwsgi":
+            server = UWSGIServer(workers=options["uwsgi_workers"])
+        else:
+            server = InProcessServer()
+        try:
+            with server:
+                summary = run_workload(
+                    server,
+                    seeded,
+                    WORKLOADS[options["workload"]],
+                    options["requests"],
+                    options["concurrency"],
+                    options["seed"],
+                )
+        finally:
+            if not options["keep_data"]:
+                delete_seeded_users()
+
+        for line in report.format_table(summary):
+            self.stdout.write(line)
+        if options["save_baseline"]:
+            report.save_baseline(
+                options["save_baseline"],
+                summary,
+                {name: options[name] for name in RUN_OPTIONS},
+            )
+            self.stdout.write(f"Saved baseline {options['save_baseline']}")
+        if options["baseline"]:
+            regressions = report.compare(
+                summary,
+                report.load_baseline(options["baseline"]),
+                options["tolerance"],
+            )
+            if regressions:
+                raise CommandError(
+                    "Regressions against the baseline:\n"
+                    + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions"))
@@ -0,0 +1,126 @@
+"""
+Latency/query summaries of benchmark runs and baseline comparison.
+"""
+import json
+import math
+import re
+
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def queries_from_server_timing(header):
+    """Return the SQL query count reported in a Server-Timing header"""
+    match = SERVER_TIMING_QUERIES.search(header or "")
+    return int(match.group(1)) if match else None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """Summarize (operation, seconds, queries, ok) samples per operation
+
+    Latencies are in milliseconds, throughput in requests per second.
+    """
+    by_operation = {}
+    for operation, seconds, queries, ok in samples:
+        by_operation.setdefault(operation, []).append((seconds, queries, ok))
+    by_operation["all"] = [sample[1:] for sample in samples]
+
+    summary = {}
+    for operation, rows in sorted(by_operation.items()):
+        latencies = [seconds * 1000 for seconds, _, _ in rows]
+        queries = [count for _, count, _ in rows if count is not None]
+        summary[operation] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, _, ok in rows if not ok),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "queries_per_request": (
+                sum(queries) / len(queries) if queries else None
+            ),
+            "throughput_rps": len(rows) / elapsed if elapsed else None,
+        }
+    return summary
+
+
+def compare(summary, baseline, tolerance=0.2):
+    """Return the regressions of a summary against a baseline
+
+    Latency may grow and throughput shrink by ``tolerance`` (a ratio);
+    query counts are deterministic and may not grow at all.
+    """
+    regressions = []
+    for operation, expected in baseline.items():
+        actual = summary.get(operation)
+        if actual is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if actual[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{operation} {metric}: {actual[metric]:.2f} > "
+                    f"{expected[metric]:.2f}"
+                )
+        if (
+            expected["queries_per_request"] is not None
+            and actual["queries_per_request"] is not None
+            and actual["queries_per_request"]
+            > expected["queries_per_request"] + 1e-9
+        ):
+            regressions.append(
+                f"{operation} queries_per_request: "
+                f"{actual['queries_per_request']:.2f} > "
+                f"{expected['queries_per_request']:.2f}"
+            )
+        if actual["throughput_rps"] < expected["throughput_rps"] * (
+            1 - tolerance
+        ):
+            regressions.append(
+                f"{operation} throughput_rps: "
+                f"{actual['throughput_rps']:.1f} < "
+                f"{expected['throughput_rps']:.1f}"
+            )
+        if actual["errors"] > expected["errors"]:
+            regressions.append(
+                f"{operation} errors: {actual['errors']} > "
+                f"{expected['errors']}"
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as stream:
+        return json.load(stream)["summary"]
+
+
+def save_baseline(path, summary, options):
+    with open(path, "w") as stream:
+        json.dump({"options": options, "summary": summary}, stream, indent=2)
+        stream.write("\n")
+
+
+def format_table(summary):
+    """Render a summary as aligned text lines"""
+    header = (
+        f"{'operation':<14}{'requests':>9}{'errors':>7}{'p50 ms':>9}"
+        f"{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'req/s':>9}"
+    )
+    lines = [header]
+    for operation, row in summary.items():
+        queries = row["queries_per_request"]
+        lines.append(
+            f"{operation:<14}{row['requests']:>9}{row['errors']:>7}"
+            f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+            f"{row['p99_ms']:>9.2f}"
+            f"{'-' if queries is None else f'{queries:.1f}':>9}"
+            f"{row['throughput_rps']:>9.1f}"
+        )
+    return lines
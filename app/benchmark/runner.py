@@ -0,0 +1,84 @@
+"""
+Run a weighted workload with a fixed number of concurrent workers.
+
+The operations of every worker are drawn up front from a generator
+seeded with the run seed, so repeated runs send the same requests.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+from benchmark.report import queries_from_server_timing, summarize
+from benchmark.workloads import OPERATIONS, VirtualUser
+
+
+def plan_operations(weights, count, rng):
+    """Return ``count`` operation names drawn with the given weights"""
+    names = sorted(weights)
+    return rng.choices(names, [weights[name] for name in names], k=count)
+
+
+def _run_worker(users, operations, rng):
+    samples = []
+    for index, name in enumerate(operations):
+        user = users[index % len(users)]
+        start = time.perf_counter()
+        response, expected_status = OPERATIONS[name](user, rng)
+        elapsed = time.perf_counter() - start
+        samples.append(
+            (
+                name,
+                elapsed,
+                queries_from_server_timing(response.server_timing),
+                response.status == expected_status,
+            )
+        )
+    return samples
+
+
+def _run_worker_thread(args):
+    try:
+        return _run_worker(*args)
+    finally:
+        # In-process requests open a database connection per thread
+        connections.close_all()
+
+
+def run_workload(
+    server, seeded_users, weights, requests, concurrency=1, seed=0
+):
+    """Send a workload through ``server`` and summarize the results"""
+    rng = random.Random(seed)
+    operations = plan_operations(weights, requests, rng)
+    workers = []
+    for worker in range(concurrency):
+        users = [
+            VirtualUser(seeded, server.session())
+            for seeded in seeded_users[worker::concurrency] or seeded_users
+        ]
+        for user in users:
+            response = user.login()
+            if response.status != 200:
+                raise RuntimeError(
+                    f"Login of {user.seeded.email} failed: {response.status}"
+                )
+        workers.append(
+            (
+                users,
+                operations[worker::concurrency],
+                random.Random(f"{seed}-{worker}"),
+            )
+        )
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = [_run_worker(*workers[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_run_worker_thread, workers))
+    elapsed = time.perf_counter() - start
+    return summarize(
+        [sample for samples in results for sample in samples], elapsed
+    )
@@ -0,0 +1,66 @@
+"""
+Deterministic multi-user catalogues for the API benchmark.
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+
+from core.models import RecipeImageJob
+from recipe.search import update_search_vectors
+from recipe.seed import seed_catalogue
+from recipe.stats import rebuild_recipe_stats
+
+
+EMAIL_DOMAIN = "benchmark.local"
+# seed_catalogue creates every user with this password
+PASSWORD = "benchmark"
+
+
+class SeededUser:
+    """Credentials and object ids of one seeded user"""
+
+    def __init__(self, email, tag_ids, ingredient_ids, recipe_ids):
+        self.email = email
+        self.password = PASSWORD
+        self.tag_ids = tag_ids
+        self.ingredient_ids = ingredient_ids
+        self.recipe_ids = recipe_ids
+
+
+def seed_users(users, recipes, tags, ingredients, per_recipe, seed=0):
+    """Create ``users`` users with identical catalogue shapes
+
+    Every user gets its own random generator derived from ``seed``, so
+    the data only depends on the arguments.
+    """
+    seeded = []
+    for index in range(users):
+        rng = random.Random(f"{seed}-{index}")
+        user, tag_ids, ingredient_ids = seed_catalogue(
+            rng,
+            f"user{index}@{EMAIL_DOMAIN}",
+            recipes,
+            tags,
+            ingredients,
+            per_recipe,
+        )
+        recipe_ids = list(user.recipe_set.values_list("id", flat=True))
+        update_search_vectors(user.recipe_set.all())
+        rebuild_recipe_stats([user.pk])
+        seeded.append(
+            SeededUser(user.email, tag_ids, ingredient_ids, recipe_ids)
+        )
+    return seeded
+
+
+def delete_seeded_users():
+    """Remove the benchmark users, their data and queued uploads"""
+    users = get_user_model().objects.filter(
+        email__endswith=f"@{EMAIL_DOMAIN}"
+    )
+    for source in RecipeImageJob.objects.filter(
+        recipe__user__in=users
+    ).values_list("source", flat=True):
+        default_storage.delete(source)
+    users.delete()
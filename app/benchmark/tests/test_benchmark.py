@@ -0,0 +1,134 @@
+"""
+Tests for the API benchmark reports and the benchmark_api command
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from benchmark import report
+
+
+def summary_row(p50, queries, rps, errors=0):
+    return {
+        "requests": 10,
+        "errors": errors,
+        "p50_ms": p50,
+        "p95_ms": p50,
+        "p99_ms": p50,
+        "queries_per_request": queries,
+        "throughput_rps": rps,
+    }
+
+
+class ReportTests(SimpleTestCase):
+    def test_queries_from_server_timing(self):
+        """Test the query count is read from the db metric"""
+        header = 'db;dur=1.20;desc="7 queries", total;dur=3.00'
+
+        self.assertEqual(report.queries_from_server_timing(header), 7)
+        self.assertIsNone(report.queries_from_server_timing(""))
+
+    def test_percentile_nearest_rank(self):
+        """Test percentiles use the nearest rank"""
+        values = list(range(1, 101))
+
+        self.assertEqual(report.percentile(values, 50), 50)
+        self.assertEqual(report.percentile(values, 99), 99)
+        self.assertEqual(report.percentile([3], 95), 3)
+        self.assertIsNone(report.percentile([], 50))
+
+    def test_summarize(self):
+        """Test samples are summarized per operation and overall"""
+        samples = [
+            ("list", 0.010, 2, True),
+            ("list", 0.030, 2, True),
+            ("create", 0.020, 10, False),
+        ]
+
+        summary = report.summarize(samples, elapsed=2)
+
+        self.assertEqual(summary["all"]["requests"], 3)
+        self.assertEqual(summary["all"]["errors"], 1)
+        self.assertEqual(summary["all"]["throughput_rps"], 1.5)
+        self.assertAlmostEqual(summary["list"]["p99_ms"], 30)
+        self.assertEqual(summary["create"]["queries_per_request"], 10)
+
+    def test_compare_within_tolerance(self):
+        """Test small latency changes are not regressions"""
+        baseline = {"all": summary_row(10, 3, 100)}
+        summary = {"all": summary_row(11.5, 3, 90)}
+
+        self.assertEqual(report.compare(summary, baseline, 0.2), [])
+
+    def test_compare_regressions(self):
+        """Test slower, chattier or failing runs are regressions"""
+        baseline = {"all": summary_row(10, 3, 100)}
+        summary = {"all": summary_row(13, 4, 70, errors=1)}
+
+        regressions = report.compare(summary, baseline, 0.2)
+
+        metrics = [line.split(":")[0] for line in regressions]
+        self.assertEqual(
+            metrics,
+            [
+                "all p50_ms",
+                "all p95_ms",
+                "all p99_ms",
+                "all queries_per_request",
+                "all throughput_rps",
+                "all errors",
+            ],
+        )
+
+
+class BenchmarkCommandTests(TestCase):
+    def call(self, *args):
+        out = StringIO()
+        call_command(
+            "benchmark_api",
+            "--users=2",
+            "--recipes=5",
+            "--tags=3",
+            "--ingredients=4",
+            "--per-recipe=2",
+            "--requests=30",
+            "--concurrency=1",
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_mixed_workload_in_process(self):
+        """Test every operation of the mixed workload succeeds"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+
+            self.call("--workload=mixed", f"--save-baseline={path}")
+
+            with open(path) as stream:
+                summary = json.load(stream)["summary"]
+        self.assertEqual(summary["all"]["requests"], 30)
+        self.assertEqual(summary["all"]["errors"], 0)
+        for row in summary.values():
+            self.assertIsNotNone(row["queries_per_request"])
+        self.assertFalse(
+            get_user_model()
+            .objects.filter(email__endswith="@benchmark.local")
+            .exists()
+        )
+
+    def test_baseline_regressions_fail(self):
+        """Test a run slower than the baseline raises an error"""
+        baseline = {"all": summary_row(0.001, 0, 10 ** 6)}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            report.save_baseline(path, baseline, {})
+
+            with self.assertRaisesMessage(CommandError, "all p50_ms"):
+                self.call("--workload=read", f"--baseline={path}")
@@ -0,0 +1,195 @@
+"""
+Ways of sending benchmark requests to the app.
+
+Sessions behave like a browser: they keep the cookies set by the login
+view (auth token and CSRF token) and send the CSRF header on writes.
+"""
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.test import Client
+from django.test.utils import override_settings
+
+
+class Response:
+    """Status, Server-Timing header and body of a benchmark request"""
+
+    def __init__(self, status, server_timing, body):
+        self.status = status
+        self.server_timing = server_timing or ""
+        self.body = body
+
+
+class BaseSession:
+    def csrf_headers(self):
+        token = self.cookies.get("csrftoken")
+        return {"X-CSRFToken": token} if token else {}
+
+    def request(self, method, path, body=b"", content_type=None):
+        raise NotImplementedError
+
+
+class InProcessSession(BaseSession):
+    """Call the WSGI app in this process through Django's test client"""
+
+    def __init__(self):
+        self.client = Client(enforce_csrf_checks=True)
+
+    @property
+    def cookies(self):
+        return {
+            key: morsel.value for key, morsel in self.client.cookies.items()
+        }
+
+    def request(self, method, path, body=b"", content_type=None):
+        headers = {
+            "HTTP_" + name.upper().replace("-", "_"): value
+            for name, value in self.csrf_headers().items()
+        }
+        response = self.client.generic(
+            method,
+            path,
+            body,
+            content_type=content_type or "application/octet-stream",
+            **headers,
+        )
+        content = (
+            b"".join(response.streaming_content)
+            if response.streaming
+            else response.content
+        )
+        return Response(
+            response.status_code, response.get("Server-Timing"), content
+        )
+
+
+class InProcessServer:
+    """Serve benchmark sessions from the WSGI app of this process"""
+
+    def __enter__(self):
+        # The test client sends requests for the "testserver" host
+        self.settings = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        )
+        self.settings.enable()
+        return self
+
+    def session(self):
+        return InProcessSession()
+
+    def __exit__(self, *exc_info):
+        self.settings.disable()
+
+
+class HTTPSession(BaseSession):
+    """Send requests over HTTP with one connection per request
+
+    uWSGI's HTTP socket closes the connection after every response
+    without saying so; closing it here makes http.client reconnect.
+    """
+
+    def __init__(self, host, port):
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+
+    def request(self, method, path, body=b"", content_type=None):
+        headers = {**self.csrf_headers(), "Connection": "close"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(
+                f"{key}={value}" for key, value in self.cookies.items()
+            )
+        if content_type:
+            headers["Content-Type"] = content_type
+        self.connection.request(method, path, body or None, headers)
+        response = self.connection.getresponse()
+        content = response.read()
+        self.connection.close()
+        for header in response.headers.get_all("Set-Cookie") or []:
+            cookie = SimpleCookie(header)
+            self.cookies.update(
+                (key, morsel.value) for key, morsel in cookie.items()
+            )
+        return Response(
+            response.status, response.getheader("Server-Timing"), content
+        )
+
+    def close(self):
+        self.connection.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class UWSGIServer:
+    """Run the app under a local uWSGI HTTP socket for the benchmark"""
+
+    def __init__(self, workers=4, threads=1, port=None):
+        self.workers = workers
+        self.threads = threads
+        self.port = port or free_port()
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [
+                "uwsgi",
+                "--http-socket",
+                f"127.0.0.1:{self.port}",
+                "--module",
+                "app.wsgi",
+                "--master",
+                "--workers",
+                str(self.workers),
+                "--threads",
+                str(self.threads),
+                "--enable-threads",
+                "--die-on-term",
+                "--disable-logging",
+            ],
+            cwd=settings.BASE_DIR,
+            env=self._environ(),
+            stdout=subprocess.DEVNULL,
+            stderr=sys.stderr,
+        )
+        self._wait_until_ready()
+        return self
+
+    def _environ(self):
+        env = os.environ.copy()
+        env["ALLOWED_HOSTS"] = ",".join(
+            filter(None, [env.get("ALLOWED_HOSTS"), "127.0.0.1"])
+        )
+        return env
+
+    def _wait_until_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("uWSGI exited during startup")
+            try:
+                connection = http.client.HTTPConnection(
+                    "127.0.0.1", self.port, timeout=1
+                )
+                connection.request("GET", "/api/health-check")
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("uWSGI did not start in time")
+
+    def session(self):
+        return HTTPSession("127.0.0.1", self.port)
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait(timeout=30)
@@ -0,0 +1,124 @@
+"""
+Scripted operations and weighted workload mixes for the API benchmark.
+
+Every operation takes a VirtualUser and a random generator and sends
+one request through the user's session; the expected status decides
+whether the request counts as an error.
+"""
+import io
+import json
+
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from PIL import Image
+
+
+class VirtualUser:
+    """A seeded user driving requests through one session"""
+
+    def __init__(self, seeded, session):
+        self.seeded = seeded
+        self.session = session
+        self.recipe_ids = list(seeded.recipe_ids)
+
+    def login(self):
+        return self.session.request(
+            "POST",
+            reverse("user:login"),
+            json.dumps(
+                {
+                    "email": self.seeded.email,
+                    "password": self.seeded.password,
+                }
+            ),
+            "application/json",
+        )
+
+
+def _sample(rng, ids, count):
+    return rng.sample(ids, min(count, len(ids)))
+
+
+def list_recipes(user, rng):
+    return user.session.request("GET", reverse("recipe:recipe-list")), 200
+
+
+def filtered_list_recipes(user, rng):
+    tags = ",".join(map(str, _sample(rng, user.seeded.tag_ids, 2)))
+    ingredients = ",".join(
+        map(str, _sample(rng, user.seeded.ingredient_ids, 1))
+    )
+    path = (
+        f"{reverse('recipe:recipe-list')}"
+        f"?tags={tags}&ingredients={ingredients}"
+    )
+    return user.session.request("GET", path), 200
+
+
+def recipe_detail(user, rng):
+    path = reverse("recipe:recipe-detail", args=[rng.choice(user.recipe_ids)])
+    return user.session.request("GET", path), 200
+
+
+def create_recipe(user, rng):
+    payload = {
+        "title": f"Benchmark recipe {rng.randrange(10 ** 6)}",
+        "time_minutes": rng.randint(5, 180),
+        "price": f"{rng.randint(100, 9999) / 100:.2f}",
+        "tags": _sample(rng, user.seeded.tag_ids, 3),
+        "ingredients": _sample(rng, user.seeded.ingredient_ids, 5),
+    }
+    response = user.session.request(
+        "POST",
+        reverse("recipe:recipe-list"),
+        json.dumps(payload),
+        "application/json",
+    )
+    if response.status == 201:
+        user.recipe_ids.append(json.loads(response.body)["id"])
+    return response, 201
+
+
+def _sample_jpeg(rng):
+    buffer = io.BytesIO()
+    color = tuple(rng.randrange(256) for _ in range(3))
+    Image.new("RGB", (64, 64), color).save(buffer, format="JPEG")
+    buffer.name = "benchmark.jpg"
+    buffer.seek(0)
+    return buffer
+
+
+def upload_image(user, rng):
+    path = reverse(
+        "recipe:recipe-upload-image", args=[rng.choice(user.recipe_ids)]
+    )
+    body = encode_multipart(BOUNDARY, {"image": _sample_jpeg(rng)})
+    return user.session.request("POST", path, body, MULTIPART_CONTENT), 202
+
+
+def login(user, rng):
+    return user.login(), 200
+
+
+OPERATIONS = {
+    "list": list_recipes,
+    "filtered_list": filtered_list_recipes,
+    "detail": recipe_detail,
+    "create": create_recipe,
+    "upload_image": upload_image,
+    "login": login,
+}
+
+# Workload name -> operation weights
+WORKLOADS = {
+    "mixed": {
+        "list": 30,
+        "filtered_list": 20,
+        "detail": 30,
+        "create": 10,
+        "upload_image": 5,
+        "login": 5,
+    },
+    "read": {"list": 40, "filtered_list": 30, "detail": 30},
+    "write": {"create": 70, "upload_image": 20, "login": 10},
+}
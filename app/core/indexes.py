@@ -0,0 +1,100 @@
+"""
+Helpers for migrations building indexes with CREATE INDEX CONCURRENTLY.
+
+A concurrent build that fails (a lock timeout, or duplicates for a
+unique index) leaves an INVALID index behind, which ``IF NOT EXISTS``
+then skips on the next run. Migrations drop such leftovers with
+drop_invalid_index right before building an index.
+"""
+from django.db import migrations
+
+
+# Merge tags/ingredients sharing a user and lowercased name into the
+# oldest one, moving their recipe links (migrations 0014 and 0015)
+MERGE_DUPLICATE_TAGS = """
+CREATE TEMPORARY TABLE core_tag_merge ON COMMIT DROP AS
+SELECT id, keep_id FROM (
+    SELECT id, min(id) OVER (PARTITION BY user_id, lower(name)) AS keep_id
+    FROM core_tag
+) ranked
+WHERE id <> keep_id;
+INSERT INTO core_recipe_tags (recipe_id, tag_id)
+SELECT l.recipe_id, m.keep_id
+FROM core_recipe_tags l JOIN core_tag_merge m ON m.id = l.tag_id
+ON CONFLICT DO NOTHING;
+DELETE FROM core_recipe_tags l USING core_tag_merge m WHERE l.tag_id = m.id;
+DELETE FROM core_tag t USING core_tag_merge m WHERE t.id = m.id;
+UPDATE core_tag t SET recipe_count = (
+    SELECT count(*) FROM core_recipe_tags l WHERE l.tag_id = t.id
+)
+WHERE t.id IN (SELECT keep_id FROM core_tag_merge);
+"""
+
+MERGE_DUPLICATE_INGREDIENTS = """
+CREATE TEMPORARY TABLE core_ingredient_merge ON COMMIT DROP AS
+SELECT id, keep_id FROM (
+    SELECT id, min(id) OVER (PARTITION BY user_id, lower(name)) AS keep_id
+    FROM core_ingredient
+) ranked
+WHERE id <> keep_id;
+INSERT INTO core_recipe_ingredients (recipe_id, ingredient_id)
+SELECT l.recipe_id, m.keep_id
+FROM core_recipe_ingredients l
+JOIN core_ingredient_merge m ON m.id = l.ingredient_id
+ON CONFLICT DO NOTHING;
+DELETE FROM core_recipe_ingredients l USING core_ingredient_merge m
+WHERE l.ingredient_id = m.id;
+DELETE FROM core_ingredient t USING core_ingredient_merge m WHERE t.id = m.id;
+UPDATE core_ingredient t SET recipe_count = (
+    SELECT count(*) FROM core_recipe_ingredients l WHERE l.ingredient_id = t.id
+)
+WHERE t.id IN (SELECT keep_id FROM core_ingredient_merge);
+"""
+
+
+def _drop_if_invalid(name):
+    def forwards(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor != "postgresql":
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indisvalid FROM pg_index "
+                "WHERE indexrelid = to_regclass(%s)",
+                [name],
+            )
+            row = cursor.fetchone()
+            if row is not None and not row[0]:
+                cursor.execute(
+                    "DROP INDEX CONCURRENTLY "
+                    + connection.ops.quote_name(name)
+                )
+
+    return forwards
+
+
+def drop_invalid_index(name):
+    """Operation dropping index ``name`` if a failed build left it INVALID
+
+    Must run in a non-atomic migration, like the build itself.
+    """
+    return migrations.RunPython(
+        _drop_if_invalid(name), migrations.RunPython.noop
+    )
+
+
+def _merge_duplicate_names(apps, schema_editor):
+    schema_editor.execute(
+        MERGE_DUPLICATE_TAGS + MERGE_DUPLICATE_INGREDIENTS, params=None
+    )
+
+
+def merge_duplicate_names():
+    """Operation merging duplicate names in its own transaction
+
+    Lets non-atomic migrations merge names written since 0014 right
+    before building the unique name indexes.
+    """
+    return migrations.RunPython(
+        _merge_duplicate_names, migrations.RunPython.noop, atomic=True
+    )
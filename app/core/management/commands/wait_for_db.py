@@ -2,13 +2,13 @@ import time
 
 from psycopg2 import OperationalError as Psycopg2_OpError
 
-# from django.db import connections
+from django.db import connections
 from django.db.utils import OperationalError
 from django.core.management.base import BaseCommand
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until db is available"""
+    """Django command to pause execution until every db is available"""
 
     def handle(self, *args, **options):
         self.stdout.write("Waiting for database...")
@@ -18,7 +18,7 @@ class Command(BaseCommand):
             # while not db_conn:
             try:
                 # db_conn = connections["default"]
-                self.check(databases=["default"])
+                self.check(databases=list(connections))
                 db_check = True
             except (Psycopg2_OpError, OperationalError):
                 self.stdout.write("Database unavailable, waiting 1 second...")
@@ -0,0 +1,234 @@
+"""
+In-process request metrics in the Prometheus text format.
+
+RequestMetricsMiddleware (core/middleware.py) times every request, its
+SQL queries and the sections wrapped in ``timed()`` (e.g. serializers)
+and observes them into the histograms below, labelled with the resolved
+view name. Every worker process keeps its own histograms; Prometheus
+tells the scraped processes apart by instance.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+class Histogram:
+    """Cumulative histogram with one series per label set"""
+
+    def __init__(self, name, documentation, buckets, labelnames=("view",)):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = defaultdict(
+            lambda: [[0] * (len(self.buckets) + 1), 0]
+        )
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series[key]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        """Yield the lines of the exposition format"""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted(
+                (key, list(counts), total)
+                for key, (counts, total) in self._series.items()
+            )
+        for key, counts, total in series:
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labelnames, key)
+            )
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(bound)
+                yield (
+                    f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}'
+                )
+            yield f"{self.name}_sum{{{labels}}} {_format_value(total)}"
+            yield f"{self.name}_count{{{labels}}} {cumulative}"
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class CallbackMetric:
+    """Counter or gauge read from another component at scrape time
+
+    ``callback`` returns a list of (labels dict, value) samples.
+    """
+
+    def __init__(self, name, documentation, kind, callback):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.callback = callback
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.callback():
+            if labels:
+                formatted = ",".join(
+                    f'{name}="{_escape(label)}"'
+                    for name, label in labels.items()
+                )
+                yield f"{self.name}{{{formatted}}} {_format_value(value)}"
+            else:
+                yield f"{self.name} {_format_value(value)}"
+
+    def clear(self):
+        pass
+
+
+class Registry:
+    """The metrics exposed on the metrics endpoint"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, *args, **kwargs):
+        histogram = Histogram(*args, **kwargs)
+        self.metrics.append(histogram)
+        return histogram
+
+    def callback(self, name, documentation, kind, callback):
+        """Register a counter or gauge collected from ``callback``"""
+        metric = CallbackMetric(name, documentation, kind, callback)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = [line for metric in self.metrics for line in metric.collect()]
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Wall time of requests.",
+    LATENCY_BUCKETS,
+    labelnames=("view", "method"),
+)
+DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries",
+    "SQL queries run per request.",
+    QUERY_BUCKETS,
+)
+DB_DURATION = REGISTRY.histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL queries per request.",
+    LATENCY_BUCKETS,
+)
+SERIALIZER_DURATION = REGISTRY.histogram(
+    "http_request_serializer_duration_seconds",
+    "Time spent serializing response data per request.",
+    LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = REGISTRY.histogram(
+    "http_response_size_bytes",
+    "Size of non-streaming response bodies.",
+    SIZE_BUCKETS,
+)
+
+
+class RequestTimings:
+    """Query counts and section durations of one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.durations = defaultdict(float)
+        self._active = set()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook timing every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations["db"] += time.perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self, total):
+        """Return the value of a Server-Timing header"""
+        return ", ".join(
+            [
+                f'db;dur={self.durations["db"] * 1000:.2f};'
+                f'desc="{self.queries} queries"',
+                *(
+                    f"{section};dur={duration * 1000:.2f}"
+                    for section, duration in self.durations.items()
+                    if section != "db"
+                ),
+                f"total;dur={total * 1000:.2f}",
+            ]
+        )
+
+
+current_timings = ContextVar("current_timings", default=None)
+
+
+@contextmanager
+def timed(section):
+    """Add the time spent in a block to a section of the request
+
+    Nested blocks of the same section are only counted once.
+    """
+    timings = current_timings.get()
+    if timings is None or section in timings._active:
+        yield
+        return
+
+    timings._active.add(section)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[section] += time.perf_counter() - start
+        timings._active.discard(section)
+
+
+class TimedSerializerMixin:
+    """Count the time spent building ``serializer.data``"""
+
+    @property
+    def data(self):
+        with timed("serializer"):
+            return super().data
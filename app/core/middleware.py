@@ -0,0 +1,98 @@
+"""
+Request level instrumentation and database routing.
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics, routers
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Methods labelled as themselves; any other is counted as "other", so
+# clients cannot create metric series at will
+METRIC_METHODS = frozenset(
+    ("GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE")
+)
+
+
+class RequestMetricsMiddleware:
+    """Measure wall time, SQL and serializer time and response size
+
+    The numbers are observed into the histograms of core.metrics per
+    resolved view name (e.g. ``recipe:recipe-list``) and returned to the
+    client in a Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = metrics.RequestTimings()
+        token = metrics.current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.current_timings.reset(token)
+        total = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        method = request.method
+        if method not in METRIC_METHODS:
+            method = "other"
+        metrics.REQUEST_DURATION.observe(total, view=view, method=method)
+        metrics.DB_QUERIES.observe(timings.queries, view=view)
+        metrics.DB_DURATION.observe(timings.durations["db"], view=view)
+        metrics.SERIALIZER_DURATION.observe(
+            timings.durations["serializer"], view=view
+        )
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view=view)
+        response["Server-Timing"] = timings.server_timing(total)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Let safe requests read from the replica, unsafe ones pin the client
+
+    Does nothing unless a replica alias is configured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        alias = routers.replica_alias()
+        if alias is None:
+            return self.get_response(request)
+
+        readable = (
+            request.method in SAFE_METHODS
+            and routers.sticky_until(request) <= time.time()
+        )
+        token = routers.read_alias.set(alias if readable else None)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.read_alias.reset(token)
+
+        if request.method not in SAFE_METHODS:
+            config = settings.DATABASE_REPLICA
+            response.set_cookie(
+                config["STICKY_COOKIE"],
+                str(time.time() + config["STICKY_SECONDS"]),
+                max_age=config["STICKY_SECONDS"],
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:03
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+from core.indexes import drop_invalid_index
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        drop_invalid_index('core_ingr_user_name_idx'),
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-name'], name='core_ingr_user_name_idx'),
+        ),
+        drop_invalid_index('core_recipe_user_id_idx'),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='core_recipe_user_id_idx'),
+        ),
+        drop_invalid_index('core_tag_user_name_idx'),
+        AddIndexConcurrently(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name'], name='core_tag_user_name_idx'),
+        ),
+        drop_invalid_index('core_recipe_tags_tag_recipe_idx'),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS core_recipe_tags_tag_recipe_idx ON core_recipe_tags (tag_id, recipe_id);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS core_recipe_tags_tag_recipe_idx;',
+        ),
+        drop_invalid_index('core_recipe_ingr_ingr_recipe_idx'),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS core_recipe_ingr_ingr_recipe_idx ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS core_recipe_ingr_ingr_recipe_idx;',
+        ),
+    ]
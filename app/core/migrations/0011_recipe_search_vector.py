@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:15
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from core.indexes import drop_invalid_index
+
+
+POPULATE_SEARCH_VECTOR = """
+UPDATE core_recipe r SET search_vector =
+    setweight(to_tsvector('english', coalesce(r.title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM core_recipe_tags rt JOIN core_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = r.id
+    ), '')), 'B')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM core_recipe_ingredients ri
+        JOIN core_ingredient i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id
+    ), '')), 'B');
+"""
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql=POPULATE_SEARCH_VECTOR,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        drop_invalid_index('core_recipe_search_idx'),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS core_recipe_search_idx ON core_recipe USING gin (search_vector);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS core_recipe_search_idx;',
+        ),
+    ]
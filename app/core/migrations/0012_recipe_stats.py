@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_recipe_links(apps, schema_editor):
+    """Populate recipe_count; RecipeStats rows are built on first read"""
+    Recipe = apps.get_model("core", "Recipe")
+    for model_name, field in (("Tag", "tags"), ("Ingredient", "ingredients")):
+        model = apps.get_model("core", model_name)
+        column = f"{model_name.lower()}_id"
+        counts = (
+            getattr(Recipe, field).through.objects.filter(
+                **{column: OuterRef("pk")}
+            )
+            .order_by()
+            .values(column)
+            .annotate(count=Count("*"))
+            .values("count")
+        )
+        model.objects.update(
+            recipe_count=Coalesce(Subquery(counts), Value(0))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to='core.user')),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('total_time_minutes', models.BigIntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_recipe_links, migrations.RunPython.noop),
+    ]
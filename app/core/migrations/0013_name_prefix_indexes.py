@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:50
+
+from django.db import migrations
+
+from core.indexes import drop_invalid_index
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_recipe_stats'),
+    ]
+
+    operations = [
+        drop_invalid_index('core_tag_user_lower_name_idx'),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS core_tag_user_lower_name_idx ON core_tag (user_id, lower(name) text_pattern_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS core_tag_user_lower_name_idx;',
+        ),
+        drop_invalid_index('core_ingr_user_lower_name_idx'),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS core_ingr_user_lower_name_idx ON core_ingredient (user_id, lower(name) text_pattern_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS core_ingr_user_lower_name_idx;',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:05
+
+from django.db import migrations
+
+from core.indexes import MERGE_DUPLICATE_INGREDIENTS, MERGE_DUPLICATE_TAGS
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=MERGE_DUPLICATE_TAGS,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql=MERGE_DUPLICATE_INGREDIENTS,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:05
+
+from django.db import migrations
+
+from core.indexes import drop_invalid_index, merge_duplicate_names
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_merge_duplicate_names'),
+    ]
+
+    # The unique text_pattern_ops indexes also serve the prefix LIKE
+    # queries of recipe.suggest, replacing the plain 0013 indexes
+    operations = [
+        # Merge duplicates written since 0014
+        merge_duplicate_names(),
+        drop_invalid_index('core_tag_user_lower_name_uniq'),
+        migrations.RunSQL(
+            sql='CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS core_tag_user_lower_name_uniq ON core_tag (user_id, lower(name) text_pattern_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS core_tag_user_lower_name_uniq;',
+        ),
+        migrations.RunSQL(
+            sql='DROP INDEX CONCURRENTLY IF EXISTS core_tag_user_lower_name_idx;',
+            reverse_sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS core_tag_user_lower_name_idx ON core_tag (user_id, lower(name) text_pattern_ops);',
+        ),
+        drop_invalid_index('core_ingr_user_lower_name_uniq'),
+        migrations.RunSQL(
+            sql='CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS core_ingr_user_lower_name_uniq ON core_ingredient (user_id, lower(name) text_pattern_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS core_ingr_user_lower_name_uniq;',
+        ),
+        migrations.RunSQL(
+            sql='DROP INDEX CONCURRENTLY IF EXISTS core_ingr_user_lower_name_idx;',
+            reverse_sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS core_ingr_user_lower_name_idx ON core_ingredient (user_id, lower(name) text_pattern_ops);',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_unique_lower_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeimagejob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
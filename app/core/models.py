@@ -1,6 +1,7 @@
 import uuid
 import os
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -8,6 +9,8 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 
+from core.storage import ContentAddressedStorage
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image"""
@@ -64,6 +67,18 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of linked recipes, maintained by recipe.stats
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-name"], name="core_tag_user_name_idx"
+            )
+        ]
+        # Postgres also has a unique (user_id, lower(name)
+        # text_pattern_ops) index, see migration 0015 and recipe.names
 
     def __str__(self):
         return self.name
@@ -76,6 +91,18 @@ class Ingredient(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of linked recipes, maintained by recipe.stats
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-name"], name="core_ingr_user_name_idx"
+            )
+        ]
+        # Postgres also has a unique (user_id, lower(name)
+        # text_pattern_ops) index, see migration 0015 and recipe.names
 
     def __str__(self):
         return self.name
@@ -98,10 +125,125 @@ class Recipe(models.Model):
     """
     ingredients = models.ManyToManyField("Ingredient")
     tags = models.ManyToManyField("Tag")
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage(),
+    )
+    # Size and formats of the renditions stored next to the image
+    image_variants = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Title + tag/ingredient names, maintained by recipe.signals. Its GIN
+    # index lives in migration 0011 so the model stays creatable on SQLite
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-id"], name="core_recipe_user_id_idx"
+            )
+        ]
 
     def __str__(self):
         return self.title
 
 
+class StoredImage(models.Model):
+    """Number of recipes referencing a content-addressed image file"""
+
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
+class RecipeImageJob(models.Model):
+    """Queued processing of an uploaded recipe image"""
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="image_jobs"
+    )
+    # Raw upload, relative to MEDIA_ROOT
+    source = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING, db_index=True
+    )
+    error = models.TextField(blank=True)
+    # When a worker last claimed the job, to requeue abandoned claims
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.recipe} ({self.status})"
+
+
+class RecipeStats(models.Model):
+    """Running totals of a user's recipes, maintained by recipe.stats"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="recipe_stats",
+    )
+    recipe_count = models.IntegerField(default=0)
+    total_time_minutes = models.BigIntegerField(default=0)
+    total_price = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+
+    @property
+    def avg_time_minutes(self):
+        if not self.recipe_count:
+            return None
+        return self.total_time_minutes / self.recipe_count
+
+    @property
+    def avg_price(self):
+        if not self.recipe_count:
+            return None
+        return self.total_price / self.recipe_count
+
+    def __str__(self):
+        return f"{self.user} ({self.recipe_count} recipes)"
+
+
+class ImportCheckpoint(models.Model):
+    """Rows of a source file imported so far, see recipe.importer"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="import_checkpoints",
+    )
+    # Identifies the imported file, by default its absolute path
+    source = models.CharField(max_length=1024)
+    rows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "source"],
+                name="core_importcheckpoint_user_source_uniq",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.source} ({self.rows} rows)"
+
+
 """commit & push를 run test가 성공적으로 pass 할때마다 실행하는 것 추천"""
@@ -0,0 +1,61 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+orjson serializes dicts, lists, datetimes and UUIDs natively; anything
+else (Decimal, lazy strings, querysets...) goes through DRF's encoder so
+the output matches JSONRenderer byte for byte. Without orjson, or when
+indented output is requested (e.g. the browsable API), both classes fall
+back to the stdlib based DRF implementations.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(obj, _encoder=JSONEncoder()):
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Render JSON with orjson, falling back to DRF's JSONRenderer"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+
+        ret = orjson.dumps(
+            data,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+        # Escaped like JSONRenderer, as they are invalid in JavaScript
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """Parse JSON with orjson, falling back to DRF's JSONParser"""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", "utf-8")
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
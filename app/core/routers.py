@@ -0,0 +1,117 @@
+"""
+Read replica routing.
+
+ReplicaRoutingMiddleware marks safe requests (GET, HEAD, OPTIONS) as
+replica readable; ReplicaRouter then sends their reads to the replica
+alias of settings.DATABASE_REPLICA. Everything else (writes, unsafe
+requests, management commands, open transactions) uses ``default``.
+
+A client that wrote recently gets a cookie holding the end of its
+sticky window, and its reads stay on the primary until then, so it
+always reads its own writes despite replication lag. Clients ignoring
+cookies, and the user's other devices, are covered by pin_user, which
+keeps the same window per user in a cache shared by all workers;
+authenticated views honour it with read_primary_if_pinned. Token lookups
+always read from the primary, so a fresh token works at once.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Database alias reads of the current request may use
+read_alias = ContextVar("read_alias", default=None)
+
+
+def replica_alias():
+    """Return the configured replica alias or None"""
+    return settings.DATABASE_REPLICA["ALIAS"]
+
+
+class ReplicaRouter:
+    """Route the reads of replica readable requests to the replica"""
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction must see its writes
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica mirrors the primary, so all objects are related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def sticky_until(request):
+    """Return until when a client must read from the primary"""
+    value = request.COOKIES.get(settings.DATABASE_REPLICA["STICKY_COOKIE"])
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _pin_key(user_id):
+    return f"db:primary:{user_id}"
+
+
+def _pin_cache():
+    return caches[settings.DATABASE_REPLICA["STICKY_CACHE"]]
+
+
+def check_sticky_cache():
+    """Refuse a per-process cache for pins when a replica is configured"""
+    if replica_alias() is None:
+        return
+    alias = settings.DATABASE_REPLICA["STICKY_CACHE"]
+    if isinstance(caches[alias], (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            f"DATABASE_REPLICA['STICKY_CACHE'] must name a cache shared "
+            f"by all workers, {alias!r} is local to each process."
+        )
+
+
+def pin_user(user_id):
+    """Send the reads of a user to the primary for the sticky window"""
+    if replica_alias() is not None:
+        config = settings.DATABASE_REPLICA
+        _pin_cache().set(
+            _pin_key(user_id), True, timeout=config["STICKY_SECONDS"]
+        )
+
+
+def user_pinned(user_id):
+    """Tell whether a user wrote within the sticky window"""
+    if replica_alias() is None:
+        return False
+    return bool(_pin_cache().get(_pin_key(user_id)))
+
+
+def read_primary_if_pinned(user_id):
+    """Read from the primary for the rest of a pinned user's request"""
+    if read_alias.get() is not None and user_pinned(user_id):
+        # ReplicaRoutingMiddleware restores the alias after the request
+        read_alias.set(None)
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads of a block to the primary"""
+    token = read_alias.set(None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
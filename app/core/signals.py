@@ -0,0 +1,69 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.models import Recipe
+from core.storage import acquire_image, release_image
+
+
+@receiver(post_init, sender=Recipe)
+def remember_recipe_image(sender, instance, **kwargs):
+    """Remember the loaded image name to detect changes on save"""
+    if "image" in instance.get_deferred_fields():
+        # Looked up on save if the image gets loaded or assigned
+        instance._stored_image = DEFERRED
+        return
+    value = instance.__dict__.get("image")
+    instance._stored_image = getattr(value, "name", value) or None
+
+
+@receiver(pre_save, sender=Recipe)
+def load_deferred_recipe_image(sender, instance, **kwargs):
+    """Read the stored image name of recipes loaded without it"""
+    if instance._stored_image is not DEFERRED:
+        return
+    if "image" in instance.get_deferred_fields():
+        return
+    instance._stored_image = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list("image", flat=True)
+        .first()
+        or None
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_image_references(sender, instance, **kwargs):
+    """Move the image reference when Recipe.image changes"""
+    if "image" in instance.get_deferred_fields():
+        # Not loaded, so not changed either
+        return
+    old_name = instance._stored_image
+    new_name = instance.image.name or None
+    if old_name == new_name:
+        return
+    if new_name:
+        acquire_image(new_name)
+    if old_name:
+        release_image(old_name, instance.image.storage)
+    instance._stored_image = new_name
+
+
+@receiver(pre_delete, sender=Recipe)
+def load_deleted_recipe_image(sender, instance, **kwargs):
+    """Load a deferred image name while the row still exists"""
+    if "image" in instance.get_deferred_fields():
+        instance.refresh_from_db(fields=["image"])
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_recipe_image(sender, instance, **kwargs):
+    """Release the image of a deleted recipe"""
+    if instance.image:
+        release_image(instance.image.name, instance.image.storage)
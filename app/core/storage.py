@@ -0,0 +1,147 @@
+"""
+Content-addressed storage for recipe images.
+
+Files are stored under the SHA-256 digest of their content, so saving an
+image that is already stored reuses the existing file. StoredImage rows
+count the recipes referencing each file; when the count drops to zero the
+file and its renditions are deleted after the transaction commits.
+
+Saving and deleting a file both hold the StoredImage row lock, so a
+pending deletion never removes a file that was reused meanwhile as long
+as the reference is acquired in the transaction that saved the file.
+"""
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+def rendition_name(name, rendition, fmt):
+    """Return the storage name of a rendition of an image"""
+    base = os.path.splitext(name)[0]
+    ext = "webp" if fmt == "WEBP" else "jpg"
+    return f"{base}_{rendition}.{ext}"
+
+
+def rendition_names(name):
+    """Return every possible rendition name of an image"""
+    config = settings.RECIPE_IMAGE
+    return [
+        rendition_name(name, rendition, fmt)
+        for rendition in config["RENDITIONS"]
+        for fmt in config["FORMATS"]
+    ]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files after the digest of their content
+
+    Content is hashed while it is streamed to a temporary file, which is
+    then renamed to ``<dir>/<digest[:2]>/<digest><ext>``. Saving content
+    that is already stored discards the copy and returns the existing name.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        tmp_path = self.path(os.path.join(directory, f".{uuid.uuid4()}{ext}"))
+        os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+
+        digest = hashlib.sha256()
+        with open(tmp_path, "wb") as tmp:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        hexdigest = digest.hexdigest()
+        final_name = os.path.join(directory, hexdigest[:2], hexdigest + ext)
+        final_path = self.path(final_name)
+        final_name = final_name.replace("\\", "/")
+        with transaction.atomic():
+            # Held until the caller commits, see delete_unreferenced_image
+            lock_stored_image(final_name)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        return final_name
+
+
+def delete_image_files(name, storage=default_storage):
+    """Delete an image and all of its renditions"""
+    storage.delete(name)
+    for rendition in rendition_names(name):
+        storage.delete(rendition)
+
+
+def lock_stored_image(name):
+    """Lock the StoredImage row of a name, creating it if missing"""
+    from core.models import StoredImage
+
+    stored, _ = StoredImage.objects.select_for_update().get_or_create(
+        name=name
+    )
+    return stored
+
+
+def acquire_image(name):
+    """Record one more reference to a stored image"""
+    from core.models import StoredImage
+
+    with transaction.atomic():
+        StoredImage.objects.get_or_create(name=name)
+        StoredImage.objects.filter(name=name).update(
+            ref_count=F("ref_count") + 1
+        )
+
+
+def release_image(name, storage=default_storage):
+    """Drop a reference to an image, deleting it once unreferenced
+
+    Images stored before reference counting have no StoredImage row and
+    are only referenced by a single recipe.
+    """
+    from core.models import StoredImage
+
+    with transaction.atomic():
+        stored = (
+            StoredImage.objects.select_for_update().filter(name=name).first()
+        )
+        if stored is not None and stored.ref_count > 1:
+            stored.ref_count = F("ref_count") - 1
+            stored.save(update_fields=["ref_count"])
+            return
+        if stored is not None:
+            # The row is deleted along with the files
+            stored.ref_count = 0
+            stored.save(update_fields=["ref_count"])
+        transaction.on_commit(
+            lambda: delete_unreferenced_image(name, storage)
+        )
+
+
+def delete_unreferenced_image(name, storage=default_storage):
+    """Delete an image and its StoredImage row unless referenced again
+
+    Runs once the release committed; an upload of the same content may
+    have reused the file and acquired a reference since.
+    """
+    with transaction.atomic():
+        stored = lock_stored_image(name)
+        if stored.ref_count > 0:
+            return
+        delete_image_files(name, storage)
+        stored.delete()
@@ -29,3 +29,15 @@ class CommandsTests(TestCase):
         call_command("wait_for_db")
         self.assertEqual(patched_check.call_count, 7)
         patched_check.assert_called_with(databases=["default"])
+
+    @patch(
+        "core.management.commands.wait_for_db.connections",
+        ["default", "replica"],
+    )
+    def test_wait_for_db_checks_every_alias(self, patched_check):
+        """Test waiting for the replica database too"""
+        patched_check.return_value = True
+        call_command("wait_for_db")
+        patched_check.assert_called_once_with(
+            databases=["default", "replica"]
+        )
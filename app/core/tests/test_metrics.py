@@ -0,0 +1,130 @@
+"""
+Tests for the request metrics middleware and endpoint
+"""
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+
+
+METRICS_URL = reverse("metrics")
+
+
+class HistogramTests(SimpleTestCase):
+    def test_collect_cumulative_buckets(self):
+        """Test the exposition lists cumulative buckets, sum and count"""
+        histogram = metrics.Histogram("test_seconds", "Test.", (0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value, view="a:b")
+
+        lines = list(histogram.collect())
+
+        self.assertEqual(
+            lines,
+            [
+                "# HELP test_seconds Test.",
+                "# TYPE test_seconds histogram",
+                'test_seconds_bucket{view="a:b",le="0.1"} 1',
+                'test_seconds_bucket{view="a:b",le="1"} 3',
+                'test_seconds_bucket{view="a:b",le="+Inf"} 4',
+                'test_seconds_sum{view="a:b"} 4.05',
+                'test_seconds_count{view="a:b"} 4',
+            ],
+        )
+
+    def test_timed_counts_nested_sections_once(self):
+        """Test nested timed blocks of one section are not double counted"""
+        timings = metrics.RequestTimings()
+        token = metrics.current_timings.set(timings)
+        try:
+            with metrics.timed("serializer"):
+                with metrics.timed("serializer"):
+                    pass
+        finally:
+            metrics.current_timings.reset(token)
+
+        self.assertEqual(list(timings.durations), ["serializer"])
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.REGISTRY.clear()
+        self.user = get_user_model().objects.create_user(
+            "metrics@recipe.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        """Test responses report their SQL and serializer time"""
+        res = self.client.get(reverse("recipe:tag-list"))
+
+        timing = res["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("serializer;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    @override_settings(METRICS={"TOKEN": "secret"})
+    def test_metrics_endpoint(self):
+        """Test histograms are exposed per view name"""
+        self.client.get(reverse("recipe:tag-list"))
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer secret"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        body = res.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{view="recipe:tag-list",method="GET"} 1',
+            body,
+        )
+        self.assertIn(
+            'http_request_db_queries_count{view="recipe:tag-list"} 1', body
+        )
+        self.assertIn("# TYPE http_response_size_bytes histogram", body)
+
+    @override_settings(METRICS={"TOKEN": "secret"})
+    def test_unknown_methods_grouped(self):
+        """Test arbitrary method names share one metric series"""
+        for method in ("FOO", "BAR"):
+            self.client.generic(method, reverse("recipe:tag-list"))
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer secret"
+        )
+
+        body = res.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{view="recipe:tag-list",method="other"} 2',
+            body,
+        )
+        self.assertNotIn('method="FOO"', body)
+
+    @override_settings(METRICS={"TOKEN": "secret"})
+    def test_metrics_endpoint_token(self):
+        """Test the endpoint requires the bearer token when configured"""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 401)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer secret"
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS={"TOKEN": ""})
+    def test_metrics_endpoint_without_token(self):
+        """Test only staff users can read metrics when no token is set"""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
@@ -0,0 +1,72 @@
+"""
+Tests for the orjson backed JSON renderer and parser
+"""
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+
+
+SAMPLE_DATA = {
+    "id": 1,
+    "title": "Crème brûlée\u2028",
+    "price": Decimal("5.50"),
+    "created": datetime.datetime(2021, 5, 1, 12, 30, 5, 123, timezone.utc),
+    "day": datetime.date(2021, 5, 1),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "label": gettext_lazy("Tags"),
+    "tags": [1, 2],
+    "link": None,
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_render_matches_drf_renderer(self):
+        """Test the output is identical to DRF's JSONRenderer"""
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(SAMPLE_DATA),
+            JSONRenderer().render(SAMPLE_DATA),
+        )
+
+    def test_render_indented_falls_back(self):
+        """Test indented output is left to DRF's JSONRenderer"""
+        context = {"indent": 4}
+
+        self.assertEqual(
+            renderers.FastJSONRenderer().render([1], None, context),
+            JSONRenderer().render([1], None, context),
+        )
+
+    def test_render_without_orjson(self):
+        """Test rendering falls back to the stdlib without orjson"""
+        with mock.patch.object(renderers, "orjson", None):
+            ret = renderers.FastJSONRenderer().render(SAMPLE_DATA)
+
+        self.assertEqual(ret, JSONRenderer().render(SAMPLE_DATA))
+
+
+class FastJSONParserTests(SimpleTestCase):
+    def test_parse_matches_drf_parser(self):
+        """Test parsing returns the same data as DRF's JSONParser"""
+        body = '{"title": "Crème", "price": "5.50", "tags": [1, 2]}'
+
+        self.assertEqual(
+            renderers.FastJSONParser().parse(io.BytesIO(body.encode())),
+            JSONParser().parse(io.BytesIO(body.encode())),
+        )
+
+    def test_parse_invalid_json(self):
+        """Test malformed bodies raise a ParseError"""
+        for body in (b"{", b'{"price": NaN}'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                renderers.FastJSONParser().parse(io.BytesIO(body))
@@ -0,0 +1,140 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core import routers
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Recipe
+from core.routers import ReplicaRouter
+from user.authenticate import CustomAuthentication
+from user.cache import token_cache
+
+
+REPLICA = {
+    "ALIAS": "replica",
+    "STICKY_SECONDS": 5,
+    "STICKY_COOKIE": "db_primary_until",
+    "STICKY_CACHE": "default",
+}
+
+
+def route(request):
+    """Run a request through the middleware, returning its read alias"""
+    aliases = []
+
+    def view(request):
+        aliases.append(ReplicaRouter().db_for_read(Recipe))
+        return HttpResponse()
+
+    response = ReplicaRoutingMiddleware(view)(request)
+    return aliases[0], response
+
+
+@override_settings(DATABASE_REPLICA=REPLICA)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_safe_requests_read_from_replica(self):
+        """Test GET requests read from the replica"""
+        alias, response = route(self.factory.get("/api/recipe/recipes/"))
+
+        self.assertEqual(alias, "replica")
+        self.assertNotIn("db_primary_until", response.cookies)
+
+    def test_unsafe_requests_pin_primary(self):
+        """Test writes read from the primary and pin the client to it"""
+        alias, response = route(self.factory.post("/api/recipe/recipes/"))
+
+        self.assertEqual(alias, "default")
+        cookie = response.cookies["db_primary_until"]
+        self.assertEqual(cookie["max-age"], 5)
+
+        request = self.factory.get("/api/recipe/recipes/")
+        request.COOKIES["db_primary_until"] = cookie.value
+        alias, _ = route(request)
+
+        self.assertEqual(alias, "default")
+
+    def test_expired_pin_reads_from_replica(self):
+        """Test reads go back to the replica after the sticky window"""
+        request = self.factory.get("/api/recipe/recipes/")
+        request.COOKIES["db_primary_until"] = str(time.time() - 1)
+
+        alias, _ = route(request)
+
+        self.assertEqual(alias, "replica")
+
+    def test_writes_and_outside_requests_use_primary(self):
+        """Test writes and reads outside requests use the primary"""
+        router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_read(Recipe), "default")
+        self.assertEqual(router.db_for_write(Recipe), "default")
+        self.assertFalse(router.allow_migrate("replica", "core"))
+
+    def test_sticky_cache_must_be_shared(self):
+        """Test pins in a per-process cache are refused at startup"""
+        with override_settings(
+            DATABASE_REPLICA={**REPLICA, "STICKY_CACHE": "default"}
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                routers.check_sticky_cache()
+
+        shared = {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": "/tmp/sticky",
+        }
+        with override_settings(CACHES={"default": shared}):
+            routers.check_sticky_cache()
+
+    @override_settings(DATABASE_REPLICA={**REPLICA, "ALIAS": None})
+    def test_no_replica_configured(self):
+        """Test nothing is routed without a replica"""
+        alias, response = route(self.factory.post("/api/recipe/recipes/"))
+
+        self.assertEqual(alias, "default")
+        self.assertNotIn("db_primary_until", response.cookies)
+
+
+@override_settings(DATABASE_REPLICA=REPLICA)
+class ReplicaTransactionTests(TestCase):
+    def test_reads_in_transaction_use_primary(self):
+        """Test reads inside a transaction see its writes"""
+        request = RequestFactory().get("/api/recipe/recipes/")
+
+        with transaction.atomic():
+            alias, _ = route(request)
+
+        self.assertEqual(alias, "default")
+
+    def test_token_lookups_use_primary(self):
+        """Test tokens are read from the primary during replica requests"""
+        user = get_user_model().objects.create_user("t@t.com", "pass4321")
+        token = Token.objects.create(user=user)
+        token_cache.clear()
+        aliases = []
+
+        def record(router, model, **hints):
+            aliases.append(routers.read_alias.get() or "default")
+            return "default"
+
+        alias = routers.read_alias.set("replica")
+        try:
+            with mock.patch.object(ReplicaRouter, "db_for_read", record):
+                found, _ = CustomAuthentication().authenticate_credentials(
+                    token.key
+                )
+        finally:
+            routers.read_alias.reset(alias)
+
+        self.assertEqual(found, user)
+        self.assertEqual(set(aliases), {"default"})
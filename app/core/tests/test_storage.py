@@ -0,0 +1,127 @@
+"""
+Tests for the content-addressed recipe image storage
+"""
+import hashlib
+import io
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core import models
+from core.tests.utils import sample_recipe
+
+
+def sample_image(color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "storage@test.com", "testpass1234"
+        )
+        self.recipe1 = sample_recipe(self.user)
+        self.recipe2 = sample_recipe(self.user)
+
+    def tearDown(self):
+        for recipe in models.Recipe.objects.all():
+            if recipe.image:
+                recipe.image.storage.delete(recipe.image.name)
+
+    def test_image_stored_under_digest(self):
+        """Test images are named after the SHA-256 of their content"""
+        content = sample_image()
+        self.recipe1.image.save("photo.jpg", ContentFile(content))
+
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(
+            self.recipe1.image.name,
+            f"uploads/recipe/{digest[:2]}/{digest}.jpg",
+        )
+
+    def test_duplicate_uploads_share_file(self):
+        """Test identical images reuse one file and count references"""
+        content = sample_image()
+        self.recipe1.image.save("a.jpg", ContentFile(content))
+        self.recipe2.image.save("b.jpg", ContentFile(content))
+
+        self.assertEqual(self.recipe1.image.name, self.recipe2.image.name)
+        stored = models.StoredImage.objects.get(name=self.recipe1.image.name)
+        self.assertEqual(stored.ref_count, 2)
+
+    def test_image_kept_while_referenced(self):
+        """Test deleting one of two referencing recipes keeps the file"""
+        content = sample_image()
+        self.recipe1.image.save("a.jpg", ContentFile(content))
+        self.recipe2.image.save("b.jpg", ContentFile(content))
+        storage = self.recipe1.image.storage
+        name = self.recipe1.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe1.delete()
+
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(
+            models.StoredImage.objects.get(name=name).ref_count, 1
+        )
+
+    def test_orphaned_image_deleted(self):
+        """Test changing the only reference deletes the old file"""
+        self.recipe1.image.save("a.jpg", ContentFile(sample_image("red")))
+        storage = self.recipe1.image.storage
+        old_name = self.recipe1.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe1.image.save("b.jpg", ContentFile(sample_image("blue")))
+
+        self.assertFalse(storage.exists(old_name))
+        self.assertFalse(
+            models.StoredImage.objects.filter(name=old_name).exists()
+        )
+        self.assertTrue(storage.exists(self.recipe1.image.name))
+
+    def test_deferred_image_not_acquired(self):
+        """Test saving a recipe loaded without its image keeps the count"""
+        self.recipe1.image.save("a.jpg", ContentFile(sample_image()))
+        name = self.recipe1.image.name
+
+        recipe = models.Recipe.objects.only("title").get(pk=self.recipe1.pk)
+        recipe.title = "Renamed"
+        recipe.save()
+        recipe = models.Recipe.objects.defer("image").get(pk=self.recipe1.pk)
+        recipe.image.name
+        recipe.save()
+
+        self.assertEqual(
+            models.StoredImage.objects.get(name=name).ref_count, 1
+        )
+
+        recipe = models.Recipe.objects.defer("image").get(pk=self.recipe1.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+
+        self.assertFalse(self.recipe1.image.storage.exists(name))
+
+    def test_reused_image_survives_pending_release(self):
+        """Test a file reused before its release commits is kept"""
+        content = sample_image()
+        self.recipe1.image.save("a.jpg", ContentFile(content))
+        storage = self.recipe1.image.storage
+        name = self.recipe1.image.name
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.recipe1.delete()
+        self.recipe2.image.save("b.jpg", ContentFile(content))
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self.recipe2.image.name, name)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(
+            models.StoredImage.objects.get(name=name).ref_count, 1
+        )
@@ -0,0 +1,11 @@
+"""
+Fixtures shared by the test modules of several apps
+"""
+from core.models import Recipe
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {"title": "Sample Recipe", "time_minutes": 10, "price": 5.00}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
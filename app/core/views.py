@@ -1,13 +1,38 @@
 """
 Core View for app.
 """
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from core.metrics import REGISTRY
+
 
 @api_view(["GET"])
 def health_check(request):
     """Returns successful response."""
     return Response(
         {"Extremely healty": True}
-    )
\ No newline at end of file
+    )
+
+
+def metrics(request):
+    """Expose the request histograms in the Prometheus text format
+
+    Scrapers authenticate with the configured bearer token; without a
+    token only staff users logged in to the admin may read them.
+    """
+    token = settings.METRICS["TOKEN"]
+    if token:
+        if not hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        ):
+            return HttpResponse(status=401)
+    elif not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(
+        REGISTRY.render(), content_type="text/plain; version=0.0.4"
+    )
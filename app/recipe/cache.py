@@ -0,0 +1,193 @@
+"""
+Per-user versioned response cache for the recipe API.
+
+Cached responses are keyed by user, endpoint, normalized query params and
+a per-user version counter. Any write to a user's recipes, tags or
+ingredients bumps the counter, so stale entries are never read again and
+simply age out of the cache.
+
+Safe requests also get an ETag computed from a per-user aggregate
+(count + max updated_at) of recipes, tags and ingredients, so unchanged
+resources are answered with 304. No Last-Modified is sent: deleting any
+but the newest object leaves max(updated_at) unchanged, so only the
+count in the ETag notices deletes.
+
+With a read replica, bumping the version also pins the user to the
+primary for the sticky window (core.routers), so the first reads under
+a new version come from the primary. Responses built from replica reads
+are only stored while the user is not pinned: a replica read racing a
+write could otherwise cache stale data under the new version.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from core.models import Ingredient, Recipe, Tag
+from core import routers
+
+
+# Models whose state is part of every recipe API response validator
+VALIDATED_MODELS = {"recipe": Recipe, "tag": Tag, "ingredient": Ingredient}
+
+
+def get_cache():
+    return caches[settings.RECIPE_RESPONSE_CACHE["CACHE_ALIAS"]]
+
+
+def _version_key(user_id):
+    return f"recipe:version:{user_id}"
+
+
+def get_cache_version(user_id):
+    """Return the current cache version of a user"""
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from a timestamp so an evicted counter never reuses an
+        # old version number
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(user_id):
+    """Invalidate every cached response of a user"""
+    # Pin first, so readers of the new version never use the replica
+    routers.pin_user(user_id)
+    cache = get_cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def _request_fingerprint(request, view):
+    """Return a string identifying the endpoint and normalized params"""
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    return "|".join(
+        [
+            request.get_host(),
+            view.basename,
+            view.action,
+            str(sorted(view.kwargs.items())),
+            str(params),
+        ]
+    )
+
+
+def _user_aggregate(model, aggregate):
+    return Subquery(
+        model.objects.filter(user_id=OuterRef("pk"))
+        .order_by()
+        .values("user_id")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+
+
+def user_collection_state(user_id):
+    """Return count and last modification of a user's recipe data
+
+    Computed in a single query from one scalar subquery per aggregate.
+    """
+    annotations = {}
+    for name, model in VALIDATED_MODELS.items():
+        annotations[f"{name}_count"] = _user_aggregate(model, Count("id"))
+        annotations[f"{name}_modified"] = _user_aggregate(
+            model, Max("updated_at")
+        )
+    return (
+        get_user_model()
+        .objects.filter(pk=user_id)
+        .annotate(**annotations)
+        .values(*annotations)
+        .get()
+    )
+
+
+def response_etag(request, view):
+    """Return the ETag of a safe request"""
+    state = user_collection_state(request.user.pk)
+    raw = _request_fingerprint(request, view) + str(sorted(state.items()))
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def response_cache_key(request, view):
+    """Build the cache key of a request to a viewset action"""
+    raw = _request_fingerprint(request, view)
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    user_id = request.user.pk
+    return f"recipe:response:{user_id}:{get_cache_version(user_id)}:{digest}"
+
+
+class CachedResponseMixin:
+    """Serve safe requests conditionally and from the response cache
+
+    Successful unsafe requests (create/update/destroy and custom write
+    actions) bump the user's cache version.
+    """
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Answer 304, a cached response or call the handler"""
+        etag = response_etag(request, self)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self._cached_or_handle(
+                handler, request, *args, **kwargs
+            )
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+        return response
+
+    def _cached_or_handle(self, handler, request, *args, **kwargs):
+        if not settings.RECIPE_RESPONSE_CACHE["ENABLED"]:
+            return handler(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_cache_key(request, self)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and self._cacheable(request):
+            cache.set(key, response.data)
+        return response
+
+    def _cacheable(self, request):
+        """Tell whether the reads of a request may fill the cache"""
+        if routers.read_alias.get() is None:
+            return True
+        # Read from the replica: only trust it if no write since the
+        # cache key was built pinned the user
+        return not routers.user_pinned(request.user.pk)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            routers.read_primary_if_pinned(request.user.pk)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            and request.user.is_authenticated
+            and 200 <= response.status_code < 300
+        ):
+            bump_cache_version(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
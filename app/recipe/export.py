@@ -0,0 +1,58 @@
+"""
+Streaming export of recipe catalogues.
+
+Recipes are read with a server-side cursor (QuerySet.iterator) as value
+rows and the names of their tags/ingredients are fetched per chunk, so
+memory use does not grow with the catalogue size.
+"""
+from itertools import islice
+
+from core.models import Recipe
+
+
+EXPORT_FIELDS = ("id", "title", "time_minutes", "price", "link")
+RELATED_FIELDS = ("tags", "ingredients")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _linked_names(field, recipe_ids, using):
+    """Return recipe id -> names of its linked tags or ingredients"""
+    m2m_field = Recipe._meta.get_field(field)
+    target = m2m_field.m2m_reverse_field_name()
+    links = (
+        m2m_field.remote_field.through.objects.using(using)
+        .filter(recipe_id__in=recipe_ids)
+        .order_by(f"{target}__name")
+        .values_list("recipe_id", f"{target}__name")
+    )
+    names = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, name in links:
+        names[recipe_id].append(name)
+    return names
+
+
+def export_rows(queryset, chunk_size=2000):
+    """Yield recipes as dicts with the names of their tags/ingredients
+
+    Names are read from the database of ``queryset``.
+    """
+    rows = queryset.order_by("id").values(*EXPORT_FIELDS)
+    for chunk in _chunks(rows.iterator(chunk_size=chunk_size), chunk_size):
+        recipe_ids = [row["id"] for row in chunk]
+        names = {
+            field: _linked_names(field, recipe_ids, queryset.db)
+            for field in RELATED_FIELDS
+        }
+        for row in chunk:
+            row["price"] = str(row["price"])
+            for field in RELATED_FIELDS:
+                row[field] = names[field][row["id"]]
+            yield row
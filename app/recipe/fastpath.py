@@ -0,0 +1,130 @@
+"""
+Fast read path for recipe list responses.
+
+Rows are fetched with values() instead of model instances, the linked
+tag/ingredient ids come as id arrays (ArrayAgg subqueries on Postgres,
+one query per relation elsewhere) and each row is rendered by a field
+plan compiled once per field set from RecipeSerializer. The output is
+identical to RecipeSerializer(many=True).data.
+"""
+from functools import lru_cache
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import BigIntegerField, OuterRef, Subquery
+
+from core.metrics import timed
+from core.models import Recipe
+from recipe.search import uses_postgres
+from recipe.serializers import RecipeSerializer, image_variant_urls
+
+
+# Serializer field -> value key of the linked ids in a row
+RELATED_FIELDS = {"tags": "tag_ids", "ingredients": "ingredient_ids"}
+
+
+def _related_ids_subquery(field):
+    """Subquery aggregating the ids linked to a recipe into an array"""
+    m2m_field = Recipe._meta.get_field(field)
+    column = m2m_field.m2m_reverse_name()
+    ids = (
+        m2m_field.remote_field.through.objects.filter(recipe_id=OuterRef("pk"))
+        .order_by()
+        .values("recipe_id")
+        .annotate(ids=ArrayAgg(column, ordering=column))
+        .values("ids")
+    )
+    return Subquery(ids, output_field=ArrayField(BigIntegerField()))
+
+
+def recipe_rows(queryset, fields, extra_columns=()):
+    """Turn a recipe queryset into a values() queryset for some fields
+
+    ``extra_columns`` are read by the caller (e.g. cursor positions).
+    Annotations such as the search rank are kept in the rows.
+    """
+    columns = set(RecipeSerializer.model_columns(fields))
+    columns.update(extra_columns)
+    columns.update(queryset.query.annotations)
+    queryset = queryset.prefetch_related(None)
+    if uses_postgres(queryset):
+        queryset = queryset.annotate(
+            **{
+                key: _related_ids_subquery(field)
+                for field, key in RELATED_FIELDS.items()
+                if field in fields
+            }
+        )
+        columns.update(
+            key for field, key in RELATED_FIELDS.items() if field in fields
+        )
+    return queryset.values(*columns)
+
+
+def attach_related_ids(rows, fields):
+    """Add the linked ids to rows fetched without ArrayAgg"""
+    rows = list(rows)
+    recipe_ids = [row["id"] for row in rows]
+    for field, key in RELATED_FIELDS.items():
+        if field not in fields or (rows and key in rows[0]):
+            continue
+        m2m_field = Recipe._meta.get_field(field)
+        column = m2m_field.m2m_reverse_name()
+        links = (
+            m2m_field.remote_field.through.objects.filter(
+                recipe_id__in=recipe_ids
+            )
+            .order_by(column)
+            .values_list("recipe_id", column)
+        )
+        linked = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, related_id in links:
+            linked[recipe_id].append(related_id)
+        for row in rows:
+            row[key] = linked[row["id"]]
+    return rows
+
+
+def _scalar_getter(name, convert):
+    def get(row, request):
+        value = row[name]
+        return None if value is None else convert(value)
+
+    return get
+
+
+def _related_getter(key):
+    def get(row, request):
+        return row[key] or []
+
+    return get
+
+
+def _image_variants(row, request):
+    return image_variant_urls(row["image"], row["image_variants"], request)
+
+
+@lru_cache(maxsize=64)
+def compile_plan(fields):
+    """Return (name, getter) pairs rendering rows like RecipeSerializer"""
+    serializer_fields = RecipeSerializer().fields
+    plan = []
+    for name in fields:
+        if name in RELATED_FIELDS:
+            plan.append((name, _related_getter(RELATED_FIELDS[name])))
+        elif name == "image_variants":
+            plan.append((name, _image_variants))
+        else:
+            convert = serializer_fields[name].to_representation
+            plan.append((name, _scalar_getter(name, convert)))
+    return tuple(plan)
+
+
+def render_recipes(rows, fields, request=None):
+    """Render value rows with the compiled plan of the given fields"""
+    plan = compile_plan(tuple(fields))
+    rows = attach_related_ids(rows, fields)
+    with timed("serializer"):
+        return [
+            {name: get(row, request) for name, get in plan} for row in rows
+        ]
@@ -0,0 +1,221 @@
+"""
+Recipe image processing pipeline.
+
+Uploads are streamed to MEDIA_ROOT and queued as RecipeImageJob rows.
+process_pending_jobs claims a batch of jobs, decodes the images in a
+local process pool (no database access in the workers), strips their
+metadata, writes JPEG/WebP renditions next to the image and then
+attaches the result (with the rendition sizes) to the recipe. Processed
+images are moved into the content-addressed recipe image storage, so
+identical uploads share one set of files.
+
+Jobs claimed by a worker that died are claimed again once
+RECIPE_IMAGE["CLAIM_TIMEOUT"] has passed; a job only completes if it is
+still held by the claim that processed it.
+"""
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from core.models import Recipe, RecipeImageJob, recipe_image_file_path
+from core.storage import rendition_name, rendition_names
+
+
+PENDING_UPLOAD_DIR = "uploads/pending/"
+
+
+def save_pending_upload(upload):
+    """Stream an uploaded file to storage and return its name"""
+    ext = os.path.splitext(upload.name)[1].lower()
+    return default_storage.save(
+        os.path.join(PENDING_UPLOAD_DIR, f"{uuid.uuid4()}{ext}"), upload
+    )
+
+
+def render_image(source_path, media_root, name, write_main=True):
+    """Write a metadata-free JPEG of an image and its renditions
+
+    Runs in pool workers, so it only touches the filesystem. ``name`` is
+    the storage name of the main JPEG; renditions are stored next to it.
+    Returns the size and formats of every rendition.
+    """
+    config = settings.RECIPE_IMAGE
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        # Rebuilding from raw pixels drops EXIF/ICC/XMP metadata
+        clean = Image.frombytes("RGB", img.size, img.tobytes())
+
+    def write(image, storage_name, fmt):
+        path = os.path.join(media_root, storage_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image.save(
+            path, fmt, quality=config["QUALITY"], optimize=fmt == "JPEG"
+        )
+
+    if write_main:
+        write(clean, name, "JPEG")
+    formats = [
+        fmt
+        for fmt in config["FORMATS"]
+        if fmt != "WEBP" or features.check("webp")
+    ]
+    renditions = {}
+    for rendition, size in config["RENDITIONS"].items():
+        resized = clean.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        for fmt in formats:
+            write(resized, rendition_name(name, rendition, fmt), fmt)
+        width, height = resized.size
+        renditions[rendition] = {
+            "width": width,
+            "height": height,
+            "formats": formats,
+        }
+    return renditions
+
+
+def _render(key, *args):
+    """Pool entry point returning (key, renditions, error or None)"""
+    try:
+        return key, render_image(*args), None
+    except Exception as exc:  # report any decode error to the caller
+        return key, None, f"{type(exc).__name__}: {exc}"
+
+
+def render_many(args, workers):
+    """Run render_image for every argument tuple, keyed by its first item
+
+    With ``workers=0`` images are processed in the current process.
+    """
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_render, *zip(*args)))
+    else:
+        results = [_render(*render_args) for render_args in args]
+    return {key: (renditions, error) for key, renditions, error in results}
+
+
+def claim_jobs(batch_size):
+    """Mark a batch of pending or abandoned jobs as processing
+
+    Returns the claimed jobs.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.RECIPE_IMAGE["CLAIM_TIMEOUT"])
+    with transaction.atomic():
+        ids = list(
+            RecipeImageJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=RecipeImageJob.PENDING)
+                | Q(status=RecipeImageJob.PROCESSING, claimed_at__lt=stale)
+            )
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        RecipeImageJob.objects.filter(id__in=ids).update(
+            status=RecipeImageJob.PROCESSING, claimed_at=now
+        )
+    return list(
+        RecipeImageJob.objects.filter(id__in=ids).select_related("recipe")
+    )
+
+
+def store_processed_image(name):
+    """Move a processed image and its renditions to the image storage
+
+    Returns the content-addressed name; when the same image is already
+    stored the new copies are dropped.
+    """
+    storage = Recipe._meta.get_field("image").storage
+    with default_storage.open(name) as processed:
+        stored_name = storage.save(name, processed)
+    config = settings.RECIPE_IMAGE
+    for rendition in config["RENDITIONS"]:
+        for fmt in config["FORMATS"]:
+            source = rendition_name(name, rendition, fmt)
+            target = rendition_name(stored_name, rendition, fmt)
+            if not default_storage.exists(source):
+                continue
+            if storage.exists(target):
+                default_storage.delete(source)
+            else:
+                os.replace(default_storage.path(source), storage.path(target))
+    default_storage.delete(name)
+    return stored_name
+
+
+def discard_processed_image(name):
+    """Delete a processed image and its renditions before storing them"""
+    default_storage.delete(name)
+    for rendition in rendition_names(name):
+        default_storage.delete(rendition)
+
+
+def _finish_job(job, name, renditions, error):
+    """Attach the processed image to the recipe and clean up
+
+    Results are dropped when processing failed, when the recipe (and
+    with it the job) was deleted meanwhile, or when the job was claimed
+    again after timing out; the later claim then owns the upload.
+    """
+    with transaction.atomic():
+        recipe = (
+            Recipe.objects.select_for_update()
+            .filter(pk=job.recipe_id)
+            .first()
+        )
+        claimed = (
+            RecipeImageJob.objects.select_for_update()
+            .filter(
+                pk=job.pk,
+                status=RecipeImageJob.PROCESSING,
+                claimed_at=job.claimed_at,
+            )
+            .exists()
+        )
+        if claimed and recipe is not None:
+            if error:
+                job.status = RecipeImageJob.FAILED
+                job.error = error
+            else:
+                recipe.image.name = store_processed_image(name)
+                recipe.image_variants = renditions
+                recipe.save(
+                    update_fields=["image", "image_variants", "updated_at"]
+                )
+                job.status = RecipeImageJob.DONE
+            job.save(update_fields=["status", "error", "updated_at"])
+    if error or not claimed or recipe is None:
+        # Failed renders may have written some of the outputs
+        discard_processed_image(name)
+    if claimed or recipe is None:
+        default_storage.delete(job.source)
+
+
+def process_pending_jobs(workers=2, batch_size=20):
+    """Process one batch of pending jobs and return how many were run"""
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0
+
+    media_root = str(settings.MEDIA_ROOT)
+    names = {
+        job.id: recipe_image_file_path(job.recipe, "image.jpg")
+        for job in jobs
+    }
+    args = [
+        (job.id, default_storage.path(job.source), media_root, names[job.id])
+        for job in jobs
+    ]
+    results = render_many(args, workers)
+    for job in jobs:
+        _finish_job(job, names[job.id], *results[job.id])
+    return len(jobs)
@@ -0,0 +1,245 @@
+"""
+Streaming bulk import of recipe catalogues.
+
+Reads the NDJSON/CSV files written by the recipe export one row at a
+time and writes them in batches: tags and ingredients are resolved (or
+created) through a per-user name -> id map, recipes are inserted with
+bulk_create and their M2M links with COPY on Postgres (bulk_create
+elsewhere). Every batch commits on its own together with the number
+of rows imported so far (an ImportCheckpoint row), so an interrupted
+import resumes exactly after the last committed batch.
+"""
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from core.models import ImportCheckpoint, Ingredient, Recipe, Tag
+from recipe.cache import bump_cache_version
+from recipe.names import upsert_names
+from recipe.renderers import CSV_LIST_SEPARATOR
+from recipe.search import update_search_vectors
+from recipe.stats import add_imported_recipes
+
+
+class ImportRowError(ValueError):
+    """A row of the input file cannot be imported"""
+
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def detect_format(path):
+    """Guess the input format from the file extension"""
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def read_rows(stream, file_format):
+    """Yield (line number, row dict) from an NDJSON or CSV text stream"""
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            for field in ("tags", "ingredients"):
+                value = row.get(field) or ""
+                row[field] = value.split(CSV_LIST_SEPARATOR) if value else []
+            yield reader.line_num, row
+        return
+
+    for line_num, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError as exc:
+            raise ImportRowError(line_num, f"invalid JSON ({exc})")
+
+
+def _clean(line, model, name, value):
+    """Convert and validate a value against the limits of a model field"""
+    try:
+        return model._meta.get_field(name).clean(value, None)
+    except ValidationError as exc:
+        raise ImportRowError(line, f"{name}: {' '.join(exc.messages)}")
+
+
+def parse_row(line, row):
+    """Return the recipe fields, tag names and ingredient names of a row
+
+    Values are checked against the model fields, so rows the database
+    would reject fail here with their line number.
+    """
+    try:
+        values = {
+            "title": str(row["title"]).strip(),
+            "time_minutes": row["time_minutes"],
+            "price": str(row["price"]),
+            "link": row.get("link") or "",
+        }
+    except KeyError as exc:
+        raise ImportRowError(line, f"missing {exc.args[0]!r}")
+    if not values["title"]:
+        raise ImportRowError(line, "empty title")
+    fields = {
+        name: _clean(line, Recipe, name, value)
+        for name, value in values.items()
+    }
+    tags, ingredients = (
+        [
+            _clean(line, model, "name", name)
+            for name in (str(value).strip() for value in row.get(field) or [])
+            if name
+        ]
+        for field, model in (("tags", Tag), ("ingredients", Ingredient))
+    )
+    return fields, tags, ingredients
+
+
+class NameResolver:
+    """Map the tag or ingredient names of a user to ids, creating them
+
+    Names are matched ignoring case, like the unique index on them. Ids
+    are remembered per spelling for the following batches.
+    """
+
+    def __init__(self, model, user):
+        self.model = model
+        self.user = user
+        self.ids = {}
+
+    def resolve(self, names):
+        """Look up or create the names not seen yet in one upsert"""
+        missing = [name for name in names if name not in self.ids]
+        if missing:
+            self.ids.update(upsert_names(self.model, self.user, missing))
+
+    def __getitem__(self, name):
+        return self.ids[name]
+
+
+class RecipeImporter:
+    """Write batches of parsed rows of one source for one user"""
+
+    def __init__(self, user, source=None):
+        self.user = user
+        self.source = source
+        self.tags = NameResolver(Tag, user)
+        self.ingredients = NameResolver(Ingredient, user)
+
+    def import_batch(self, batch, rows=None):
+        """Insert a batch of (fields, tag names, ingredient names)
+
+        ``rows``, the number of source rows imported including this
+        batch, is checkpointed in the same transaction.
+        """
+        with transaction.atomic():
+            self.tags.resolve(
+                name for _, tags, _ in batch for name in tags
+            )
+            self.ingredients.resolve(
+                name for _, _, ingredients in batch for name in ingredients
+            )
+            recipe_ids = self._create_recipes(
+                [fields for fields, _, _ in batch]
+            )
+            tag_links = [
+                (recipe_id, tag_id)
+                for recipe_id, (_, tags, _) in zip(recipe_ids, batch)
+                for tag_id in dict.fromkeys(self.tags[name] for name in tags)
+            ]
+            ingredient_links = [
+                (recipe_id, ingredient_id)
+                for recipe_id, (_, _, names) in zip(recipe_ids, batch)
+                for ingredient_id in dict.fromkeys(
+                    self.ingredients[name] for name in names
+                )
+            ]
+            self._link(Recipe.tags.through, "tag_id", tag_links)
+            self._link(
+                Recipe.ingredients.through, "ingredient_id", ingredient_links
+            )
+            update_search_vectors(Recipe.objects.filter(id__in=recipe_ids))
+            # Bulk writes skip the signals maintaining the stats
+            add_imported_recipes(
+                self.user.pk,
+                [
+                    (fields["time_minutes"], fields["price"])
+                    for fields, _, _ in batch
+                ],
+                {
+                    Tag: [tag_id for _, tag_id in tag_links],
+                    Ingredient: [
+                        ingredient_id for _, ingredient_id in ingredient_links
+                    ],
+                },
+            )
+            if rows is not None:
+                write_checkpoint(self.user, self.source, rows)
+        bump_cache_version(self.user.pk)
+        return recipe_ids
+
+    def _create_recipes(self, rows):
+        if connection.features.can_return_rows_from_bulk_insert:
+            recipes = Recipe.objects.bulk_create(
+                Recipe(user=self.user, **fields) for fields in rows
+            )
+            return [recipe.id for recipe in recipes]
+
+        recipes = Recipe.objects.filter(user=self.user)
+        last_id = (
+            recipes.order_by("-id").values_list("id", flat=True).first() or 0
+        )
+        Recipe.objects.bulk_create(
+            Recipe(user=self.user, **fields) for fields in rows
+        )
+        return list(
+            recipes.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def _link(self, through, column, links):
+        if connection.vendor != "postgresql":
+            through.objects.bulk_create(
+                through(recipe_id=recipe_id, **{column: related_id})
+                for recipe_id, related_id in links
+            )
+            return
+
+        buffer = io.StringIO(
+            "".join(
+                f"{recipe_id}\t{related_id}\n"
+                for recipe_id, related_id in links
+            )
+        )
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote(through._meta.db_table)} "
+                f"(recipe_id, {quote(column)}) FROM STDIN",
+                buffer,
+            )
+
+
+def read_checkpoint(user, source):
+    """Return the number of rows of a source already imported"""
+    return (
+        ImportCheckpoint.objects.filter(user=user, source=source)
+        .values_list("rows", flat=True)
+        .first()
+        or 0
+    )
+
+
+def write_checkpoint(user, source, rows):
+    """Record the number of imported rows of a source"""
+    ImportCheckpoint.objects.update_or_create(
+        user=user, source=source, defaults={"rows": rows}
+    )
+
+
+def clear_checkpoint(user, source):
+    """Forget the progress of a source once it is fully imported"""
+    ImportCheckpoint.objects.filter(user=user, source=source).delete()
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.images import render_many
+
+
+class Command(BaseCommand):
+    """Django command to create renditions of existing recipe images"""
+
+    help = "Generate missing renditions of recipe images in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Size of the process pool (0 processes in this process)",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate renditions of images that already have them",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.exclude(image="").exclude(image=None)
+        if not options["force"]:
+            queryset = queryset.filter(image_variants={})
+        ids = list(queryset.order_by("id").values_list("id", flat=True))
+        media_root = str(settings.MEDIA_ROOT)
+        done = failed = 0
+
+        for start in range(0, len(ids), options["batch_size"]):
+            batch = ids[start:start + options["batch_size"]]
+            recipes = Recipe.objects.in_bulk(batch)
+            args = [
+                (pk, recipe.image.path, media_root, recipe.image.name, False)
+                for pk, recipe in recipes.items()
+            ]
+            results = render_many(args, options["workers"])
+            for pk, (renditions, error) in results.items():
+                if error:
+                    failed += 1
+                    self.stderr.write(f"Recipe {pk}: {error}")
+                    continue
+                recipe = recipes[pk]
+                recipe.image_variants = renditions
+                recipe.save(update_fields=["image_variants", "updated_at"])
+                done += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Renditions created for {done} image(s)")
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} image(s) failed"))
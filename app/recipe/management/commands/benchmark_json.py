@@ -0,0 +1,91 @@
+import io
+import random
+
+from django.core.management.base import CommandError
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from core.renderers import FastJSONParser, FastJSONRenderer
+from recipe.fastpath import recipe_rows, render_recipes
+from recipe.seed import BenchmarkCommand, seed_catalogue
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BenchmarkCommand):
+    """Django command to compare the JSON renderers on recipe lists
+
+    Seeds a throwaway catalogue inside a transaction that is rolled back,
+    renders it as a recipe list response body and times rendering and
+    parsing with DRF's stdlib classes and the orjson backed ones.
+    """
+
+    help = "Benchmark the API JSON renderer/parser on large recipe lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            action="append",
+            help="Recipes per list (repeatable, default 1k/10k)",
+        )
+        parser.add_argument("--per-recipe", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options["rows"] or [1000, 10000]
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            user, _, _ = seed_catalogue(
+                rng,
+                "json-benchmark@recipe.com",
+                max(rows),
+                200,
+                1000,
+                options["per_recipe"],
+            )
+            fields = RecipeSerializer.Meta.fields
+            queryset = recipe_rows(
+                Recipe.objects.filter(user=user).order_by("-id"), fields
+            )
+            for count in rows:
+                data = {
+                    "next": None,
+                    "previous": None,
+                    "results": render_recipes(queryset[:count], fields),
+                }
+                self._report_renderers(data, count, options["repeat"])
+            transaction.set_rollback(True)
+
+    def _report_renderers(self, data, count, repeat):
+        """Print render and parse timings of both implementations"""
+        body = JSONRenderer().render(data)
+        if FastJSONRenderer().render(data) != body:
+            raise CommandError(f"Rendered JSON differs at {count} rows")
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"rows={count} ({len(body) / 1024:.0f} KiB)"
+            )
+        )
+        for action, stdlib, fast in (
+            (
+                "render",
+                lambda: JSONRenderer().render(data),
+                lambda: FastJSONRenderer().render(data),
+            ),
+            (
+                "parse",
+                lambda: JSONParser().parse(io.BytesIO(body)),
+                lambda: FastJSONParser().parse(io.BytesIO(body)),
+            ),
+        ):
+            stdlib_time = self._time(stdlib, repeat)
+            fast_time = self._time(fast, repeat)
+            self.stdout.write(
+                f"{action:>6}: stdlib {stdlib_time * 1000:.2f} ms, "
+                f"fast {fast_time * 1000:.2f} ms "
+                f"({stdlib_time / fast_time:.1f}x)"
+            )
@@ -0,0 +1,85 @@
+import random
+
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from recipe.seed import BenchmarkCommand, seed_catalogue
+from recipe.views import RecipeViewSet
+
+
+class Command(BenchmarkCommand):
+    """Django command to benchmark the recipe tag/ingredient filters
+
+    Seeds one throwaway catalogue per size inside a transaction that is
+    rolled back, then prints the query plan and average run time of the
+    list endpoint's queryset for each filter mode and size.
+    """
+
+    help = "Benchmark the recipe tag/ingredient filters on seeded data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument(
+            "--tags",
+            type=int,
+            nargs="+",
+            default=[50, 200, 1000],
+            help="Tags per catalogue, one catalogue per value",
+        )
+        parser.add_argument(
+            "--ingredients",
+            type=int,
+            nargs="+",
+            default=[200, 1000, 5000],
+            help="Ingredients per catalogue, paired with --tags",
+        )
+        parser.add_argument("--per-recipe", type=int, default=5)
+        parser.add_argument("--filter-size", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if len(options["tags"]) != len(options["ingredients"]):
+            raise CommandError("Give as many --ingredients as --tags.")
+        sizes = zip(options["tags"], options["ingredients"])
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            for index, (tags, ingredients) in enumerate(sizes):
+                user, tag_ids, ingredient_ids = seed_catalogue(
+                    rng,
+                    f"benchmark-{index}@recipe.com",
+                    options["recipes"],
+                    tags,
+                    ingredients,
+                    options["per_recipe"],
+                )
+                for match in ("any", "all"):
+                    params = {
+                        "tags": rng.sample(tag_ids, options["filter_size"]),
+                        "ingredients": rng.sample(
+                            ingredient_ids, options["filter_size"]
+                        ),
+                    }
+                    params = {
+                        key: ",".join(map(str, ids))
+                        for key, ids in params.items()
+                    }
+                    params["match"] = match
+                    self._report(
+                        f"tags={tags} ingredients={ingredients} "
+                        f"match={match}",
+                        self._endpoint_queryset(user, params),
+                        options["repeat"],
+                    )
+            transaction.set_rollback(True)
+
+    def _endpoint_queryset(self, user, params):
+        """Return the queryset the recipe list builds for a user's query"""
+        request = Request(RequestFactory().get("/", params))
+        request.user = user
+        view = RecipeViewSet(
+            request=request, action="list", format_kwarg=None, kwargs={}
+        )
+        return view.filter_queryset(view.get_queryset())
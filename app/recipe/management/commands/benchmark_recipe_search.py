@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.db import transaction
+
+from core.models import Recipe
+from recipe.search import search_recipes, update_search_vectors
+from recipe.seed import BenchmarkCommand, seed_catalogue
+
+
+class Command(BenchmarkCommand):
+    """Django command to benchmark the full-text recipe search
+
+    Seeds a throwaway catalogue inside a transaction that is rolled back,
+    prints the query plan of each search and its average run time.
+    """
+
+    help = "Benchmark the recipe search endpoint query on seeded data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1000000)
+        parser.add_argument("--tags", type=int, default=200)
+        parser.add_argument("--ingredients", type=int, default=1000)
+        parser.add_argument("--per-recipe", type=int, default=5)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--query",
+            action="append",
+            help="Search text to benchmark (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        queries = options["query"] or ["curry", "spicy chicken", "garlic"]
+        with transaction.atomic():
+            user, _, _ = seed_catalogue(
+                rng,
+                "search-benchmark@recipe.com",
+                options["recipes"],
+                options["tags"],
+                options["ingredients"],
+                options["per_recipe"],
+            )
+            start = time.perf_counter()
+            update_search_vectors(Recipe.objects.filter(user=user))
+            self.stdout.write(
+                f"Indexed {options['recipes']} recipes in "
+                f"{time.perf_counter() - start:.1f} s"
+            )
+            for text in queries:
+                queryset = search_recipes(
+                    Recipe.objects.filter(user=user), text
+                )
+                if "rank" in queryset.query.annotations:
+                    queryset = queryset.order_by("-rank", "-id")
+                else:
+                    queryset = queryset.order_by("-id")
+                self._report(
+                    f"search={text!r}",
+                    queryset[: options["page_size"]],
+                    options["repeat"],
+                )
+            transaction.set_rollback(True)
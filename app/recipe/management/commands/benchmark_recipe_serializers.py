@@ -0,0 +1,88 @@
+import random
+
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.fastpath import recipe_rows, render_recipes
+from recipe.seed import BenchmarkCommand, seed_catalogue
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BenchmarkCommand):
+    """Django command to compare the recipe list rendering paths
+
+    Seeds a throwaway catalogue inside a transaction that is rolled back
+    and times RecipeSerializer against the values() fast path (queries
+    included) for each row count.
+    """
+
+    help = "Benchmark RecipeSerializer against the values() list fast path"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            action="append",
+            help="Rows rendered per run (repeatable, default 100/1k/10k)",
+        )
+        parser.add_argument("--tags", type=int, default=200)
+        parser.add_argument("--ingredients", type=int, default=1000)
+        parser.add_argument("--per-recipe", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options["rows"] or [100, 1000, 10000]
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            user, _, _ = seed_catalogue(
+                rng,
+                "serializer-benchmark@recipe.com",
+                max(rows),
+                options["tags"],
+                options["ingredients"],
+                options["per_recipe"],
+            )
+            queryset = Recipe.objects.filter(user=user).order_by("-id")
+            for count in rows:
+                self._report_paths(queryset, count, options["repeat"])
+            transaction.set_rollback(True)
+
+    def _serializer_path(self, queryset, count):
+        queryset = queryset.defer("search_vector").prefetch_related(
+            Prefetch("tags", Tag.objects.only("id").order_by("id")),
+            Prefetch(
+                "ingredients", Ingredient.objects.only("id").order_by("id")
+            ),
+        )
+        return RecipeSerializer(queryset[:count], many=True).data
+
+    def _fast_path(self, queryset, count):
+        fields = RecipeSerializer.Meta.fields
+        return render_recipes(recipe_rows(queryset, fields)[:count], fields)
+
+    def _report_paths(self, queryset, count, repeat):
+        """Print the average time of both paths for one row count"""
+        renderer = JSONRenderer()
+        expected = renderer.render(self._serializer_path(queryset, count))
+        if renderer.render(self._fast_path(queryset, count)) != expected:
+            raise CommandError(f"Fast path output differs at {count} rows")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"rows={count}"))
+        timings = {}
+        for name, path in (
+            ("serializer", self._serializer_path),
+            ("fast path", self._fast_path),
+        ):
+            timings[name] = self._time(
+                lambda: path(queryset, count), repeat
+            )
+            self.stdout.write(f"{name:>10}: {timings[name] * 1000:.2f} ms")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"speedup {timings['serializer'] / timings['fast path']:.1f}x"
+            )
+        )
@@ -0,0 +1,101 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importer import (
+    ImportRowError,
+    RecipeImporter,
+    clear_checkpoint,
+    detect_format,
+    parse_row,
+    read_checkpoint,
+    read_rows,
+)
+
+
+class Command(BaseCommand):
+    """Django command to bulk import recipes from NDJSON or CSV
+
+    Rows are streamed from the file and written in batches, each in its
+    own transaction that also records the number of imported rows. So
+    rerunning the command after a failure resumes after the last
+    committed batch; the checkpoint is removed once the file is done.
+    """
+
+    help = "Import recipes (with tags and ingredients) for a user"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON or CSV file to import")
+        parser.add_argument(
+            "--email", required=True, help="Owner of the imported recipes"
+        )
+        parser.add_argument(
+            "--format",
+            choices=["ndjson", "csv"],
+            help="Input format (default: from the file extension)",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--checkpoint",
+            help="Checkpoint key (default: absolute path of the file)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and import from the start",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        checkpoint = options["checkpoint"] or os.path.abspath(path)
+        file_format = options["format"] or detect_format(path)
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        done = 0 if options["restart"] else read_checkpoint(user, checkpoint)
+        if done:
+            self.stdout.write(f"Resuming after {done} imported rows")
+        importer = RecipeImporter(user, checkpoint)
+        imported = 0
+        start = time.perf_counter()
+
+        def flush(batch):
+            nonlocal done, imported
+            importer.import_batch(batch, done + len(batch))
+            done += len(batch)
+            imported += len(batch)
+            rate = imported / (time.perf_counter() - start)
+            self.stdout.write(f"{done} rows imported ({rate:.0f} rows/s)")
+
+        try:
+            with open(path, newline="", encoding="utf-8") as stream:
+                batch = []
+                for index, (line, row) in enumerate(
+                    read_rows(stream, file_format)
+                ):
+                    if index < done:
+                        continue
+                    batch.append(parse_row(line, row))
+                    if len(batch) >= options["batch_size"]:
+                        flush(batch)
+                        batch = []
+                if batch:
+                    flush(batch)
+        except ImportRowError as exc:
+            raise CommandError(
+                f"{exc}. Fix the row and rerun to resume after row {done}."
+            )
+
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed else 0
+        clear_checkpoint(user, checkpoint)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} recipes in {elapsed:.1f} s "
+                f"({rate:.0f} rows/s)"
+            )
+        )
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.models import Ingredient, Tag
+from recipe.names import duplicate_name_users, merge_duplicate_names
+
+
+class Command(BaseCommand):
+    """Django command to merge tags/ingredients differing only in case
+
+    Run it before migrating to the unique (user, lower(name)) indexes if
+    duplicates were written after the merge migration.
+    """
+
+    help = "Merge each user's tags and ingredients sharing a name"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--email",
+            action="append",
+            help="Only merge this user's names (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options["email"]:
+            user_ids = set(
+                get_user_model()
+                .objects.filter(email__in=options["email"])
+                .values_list("pk", flat=True)
+            )
+
+        for model in (Tag, Ingredient):
+            merged = 0
+            for user_id in duplicate_name_users(model):
+                if user_ids is None or user_id in user_ids:
+                    merged += merge_duplicate_names(model, user_id)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Merged {merged} duplicate "
+                    f"{model._meta.verbose_name_plural}"
+                )
+            )
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipe.images import process_pending_jobs
+
+
+class Command(BaseCommand):
+    """Django command to process queued recipe images"""
+
+    help = "Process queued recipe image uploads with a local process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Size of the process pool (0 processes in this process)",
+        )
+        parser.add_argument("--batch-size", type=int, default=20)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2,
+            help="Seconds to wait when the queue is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = process_pending_jobs(
+                workers=options["workers"], batch_size=options["batch_size"]
+            )
+            if count:
+                self.stdout.write(f"Processed {count} image(s)")
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["poll_interval"])
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from recipe.stats import rebuild_recipe_stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute the recipe stats counters"""
+
+    help = "Recompute recipe totals and tag/ingredient recipe counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--email",
+            action="append",
+            help="Only rebuild this user's stats (repeatable)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("pk")
+        if options["email"]:
+            users = users.filter(email__in=options["email"])
+        user_ids = list(users.values_list("pk", flat=True))
+
+        batch_size = options["batch_size"]
+        for start in range(0, len(user_ids), batch_size):
+            rebuild_recipe_stats(user_ids[start:start + batch_size])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt stats of {len(user_ids)} user(s)")
+        )
@@ -0,0 +1,146 @@
+"""
+Case-insensitive names of tags and ingredients.
+
+A user owns at most one tag and one ingredient per lowercased name. On
+Postgres this is enforced by the unique (user_id, lower(name)) indexes
+of migration 0015, after migration 0014 merged existing duplicates.
+Names are resolved with one ``lower(name) IN (...)`` query and missing
+ones are inserted with ``INSERT ... ON CONFLICT DO NOTHING``, so
+concurrent upserts of the same name never fail.
+
+Names are only ever lowercased by the database: Python's str.lower()
+folds some characters differently (SQLite only folds ASCII, Postgres
+differs on e.g. "İ" and "ẞ"), and the unique indexes use the database's
+folding.
+"""
+from django.db import connection, transaction
+from django.db.models import CharField, Count, Min, Value
+from django.db.models.functions import Lower
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import bump_cache_version
+from recipe.stats import rebuild_recipe_stats
+
+
+# Recipe M2M field linking each named model
+RECIPE_FIELDS = {Tag: "tags", Ingredient: "ingredients"}
+
+# Names lowercased per query by lower_names
+LOWER_BATCH_SIZE = 500
+
+
+def lower_names(names):
+    """Return {name: lowercased name} as lowercased by the database"""
+    names = list(dict.fromkeys(names))
+    lowered = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(names), LOWER_BATCH_SIZE):
+            batch = names[start:start + LOWER_BATCH_SIZE]
+            cursor.execute(
+                "SELECT " + ", ".join(["LOWER(%s)"] * len(batch)), batch
+            )
+            lowered.update(zip(batch, cursor.fetchone()))
+    return lowered
+
+
+def name_ids(queryset, names=None):
+    """Return {lowercased name: id} of a queryset, optionally filtered
+
+    With legacy duplicates the oldest object of a name wins.
+    """
+    queryset = queryset.annotate(lower_name=Lower("name"))
+    if names is not None:
+        queryset = queryset.filter(
+            lower_name__in=[
+                Lower(Value(name, output_field=CharField()))
+                for name in set(names)
+            ]
+        )
+    return dict(queryset.order_by("-id").values_list("lower_name", "id"))
+
+
+def upsert_names(model, user, names):
+    """Return {name: id} of names, creating the missing ones
+
+    Names differing only in case share one object; the first spelling
+    of a new name is stored.
+    """
+    lowered = lower_names(names)
+    wanted = {}
+    for name, lower_name in lowered.items():
+        wanted.setdefault(lower_name, name)
+    if not wanted:
+        return {}
+
+    queryset = model.objects.filter(user=user)
+    ids = name_ids(queryset, wanted.values())
+    missing = [name for key, name in wanted.items() if key not in ids]
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        # Not every backend returns primary keys from bulk_create, and
+        # rows skipped on conflict never do
+        ids.update(name_ids(queryset, missing))
+    return {name: ids[lower_name] for name, lower_name in lowered.items()}
+
+
+def duplicate_name_users(model):
+    """Return the ids of users owning duplicate names of a model"""
+    return list(
+        model.objects.annotate(lower_name=Lower("name"))
+        .values("user_id", "lower_name")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+        .values_list("user_id", flat=True)
+        .order_by("user_id")
+        .distinct()
+    )
+
+
+def merge_duplicate_names(model, user_id):
+    """Merge a user's objects sharing a lowercased name into the oldest
+
+    Recipe links of the duplicates are moved with one bulk insert and
+    one delete. Returns the number of removed objects.
+    """
+    field = Recipe._meta.get_field(RECIPE_FIELDS[model])
+    through = field.remote_field.through
+    column = f"{field.m2m_reverse_field_name()}_id"
+
+    with transaction.atomic():
+        rows = (
+            model.objects.filter(user_id=user_id)
+            .annotate(lower_name=Lower("name"))
+            .values("lower_name")
+            .annotate(keep_id=Min("id"), rows=Count("id"))
+            .filter(rows__gt=1)
+        )
+        keep_ids = {row["lower_name"]: row["keep_id"] for row in rows}
+        if not keep_ids:
+            return 0
+        duplicates = {
+            pk: keep_ids[lower_name]
+            for pk, lower_name in model.objects.filter(user_id=user_id)
+            .annotate(lower_name=Lower("name"))
+            .filter(lower_name__in=keep_ids)
+            .values_list("id", "lower_name")
+            if pk != keep_ids[lower_name]
+        }
+
+        links = through.objects.filter(**{f"{column}__in": duplicates})
+        through.objects.bulk_create(
+            [
+                through(recipe_id=recipe_id, **{column: duplicates[old_id]})
+                for recipe_id, old_id in links.values_list(
+                    "recipe_id", column
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        links.delete()
+        model.objects.filter(pk__in=duplicates).delete()
+        rebuild_recipe_stats([user_id])
+    bump_cache_version(user_id)
+    return len(duplicates)
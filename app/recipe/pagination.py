@@ -0,0 +1,37 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination for recipes
+
+    Pages seek on the ordering column (e.g. WHERE id < cursor) instead of
+    using OFFSET, so deep pages cost the same as the first one. Ordering
+    requested through OrderingFilter is honoured as well.
+    """
+
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    ordering = ("-id",)
+
+
+class RankedSearchPagination(PageNumberPagination):
+    """Page number pagination for search results ordered by rank
+
+    Ranks are floats shared by many rows, so they make no usable cursor
+    position; ranked results are paged by offset on (rank, id) instead.
+    """
+
+    page_size = RecipeCursorPagination.page_size
+    page_size_query_param = "page_size"
+    max_page_size = RecipeCursorPagination.max_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = queryset.order_by("-rank", "-id")
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    """Keyset pagination for tags and ingredients"""
+
+    ordering = ("-name", "-id")
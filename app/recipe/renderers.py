@@ -0,0 +1,79 @@
+"""
+Line based renderers used by the recipe export.
+
+Besides rendering a response body in one go (e.g. error responses),
+each renderer can stream an iterable of rows as chunks of bytes.
+"""
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer
+
+from core.renderers import FastJSONRenderer
+
+
+# Joins tag/ingredient names in a CSV cell
+CSV_LIST_SEPARATOR = "|"
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Render one JSON document per line"""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return b"".join(self.stream(rows))
+
+    def stream(self, rows, fieldnames=None):
+        """Yield one line per row; ``fieldnames`` is accepted for parity"""
+        renderer = FastJSONRenderer()
+        for row in rows:
+            yield renderer.render(row) + b"\n"
+
+
+class CSVRenderer(BaseRenderer):
+    """Render rows as CSV with a header taken from the first row"""
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return b"".join(self.stream(rows))
+
+    def stream(self, rows, fieldnames=None):
+        """Yield the CSV lines of rows, with a header even for no rows"""
+        buffer = io.StringIO()
+        writer = None
+        if fieldnames is not None:
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+            writer.writeheader()
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(
+                {
+                    key: CSV_LIST_SEPARATOR.join(map(str, value))
+                    if isinstance(value, list)
+                    else value
+                    for key, value in row.items()
+                }
+            )
+            yield self._flush(buffer)
+        if buffer.tell():
+            yield self._flush(buffer)
+
+    def _flush(self, buffer):
+        data = buffer.getvalue().encode(self.charset)
+        buffer.seek(0)
+        buffer.truncate()
+        return data
@@ -0,0 +1,88 @@
+"""
+Full-text search over recipe titles and linked tag/ingredient names.
+
+On Postgres, recipes are matched and ranked against Recipe.search_vector,
+a GIN indexed tsvector kept up to date by the signals in recipe.signals.
+Other databases (e.g. SQLite in tests) fall back to case-insensitive
+LIKE matching of every search word.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connections
+from django.db.models import Exists, F, OuterRef, Q, Subquery, TextField
+
+from core.models import Recipe
+
+
+SEARCH_CONFIG = "english"
+
+
+def uses_postgres(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def _linked_names(field):
+    """Subquery joining the names of the objects linked to a recipe"""
+    m2m_field = Recipe._meta.get_field(field)
+    target = m2m_field.m2m_reverse_field_name()
+    names = (
+        m2m_field.remote_field.through.objects.filter(recipe_id=OuterRef("pk"))
+        .order_by()
+        .values("recipe_id")
+        .annotate(names=StringAgg(f"{target}__name", delimiter=" "))
+        .values("names")
+    )
+    return Subquery(names, output_field=TextField())
+
+
+def search_vector():
+    """Expression computing the search vector of a recipe row"""
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(_linked_names("tags"), weight="B", config=SEARCH_CONFIG)
+        + SearchVector(
+            _linked_names("ingredients"), weight="B", config=SEARCH_CONFIG
+        )
+    )
+
+
+def update_search_vectors(queryset):
+    """Recompute the search vector of the recipes in a queryset"""
+    if uses_postgres(queryset):
+        queryset.update(search_vector=search_vector())
+
+
+def _name_matches(field, word):
+    m2m_field = Recipe._meta.get_field(field)
+    target = m2m_field.m2m_reverse_field_name()
+    return Exists(
+        m2m_field.remote_field.through.objects.filter(
+            recipe_id=OuterRef("pk"), **{f"{target}__name__icontains": word}
+        )
+    )
+
+
+def search_recipes(queryset, text):
+    """Filter recipes matching a search text
+
+    On Postgres the result is annotated with its ``rank``.
+    """
+    if uses_postgres(queryset):
+        query = SearchQuery(
+            text, search_type="websearch", config=SEARCH_CONFIG
+        )
+        return queryset.annotate(
+            rank=SearchRank(F("search_vector"), query)
+        ).filter(search_vector=query)
+
+    for word in text.split():
+        queryset = queryset.filter(
+            Q(title__icontains=word)
+            | _name_matches("tags", word)
+            | _name_matches("ingredients", word)
+        )
+    return queryset
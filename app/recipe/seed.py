@@ -0,0 +1,112 @@
+"""
+Deterministic seeding of throwaway recipe catalogues for benchmarks,
+and the base of the benchmark commands.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.models import Ingredient, Recipe, Tag
+
+
+ADJECTIVES = [
+    "spicy", "smoky", "creamy", "crispy", "roasted", "grilled", "braised",
+    "tangy", "sweet", "savory", "zesty", "hearty", "fresh", "golden",
+]
+DISHES = [
+    "curry", "soup", "salad", "stew", "noodles", "risotto", "tacos",
+    "pancakes", "pie", "burger", "dumplings", "casserole", "omelette",
+]
+INGREDIENTS = [
+    "chicken", "beef", "tofu", "salmon", "prawns", "rice", "potato",
+    "garlic", "ginger", "tomato", "spinach", "mushroom", "cheese", "lime",
+]
+
+
+def seed_catalogue(
+    rng,
+    email,
+    recipes,
+    tags,
+    ingredients,
+    per_recipe,
+    batch_size=5000,
+):
+    """Create a user with a catalogue of linked recipes
+
+    Returns the user and the ids of its tags and ingredients.
+    """
+    user = get_user_model().objects.create_user(email, "benchmark")
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f"Tag {i}") for i in range(tags)
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f"{INGREDIENTS[i % len(INGREDIENTS)]} {i}")
+        for i in range(ingredients)
+    )
+    # Not every backend returns primary keys from bulk_create
+    tag_ids = list(user.tag_set.values_list("id", flat=True))
+    ingredient_ids = list(user.ingredient_set.values_list("id", flat=True))
+    tags_per_recipe = min(per_recipe, len(tag_ids))
+    ingredients_per_recipe = min(per_recipe, len(ingredient_ids))
+
+    for start in range(0, recipes, batch_size):
+        count = min(batch_size, recipes - start)
+        last_id = user.recipe_set.order_by("-id").values_list(
+            "id", flat=True
+        ).first() or 0
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}",
+                time_minutes=rng.randint(5, 180),
+                price=rng.randint(100, 9999) / 100,
+            )
+            for _ in range(count)
+        )
+        recipe_ids = list(
+            user.recipe_set.filter(id__gt=last_id).values_list(
+                "id", flat=True
+            )
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, tags_per_recipe)
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe_id, ingredient_id=ingredient_id
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(
+                ingredient_ids, ingredients_per_recipe
+            )
+        )
+    return user, tag_ids, ingredient_ids
+
+
+class BenchmarkCommand(BaseCommand):
+    """Base of the commands timing queries on a seeded catalogue"""
+
+    def _time(self, func, repeat):
+        """Return the average run time of func in seconds"""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat
+
+    def _report(self, title, queryset, repeat):
+        """Print the query plan and average time of a queryset"""
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(queryset.explain())
+        counts = []
+
+        def run():
+            counts.append(len(queryset.values_list("id", flat=True)))
+
+        elapsed = self._time(run, repeat)
+        self.stdout.write(
+            self.style.SUCCESS(f"{counts[-1]} rows in {elapsed * 1000:.2f} ms")
+        )
@@ -1,31 +1,472 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from core.models import (
+    Ingredient,
+    Recipe,
+    RecipeImageJob,
+    RecipeStats,
+    Tag,
+)
+from core.metrics import TimedSerializerMixin
+from core.storage import rendition_name
+from recipe.names import RECIPE_FIELDS, lower_names, name_ids, upsert_names
+from recipe.stats import (
+    LINKED_FIELDS,
+    add_imported_recipes,
+    apply_bulk_update,
+    counted_values,
+    linked_ids,
+)
+
+
+class BulkListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """List serializer writing all items with bulk queries"""
+
+    def _split_many_to_many(self, validated_data):
+        """Split M2M values off the validated attrs of each item"""
+        m2m_names = {
+            field.name for field in self.child.Meta.model._meta.many_to_many
+        }
+        m2m_data = [
+            {name: attrs.pop(name) for name in m2m_names if name in attrs}
+            for attrs in validated_data
+        ]
+        return m2m_data, sorted(m2m_names)
+
+    def _set_many_to_many(self, objs, m2m_data):
+        """Replace the links of every object with one insert per field"""
+        model = self.child.Meta.model
+        names = {name for values in m2m_data for name in values}
+        for name in names:
+            field = model._meta.get_field(name)
+            through = field.remote_field.through
+            source = f"{field.m2m_field_name()}_id"
+            target = f"{field.m2m_reverse_field_name()}_id"
+            linked = [
+                (obj, values[name])
+                for obj, values in zip(objs, m2m_data)
+                if name in values
+            ]
+            through.objects.filter(
+                **{f"{source}__in": [obj.pk for obj, _ in linked]}
+            ).delete()
+            through.objects.bulk_create(
+                through(**{source: obj.pk, target: related.pk})
+                for obj, related_objs in linked
+                for related in related_objs
+            )
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        m2m_data, m2m_names = self._split_many_to_many(validated_data)
+        objs = [model(**attrs) for attrs in validated_data]
+        if connection.features.can_return_rows_from_bulk_insert:
+            model.objects.bulk_create(objs)
+        else:
+            # Primary keys are needed for the M2M rows
+            for obj in objs:
+                obj.save()
+        self._set_many_to_many(objs, m2m_data)
+        prefetch_related_objects(objs, *m2m_names)
+        return objs
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        m2m_data, m2m_names = self._split_many_to_many(validated_data)
+        fields = {name for attrs in validated_data for name in attrs}
+        auto_now_fields = [
+            field
+            for field in model._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        ]
+        for instance, attrs in zip(instances, validated_data):
+            for name, value in attrs.items():
+                setattr(instance, name, value)
+            for field in auto_now_fields:
+                field.pre_save(instance, add=False)
+        fields.update(field.name for field in auto_now_fields)
+        if fields:
+            model.objects.bulk_update(instances, sorted(fields))
+        self._set_many_to_many(instances, m2m_data)
+        for instance in instances:
+            instance._prefetched_objects_cache = {}
+        prefetch_related_objects(instances, *m2m_names)
+        return instances
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Many related field resolving every submitted value at once"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+
+        return self.child_relation.to_internal_value_many(data)
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to objects of the requesting user
+
+    With many=True all submitted ids are fetched in one id__in query and
+    every missing or foreign id is reported together. With allow_names
+    non numeric strings are passed through as names, for the parent
+    serializer to get or create.
+    """
+
+    default_error_messages = {
+        "does_not_exist_many": 'Invalid pk(s) "{pk_values}" - '
+        "object(s) do not exist.",
+        "invalid_name": 'Invalid name "{name}".',
+    }
+
+    def __init__(self, **kwargs):
+        self.allow_names = kwargs.pop("allow_names", False)
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get("request")
+        if request is not None:
+            queryset = queryset.filter(user=request.user)
+        return queryset
+
+    def to_internal_value_many(self, data):
+        """Return the objects of a list of pks using a single query"""
+        queryset = self.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        names = {}
+        for index, value in enumerate(data):
+            if (
+                self.allow_names
+                and isinstance(value, str)
+                and not value.strip().isdigit()
+            ):
+                names[index] = self._validate_name(value, queryset.model)
+                continue
+            if isinstance(value, bool):
+                self.fail("incorrect_type", data_type=type(value).__name__)
+            try:
+                pks.append(pk_field.to_python(value))
+            except (DjangoValidationError, TypeError):
+                self.fail("incorrect_type", data_type=type(value).__name__)
+
+        objs = queryset.in_bulk(set(pks)) if pks else {}
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objs]
+        if missing:
+            self.fail(
+                "does_not_exist_many",
+                pk_values=", ".join(str(pk) for pk in missing),
+            )
+        values = iter(objs[pk] for pk in pks)
+        return [
+            names[index] if index in names else next(values)
+            for index in range(len(data))
+        ]
+
+    def _validate_name(self, value, model):
+        name = value.strip()
+        if not name or len(name) > model._meta.get_field("name").max_length:
+            self.fail("invalid_name", name=value)
+        return name
+
+
+def parse_field_list(value):
+    """Split a comma separated query param into names"""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def image_variant_urls(image_name, image_variants, request=None):
+    """Return the size and URL per format of each image rendition"""
+    if not image_name:
+        return {}
+
+    variants = {}
+    for rendition, info in image_variants.items():
+        variant = {"width": info["width"], "height": info["height"]}
+        for fmt in info["formats"]:
+            url = default_storage.url(
+                rendition_name(image_name, rendition, fmt)
+            )
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            variant[fmt.lower()] = url
+        variants[rendition] = variant
+    return variants
+
+
+class SparseFieldsMixin(TimedSerializerMixin):
+    """Render only the fields listed in ?fields= and nest ?expand= ones
+
+    Applies to safe requests only; the viewsets use the same params to
+    restrict the columns and prefetches of their querysets.
+    """
+
+    # Relation name -> nested serializer class used with ?expand=
+    expandable_fields = {}
+    # Serializer field -> model columns it reads, for non model fields
+    field_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if getattr(request, "method", None) not in SAFE_METHODS:
+            return
+
+        requested = self.requested_fields(request)
+        if requested is not None:
+            unknown = set(requested) - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError(
+                    {"fields": [f"Unknown field(s): {', '.join(unknown)}"]}
+                )
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+        for name in self.expanded_fields(request):
+            if name in self.fields:
+                self.fields[name] = self.expandable_fields[name](
+                    many=True, read_only=True
+                )
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Return the field names requested with ?fields= or None"""
+        return parse_field_list(request.query_params.get("fields")) or None
+
+    @classmethod
+    def expanded_fields(cls, request):
+        """Return the relations requested with ?expand="""
+        requested = parse_field_list(request.query_params.get("expand"))
+        return [name for name in requested if name in cls.expandable_fields]
+
+    @classmethod
+    def model_columns(cls, names):
+        """Return the model columns needed to render some fields"""
+        model = cls.Meta.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+        columns = {"id"}
+        for name in names:
+            if name in concrete:
+                columns.add(name)
+            columns.update(cls.field_columns.get(name, ()))
+        return columns
+
+
+def _name_taken_message(model):
+    return f"{model._meta.verbose_name} with this name already exists."
+
+
+class UniqueNameListSerializer(BulkListSerializer):
+    """Bulk list serializer rejecting names used twice, ignoring case
+
+    Checks every item against the batch and the user's other objects
+    with a single query.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        request = self.context.get("request")
+        names = [item["name"] for item in items if "name" in item]
+        if request is None or not names:
+            return items
+
+        model = self.child.Meta.model
+        own_ids = [instance.pk for instance in self.instance or ()]
+        taken = name_ids(
+            model.objects.filter(user=request.user).exclude(pk__in=own_ids),
+            names,
+        )
+        lowered = lower_names(names)
+        counts = Counter(lowered[name] for name in names)
+        errors = [
+            {"name": [_name_taken_message(model)]}
+            if "name" in item
+            and (
+                counts[lowered[item["name"]]] > 1
+                or lowered[item["name"]] in taken
+            )
+            else {}
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+
+class UniqueNameMixin:
+    """Reject names the user already has, ignoring case"""
+
+    def validate_name(self, value):
+        request = self.context.get("request")
+        # Bulk writes are checked once by UniqueNameListSerializer
+        in_bulk = isinstance(self.parent, serializers.ListSerializer)
+        if request is None or in_bulk:
+            return value
+
+        model = self.Meta.model
+        others = model.objects.filter(user=request.user)
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if name_ids(others, [value]):
+            raise serializers.ValidationError(_name_taken_message(model))
+        return value
+
 
-from core.models import Tag, Ingredient, Recipe
+class RecipeCountMixin:
+    """Render the maintained recipe_count of objects on ?with_counts=1
 
+    The viewset puts the validated param in the ``with_counts`` context.
+    """
 
-class TagSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.context.get("with_counts"):
+            self.fields["recipe_count"] = serializers.IntegerField(
+                read_only=True
+            )
+
+
+class TagSerializer(
+    UniqueNameMixin,
+    RecipeCountMixin,
+    SparseFieldsMixin,
+    serializers.ModelSerializer,
+):
     class Meta:
         model = Tag
         fields = ("id", "name")
         read_only_fields = ("id",)
+        list_serializer_class = UniqueNameListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    UniqueNameMixin,
+    RecipeCountMixin,
+    SparseFieldsMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for ingredient objects"""
 
     class Meta:
         model = Ingredient
         fields = ("id", "name")
         read_only_fields = ("id",)
+        list_serializer_class = UniqueNameListSerializer
+
+
+class NameUpsertSerializer(serializers.Serializer):
+    """Validate a batch of tag or ingredient names to get or create"""
+
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=1000,
+    )
+
+
+def resolve_names(user, items):
+    """Get or create the tags and ingredients given by name
+
+    Replaces the names in the validated data of every item by objects,
+    with one upsert per model. Called when saving, so only valid writes
+    create names.
+    """
+    for model, field in RECIPE_FIELDS.items():
+        names = [
+            value
+            for attrs in items
+            for value in attrs.get(field) or []
+            if isinstance(value, str)
+        ]
+        if not names:
+            continue
+        ids = upsert_names(model, user, names)
+        objs = model.objects.in_bulk(ids.values())
+        for attrs in items:
+            if field in attrs:
+                attrs[field] = list(
+                    dict.fromkeys(
+                        objs[ids[value]] if isinstance(value, str) else value
+                        for value in attrs[field]
+                    )
+                )
+
+
+class RecipeBulkListSerializer(BulkListSerializer):
+    """Bulk list serializer counting the written recipes in the stats
+
+    Bulk inserts and updates skip the signals maintaining the counters
+    of recipe.stats, so their deltas are applied here.
+    """
 
+    def create(self, validated_data):
+        resolve_names(self.context["request"].user, validated_data)
+        recipes = super().create(validated_data)
+        if not recipes:
+            return recipes
+        if connection.features.can_return_rows_from_bulk_insert:
+            values = counted_values(recipes)
+        else:
+            # Saved one by one, so the signals counted the recipes
+            values = []
+        add_imported_recipes(
+            recipes[0].user_id,
+            values,
+            linked_ids([recipe.pk for recipe in recipes]),
+        )
+        return recipes
+
+    def update(self, instances, validated_data):
+        if not instances:
+            return super().update(instances, validated_data)
+        resolve_names(self.context["request"].user, validated_data)
+        fields = {name for attrs in validated_data for name in attrs}
+        models = [
+            model for model, field in LINKED_FIELDS.items() if field in fields
+        ]
+        ids = [recipe.pk for recipe in instances]
+        old_values = counted_values(instances)
+        old_links = linked_ids(ids, models)
+        recipes = super().update(instances, validated_data)
+        apply_bulk_update(
+            recipes[0].user_id,
+            old_values,
+            counted_values(recipes),
+            old_links,
+            linked_ids(ids, models),
+        )
+        return recipes
 
-class RecipeSerializer(serializers.ModelSerializer):
-    ingredients = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Ingredient.objects.all()
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    ingredients = UserPrimaryKeyRelatedField(
+        many=True, queryset=Ingredient.objects.all(), allow_names=True
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
+    tags = UserPrimaryKeyRelatedField(
+        many=True, queryset=Tag.objects.all(), allow_names=True
     )
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -37,8 +478,31 @@ class RecipeSerializer(serializers.ModelSerializer):
             "link",
             "ingredients",
             "tags",
+            "image_variants",
         )
         read_only_fields = ("id",)
+        list_serializer_class = RecipeBulkListSerializer
+
+    expandable_fields = {
+        "tags": TagSerializer,
+        "ingredients": IngredientSerializer,
+    }
+    field_columns = {"image_variants": ("image", "image_variants")}
+
+    def get_image_variants(self, obj):
+        return image_variant_urls(
+            obj.image.name, obj.image_variants, self.context.get("request")
+        )
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            resolve_names(self.context["request"].user, [validated_data])
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            resolve_names(self.context["request"].user, [validated_data])
+            return super().update(instance, validated_data)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -55,3 +519,66 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ("id", "image")
         read_only_fields = ("id",)
+
+
+class RecipeImageJobSerializer(serializers.ModelSerializer):
+    """Serializer for recipe image processing jobs"""
+
+    class Meta:
+        model = RecipeImageJob
+        fields = ("id", "recipe", "status", "error", "created_at")
+        read_only_fields = fields
+
+
+class RecipeAttrCountSerializer(serializers.Serializer):
+    """Serialize the recipe count of a tag or ingredient"""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipe_count = serializers.IntegerField()
+
+
+class RecipeAttrQuerySerializer(serializers.Serializer):
+    """Validate the query params of a tag or ingredient list"""
+
+    assigned_only = serializers.BooleanField(default=False)
+    with_counts = serializers.BooleanField(default=False)
+
+
+class RecipeFilterQuerySerializer(serializers.Serializer):
+    """Validate how recipes must match ?tags= and ?ingredients="""
+
+    match = serializers.ChoiceField(choices=["any", "all"], default="any")
+
+
+class SuggestQuerySerializer(serializers.Serializer):
+    """Validate the query params of a name suggestion request"""
+
+    q = serializers.CharField(max_length=255)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.RECIPE_SUGGEST["MAX_LIMIT"],
+        default=settings.RECIPE_SUGGEST["DEFAULT_LIMIT"],
+    )
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """Serialize the recipe statistics of a user"""
+
+    avg_time_minutes = serializers.FloatField(allow_null=True)
+    avg_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, allow_null=True
+    )
+    tags = RecipeAttrCountSerializer(many=True)
+    ingredients = RecipeAttrCountSerializer(many=True)
+
+    class Meta:
+        model = RecipeStats
+        fields = (
+            "recipe_count",
+            "avg_time_minutes",
+            "avg_price",
+            "tags",
+            "ingredients",
+        )
+        read_only_fields = fields
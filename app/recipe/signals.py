@@ -0,0 +1,197 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag
+
+from recipe.cache import bump_cache_version
+from recipe.search import update_search_vectors
+from recipe.stats import (
+    apply_link_delta,
+    apply_recipe_delta,
+    invalidate_recipe_totals,
+)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Invalidate the owner's cached responses on any write"""
+    bump_cache_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_user_cache_on_links(sender, instance, action, **kwargs):
+    """Touch the changed object and invalidate the owner's responses"""
+    if action.startswith("post_"):
+        type(instance).objects.filter(pk=instance.pk).update(
+            updated_at=timezone.now()
+        )
+        bump_cache_version(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cache_on_user_save(sender, instance, **kwargs):
+    """Start every new or updated user from a fresh cache version"""
+    bump_cache_version(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, update_fields, **kwargs):
+    """Reindex a recipe whose title may have changed"""
+    if update_fields is None or "title" in update_fields:
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_linked_search_vectors(sender, instance, created, **kwargs):
+    """Reindex the recipes of a renamed tag or ingredient"""
+    if not created:
+        update_search_vectors(instance.recipe_set.all())
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_linked_recipes(sender, instance, **kwargs):
+    """Remember the recipes of an object before its links are removed"""
+    instance._linked_recipe_ids = list(
+        instance.recipe_set.values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_unlinked_search_vectors(sender, instance, **kwargs):
+    """Reindex the recipes of a deleted tag or ingredient"""
+    update_search_vectors(
+        Recipe.objects.filter(pk__in=instance._linked_recipe_ids)
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_search_vectors_on_links(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Reindex the recipes whose tags or ingredients changed"""
+    if not reverse:
+        if action.startswith("post_"):
+            update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+    elif action == "pre_clear":
+        remember_linked_recipes(sender, instance)
+    elif action == "post_clear":
+        update_unlinked_search_vectors(sender, instance)
+    elif action.startswith("post_"):
+        update_search_vectors(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_init, sender=Recipe)
+def remember_recipe_totals(sender, instance, **kwargs):
+    """Remember the loaded values counted in the user's totals"""
+    instance._counted_values = (
+        instance.__dict__.get("time_minutes"),
+        instance.__dict__.get("price"),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_totals(sender, instance, created, update_fields, **kwargs):
+    """Add a new recipe or the change of an existing one to the totals"""
+    if update_fields is not None and not {"time_minutes", "price"} & set(
+        update_fields
+    ):
+        return
+    old_time, old_price = instance._counted_values
+    if created:
+        apply_recipe_delta(
+            instance.user_id, 1, instance.time_minutes, instance.price
+        )
+    elif old_time is None or old_price is None:
+        # The old values were deferred, so the delta is unknown
+        invalidate_recipe_totals(instance.user_id)
+    else:
+        apply_recipe_delta(
+            instance.user_id,
+            0,
+            int(instance.time_minutes) - int(old_time),
+            Decimal(str(instance.price)) - Decimal(str(old_price)),
+        )
+    instance._counted_values = (instance.time_minutes, instance.price)
+
+
+@receiver(pre_delete, sender=Recipe)
+def uncount_recipe_links(sender, instance, **kwargs):
+    """Uncount the links of a recipe before they are cascade deleted"""
+    for model, through in (
+        (Tag, Recipe.tags.through),
+        (Ingredient, Recipe.ingredients.through),
+    ):
+        apply_link_delta(
+            model,
+            through.objects.filter(recipe_id=instance.pk).values(
+                f"{model._meta.model_name}_id"
+            ),
+            -1,
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_recipe(sender, instance, **kwargs):
+    """Remove a deleted recipe from the totals"""
+    time_minutes, price = instance._counted_values
+    if time_minutes is None or price is None:
+        invalidate_recipe_totals(instance.user_id)
+    else:
+        apply_recipe_delta(instance.user_id, -1, -time_minutes, -price)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_link_counts(
+    sender, instance, action, reverse, model, pk_set, **kwargs
+):
+    """Count added links and uncount removed ones
+
+    Removals are uncounted before they happen, from the links that
+    actually exist (pk_set may hold ids that are not linked).
+    """
+    if action not in ("post_add", "pre_remove", "pre_clear"):
+        return
+
+    if reverse:
+        # instance is a tag or ingredient and pk_set holds recipe ids
+        links = sender.objects.filter(
+            **{f"{instance._meta.model_name}_id": instance.pk}
+        )
+        if action == "post_add":
+            delta = len(pk_set)
+        elif action == "pre_remove":
+            delta = -links.filter(recipe_id__in=pk_set).count()
+        else:
+            delta = -links.count()
+        apply_link_delta(type(instance), [instance.pk], delta)
+        return
+
+    if action == "post_add":
+        apply_link_delta(model, pk_set, 1)
+        return
+    column = f"{model._meta.model_name}_id"
+    links = sender.objects.filter(recipe_id=instance.pk)
+    if action == "pre_remove":
+        links = links.filter(**{f"{column}__in": pk_set})
+    apply_link_delta(model, links.values(column), -1)
@@ -0,0 +1,165 @@
+"""
+Per-user recipe statistics served from counters.
+
+RecipeStats holds the running totals of a user's recipes and
+Tag/Ingredient.recipe_count the number of recipes linked to each one,
+so reading them never aggregates the catalogue. The signals in
+recipe.signals apply deltas as recipes and their links change. Writes
+that skip signals (imports, bulk endpoints) report their deltas
+instead. A missing RecipeStats row is rebuilt the next time it is read.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Ingredient, Recipe, RecipeStats, Tag
+
+
+# Counted model -> Recipe M2M field linking to it
+LINKED_FIELDS = {Tag: "tags", Ingredient: "ingredients"}
+
+
+def _link_column(model):
+    return Recipe._meta.get_field(LINKED_FIELDS[model]).m2m_reverse_name()
+
+
+def apply_recipe_delta(user_id, count, time_minutes, price):
+    """Add to the recipe totals of a user
+
+    Nothing happens while the user has no RecipeStats row; it is built
+    from the catalogue on the next read instead.
+    """
+    RecipeStats.objects.filter(user_id=user_id).update(
+        recipe_count=F("recipe_count") + count,
+        total_time_minutes=F("total_time_minutes") + int(time_minutes),
+        total_price=F("total_price") + Decimal(str(price)),
+    )
+
+
+def invalidate_recipe_totals(user_id):
+    """Drop the totals of a user so they are rebuilt on the next read"""
+    RecipeStats.objects.filter(user_id=user_id).delete()
+
+
+def apply_link_delta(model, ids, delta):
+    """Add ``delta`` to the recipe count of some tags or ingredients"""
+    model.objects.filter(pk__in=ids).update(
+        recipe_count=F("recipe_count") + delta
+    )
+
+
+def _apply_link_counts(model, counts):
+    """Apply a Counter of recipe count deltas by tag/ingredient id"""
+    # One UPDATE per distinct delta
+    ids_by_delta = defaultdict(list)
+    for related_id, delta in counts.items():
+        if delta:
+            ids_by_delta[delta].append(related_id)
+    for delta, ids in ids_by_delta.items():
+        apply_link_delta(model, ids, delta)
+
+
+def counted_values(recipes):
+    """Return the (time_minutes, price) pairs counted for recipes"""
+    return [(recipe.time_minutes, recipe.price) for recipe in recipes]
+
+
+def linked_ids(recipe_ids, models=tuple(LINKED_FIELDS)):
+    """Return {Tag/Ingredient: related id of every link} of recipes"""
+    return {
+        model: list(
+            getattr(Recipe, LINKED_FIELDS[model])
+            .through.objects.filter(recipe_id__in=recipe_ids)
+            .values_list(_link_column(model), flat=True)
+        )
+        for model in models
+    }
+
+
+def add_imported_recipes(user_id, recipes, links):
+    """Count recipes written without signals
+
+    ``recipes`` holds (time_minutes, price) pairs and ``links`` maps
+    Tag/Ingredient to the related id of every new link.
+    """
+    if recipes:
+        apply_recipe_delta(
+            user_id,
+            len(recipes),
+            sum(time_minutes for time_minutes, _ in recipes),
+            sum((Decimal(str(price)) for _, price in recipes), Decimal(0)),
+        )
+    for model, related_ids in links.items():
+        _apply_link_counts(model, Counter(related_ids))
+
+
+def apply_bulk_update(user_id, old_values, new_values, old_links, new_links):
+    """Count recipes updated without signals
+
+    Values are the (time_minutes, price) pairs of the recipes before and
+    after the update, and links map Tag/Ingredient to their related ids
+    before and after it.
+    """
+    apply_recipe_delta(
+        user_id,
+        0,
+        sum(int(time) for time, _ in new_values)
+        - sum(int(time) for time, _ in old_values),
+        sum((Decimal(str(price)) for _, price in new_values), Decimal(0))
+        - sum((Decimal(str(price)) for _, price in old_values), Decimal(0)),
+    )
+    for model, related_ids in new_links.items():
+        counts = Counter(related_ids)
+        counts.subtract(old_links[model])
+        _apply_link_counts(model, counts)
+
+
+def rebuild_recipe_stats(user_ids):
+    """Recompute all counters of some users from their catalogues"""
+    user_ids = list(user_ids)
+    for model in LINKED_FIELDS:
+        column = _link_column(model)
+        through = getattr(Recipe, LINKED_FIELDS[model]).through
+        counts = (
+            through.objects.filter(**{column: OuterRef("pk")})
+            .order_by()
+            .values(column)
+            .annotate(count=Count("*"))
+            .values("count")
+        )
+        model.objects.filter(user_id__in=user_ids).update(
+            recipe_count=Coalesce(Subquery(counts), Value(0))
+        )
+
+    totals = {
+        row["user_id"]: row
+        for row in Recipe.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values("user_id")
+        .annotate(
+            count=Count("id"),
+            time_minutes=Sum("time_minutes"),
+            price=Sum("price"),
+        )
+    }
+    for user_id in user_ids:
+        row = totals.get(user_id, {})
+        RecipeStats.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                "recipe_count": row.get("count", 0),
+                "total_time_minutes": row.get("time_minutes", 0),
+                "total_price": row.get("price", 0),
+            },
+        )
+
+
+def get_recipe_stats(user):
+    """Return the RecipeStats of a user, building it when missing"""
+    try:
+        return RecipeStats.objects.get(user=user)
+    except RecipeStats.DoesNotExist:
+        rebuild_recipe_stats([user.pk])
+        return RecipeStats.objects.get(user=user)
@@ -0,0 +1,205 @@
+"""
+Prefix suggestions of tag and ingredient names ranked by usage.
+
+Names are matched case-insensitively from their first character and
+ranked by recipe_count, then name. Names and the prefix are lowercased
+by the database only (see recipe.names), so both paths below agree.
+The database answers with a ``lower(name) LIKE 'prefix%'`` query,
+served on Postgres by the unique ``(user_id, lower(name)
+text_pattern_ops)`` indexes of migration 0015.
+
+Users who keep asking get an in-process prefix trie instead. Every
+trie node stores its best ranked entries, so a lookup only walks the
+prefix; nodes holding few enough entries are not split any further and
+are filtered on lookup instead. Tries are tagged with the user's
+response cache version and are rebuilt after any write to the user's
+recipe data. The number of names held in tries is bounded per user and
+per process.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.functions import Lower
+
+from recipe.cache import get_cache_version
+from recipe.names import lower_names
+
+
+FIELDS = ("id", "name", "recipe_count")
+
+
+def _rank(row):
+    entry_id, _, recipe_count, lower_name = row
+    return (-recipe_count, lower_name, entry_id)
+
+
+def trie_rows(queryset):
+    """Return the (id, name, recipe_count, lowercased name) rows of a
+    queryset for a PrefixTrie"""
+    return queryset.annotate(lower_name=Lower("name")).values_list(
+        *FIELDS, "lower_name"
+    )
+
+
+class PrefixTrie:
+    """Lowercase prefix trie keeping the ``depth`` best entries per node
+
+    Built from trie_rows(); entries are (id, name, recipe_count) tuples.
+    A node is a pair of its children by next character and its best
+    (lowercased name, entry) pairs; nodes with at most ``depth`` entries
+    below them have no children and keep them all.
+    """
+
+    def __init__(self, rows, depth):
+        self.depth = depth
+        self.size = 0
+        ranked = []
+        for row in sorted(rows, key=_rank):
+            ranked.append((row[3], row[:3]))
+            self.size += 1
+        self.root = self._node(ranked, 0)
+
+    def _node(self, ranked, index):
+        # ranked holds the (lowercased name, row) pairs sharing a prefix
+        # of length index, in rank order
+        best = ranked[: self.depth]
+        if len(ranked) <= self.depth:
+            return None, best
+        groups = {}
+        for key, row in ranked:
+            if len(key) > index:
+                groups.setdefault(key[index], []).append((key, row))
+        children = {
+            char: self._node(group, index + 1)
+            for char, group in groups.items()
+        }
+        return children, best
+
+    def search(self, prefix, limit):
+        """Return the best ``limit`` entries starting with prefix
+
+        The prefix must be lowercased by the database. Only answers
+        limits up to the depth of the trie.
+        """
+        children, best = self.root
+        for char in prefix:
+            if children is None:
+                best = [pair for pair in best if pair[0].startswith(prefix)]
+                break
+            node = children.get(char)
+            if node is None:
+                return []
+            children, best = node
+        return [dict(zip(FIELDS, row)) for _, row in best[:limit]]
+
+
+def suggest_from_db(queryset, prefix, limit):
+    """Return the best ranked rows of a queryset starting with prefix
+
+    The prefix must be lowercased by the database.
+    """
+    return list(
+        queryset.annotate(lower_name=Lower("name"))
+        .filter(lower_name__startswith=prefix)
+        .order_by("-recipe_count", "lower_name", "id")
+        .values(*FIELDS)[:limit]
+    )
+
+
+class SuggestionCache:
+    """Per-process LRU of prefix tries keyed by model and user
+
+    A user gets a trie after ``hot_after`` lookups against the same
+    cache version, unless they own more than ``max_names`` names. The
+    least recently used tries are dropped to keep at most ``max_users``
+    users and ``max_total_names`` names in tries.
+    """
+
+    def __init__(
+        self,
+        max_users=256,
+        max_names=10000,
+        max_total_names=100000,
+        hot_after=3,
+        depth=10,
+    ):
+        self.max_users = max_users
+        self.max_names = max_names
+        self.max_total_names = max_total_names
+        self.hot_after = hot_after
+        self.depth = depth
+        self.total_names = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        config = settings.RECIPE_SUGGEST
+        return cls(
+            max_users=config.get("TRIE_MAX_USERS", 256),
+            max_names=config.get("TRIE_MAX_NAMES", 10000),
+            max_total_names=config.get("TRIE_MAX_TOTAL_NAMES", 100000),
+            hot_after=config.get("TRIE_HOT_AFTER", 3),
+            depth=config.get("TRIE_DEPTH", config["DEFAULT_LIMIT"]),
+        )
+
+    def suggest(self, queryset, user_id, prefix, limit):
+        """Return up to ``limit`` suggestions of a user's names"""
+        prefix = lower_names([prefix])[prefix]
+        if limit > self.depth:
+            return suggest_from_db(queryset, prefix, limit)
+        key = (queryset.model._meta.label, user_id)
+        version = get_cache_version(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["version"] != version:
+                self._pop(key)
+                entry = {"version": version, "lookups": 0, "trie": None}
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            entry["lookups"] += 1
+            trie = entry["trie"]
+            build = trie is None and entry["lookups"] == self.hot_after
+            while len(self._entries) > self.max_users:
+                self._pop(next(iter(self._entries)))
+
+        if trie is None and build:
+            trie = self._build(queryset)
+            if trie is not None:
+                with self._lock:
+                    self._store(key, entry, trie)
+        if trie is None:
+            return suggest_from_db(queryset, prefix, limit)
+        return trie.search(prefix, limit)
+
+    def _build(self, queryset):
+        rows = list(trie_rows(queryset)[: self.max_names + 1])
+        if len(rows) > self.max_names:
+            return None
+        return PrefixTrie(rows, self.depth)
+
+    def _store(self, key, entry, trie):
+        """Attach a built trie unless its entry was dropped meanwhile"""
+        if self._entries.get(key) is not entry or entry["trie"] is not None:
+            return
+        entry["trie"] = trie
+        self.total_names += trie.size
+        for other, other_entry in list(self._entries.items()):
+            if self.total_names <= self.max_total_names:
+                break
+            if other != key and other_entry["trie"] is not None:
+                self._pop(other)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry["trie"] is not None:
+            self.total_names -= entry["trie"].size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_names = 0
+
+
+suggestion_cache = SuggestionCache.from_settings()
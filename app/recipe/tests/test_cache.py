@@ -0,0 +1,242 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Tag
+from core.routers import ReplicaRouter
+from core.tests.utils import sample_recipe
+
+from recipe.cache import get_cache
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+
+
+def detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", kwargs={"pk": recipe_id})
+
+
+REPLICA = {
+    "ALIAS": "replica",
+    "STICKY_SECONDS": 5,
+    "STICKY_COOKIE": "db_primary_until",
+    "STICKY_CACHE": "recipe",
+}
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag support on recipe resources"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            "etag@recipe.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_returns_validators(self):
+        """Test list responses carry an ETag but no Last-Modified"""
+        sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", res)
+        self.assertNotIn("Last-Modified", res)
+
+    def test_if_modified_since_after_delete(self):
+        """Test deleting an older recipe is not answered with 304"""
+        old = sample_recipe(user=self.user)
+        sample_recipe(user=self.user)
+        since = http_date(time.time() + 60)
+        old.delete()
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_MODIFIED_SINCE=since)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_matching_etag_returns_not_modified(self):
+        """Test a matching If-None-Match is answered with 304"""
+        recipe = sample_recipe(user=self.user)
+        res = self.client.get(detail_url(recipe.id))
+
+        res = self.client.get(
+            detail_url(recipe.id), HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+
+    def test_etag_changes_after_write(self):
+        """Test the ETag changes when the collection changes"""
+        recipe = sample_recipe(user=self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_etag_differs_per_query(self):
+        """Test different pages of the same collection differ in ETag"""
+        sample_recipe(user=self.user)
+        res1 = self.client.get(RECIPES_URL)
+        res2 = self.client.get(RECIPES_URL, {"ordering": "title"})
+
+        self.assertNotEqual(res1["ETag"], res2["ETag"])
+
+
+class ResponseCacheTests(TestCase):
+    """Test the per-user versioned response cache"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            "cache@recipe.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_repeated_list_served_from_cache(self):
+        """Test an unchanged list is served without serializing again"""
+        sample_recipe(user=self.user)
+        res1 = self.client.get(RECIPES_URL)
+
+        # Only the validators query runs
+        with self.assertNumQueries(1):
+            res2 = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res1.data, res2.data)
+
+    def test_query_params_are_part_of_key(self):
+        """Test different query params are cached separately"""
+        sample_recipe(user=self.user, time_minutes=5)
+        sample_recipe(user=self.user, time_minutes=50)
+        self.client.get(RECIPES_URL, {"ordering": "time_minutes"})
+
+        res = self.client.get(RECIPES_URL, {"ordering": "-time_minutes"})
+
+        self.assertEqual(res.data["results"][0]["time_minutes"], 50)
+
+    def test_api_write_invalidates_cache(self):
+        """Test creating a recipe through the API invalidates the list"""
+        self.client.get(RECIPES_URL)
+        payload = {"title": "Pancakes", "time_minutes": 5, "price": 3.00}
+        self.client.post(RECIPES_URL, payload)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_model_write_invalidates_cache(self):
+        """Test writes outside the API invalidate through signals"""
+        recipe = sample_recipe(user=self.user)
+        self.client.get(detail_url(recipe.id))
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.data["tags"][0]["name"], "Vegan")
+
+    def test_cache_limited_to_user(self):
+        """Test cached responses are never shared between users"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        self.client.get(TAGS_URL)
+        user2 = get_user_model().objects.create_user(
+            "other@recipe.com", "testpass4321"
+        )
+        client2 = APIClient()
+        client2.force_authenticate(user=user2)
+
+        res = client2.get(TAGS_URL)
+
+        self.assertEqual(res.data["results"], [])
+
+
+@override_settings(DATABASE_REPLICA=REPLICA)
+class ReplicaCacheTests(TestCase):
+    """Test replica reads never put stale data into the response cache"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            "replica@recipe.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def unpin(self):
+        """End the sticky window opened by writing the fixtures"""
+        routers._pin_cache().delete(routers._pin_key(self.user.pk))
+
+    def read_aliases(self, client, url, on_read=None):
+        """GET url, returning the aliases its reads were routed to"""
+        aliases = []
+
+        def record(router, model, **hints):
+            # Tests run in a transaction, which the router reads from the
+            # primary, and the test database has no replica
+            aliases.append(routers.read_alias.get() or "default")
+            if on_read is not None:
+                on_read()
+            return "default"
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", record):
+            res = client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return aliases
+
+    def test_replica_reads_cached(self):
+        """Test reads of users who did not write recently use the replica"""
+        sample_recipe(user=self.user)
+        self.unpin()
+
+        aliases = self.read_aliases(self.client, RECIPES_URL)
+        self.assertEqual(set(aliases), {"replica"})
+
+        # Only the validators are read again
+        aliases = self.read_aliases(self.client, RECIPES_URL)
+        self.assertEqual(aliases, ["replica"])
+
+    def test_replica_read_racing_write_not_cached(self):
+        """Test a replica read overlapping a write is not cached"""
+        sample_recipe(user=self.user)
+        self.unpin()
+
+        self.read_aliases(
+            self.client,
+            RECIPES_URL,
+            on_read=lambda: routers.pin_user(self.user.pk),
+        )
+        self.unpin()
+
+        aliases = self.read_aliases(self.client, RECIPES_URL)
+        self.assertGreater(len(aliases), 1)
+
+    def test_writer_pinned_on_every_client(self):
+        """Test a user who wrote reads from the primary without a cookie"""
+        sample_recipe(user=self.user)
+        self.unpin()
+        self.assertIn("replica", self.read_aliases(self.client, RECIPES_URL))
+
+        payload = {"title": "Pancakes", "time_minutes": 5, "price": 3.00}
+        self.client.post(RECIPES_URL, payload)
+        other_device = APIClient()
+        other_device.force_authenticate(user=self.user)
+
+        aliases = self.read_aliases(other_device, RECIPES_URL)
+
+        self.assertEqual(set(aliases), {"default"})
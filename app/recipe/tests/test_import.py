@@ -0,0 +1,225 @@
+"""
+Tests for the import_recipes management command
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import ImportCheckpoint, Ingredient, Recipe, Tag
+from recipe.importer import read_checkpoint, write_checkpoint
+from recipe.stats import get_recipe_stats
+
+
+def ndjson_row(title, tags=(), ingredients=()):
+    return json.dumps(
+        {
+            "title": title,
+            "time_minutes": 10,
+            "price": "4.50",
+            "tags": list(tags),
+            "ingredients": list(ingredients),
+        }
+    )
+
+
+class ImportRecipesTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "import@recipe.com", "testpass1234"
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as stream:
+            stream.write(content)
+        return path
+
+    def _import(self, path, *args):
+        call_command(
+            "import_recipes",
+            path,
+            "--email",
+            self.user.email,
+            *args,
+            stdout=StringIO(),
+        )
+
+    def test_import_ndjson(self):
+        """Test recipes are imported with shared tags and ingredients"""
+        existing = Tag.objects.create(user=self.user, name="Vegan")
+        path = self._write(
+            "recipes.ndjson",
+            "\n".join(
+                [
+                    ndjson_row("Soup", ["Vegan", "Hot"], ["Leek"]),
+                    ndjson_row("Salad", ["Vegan"], ["Leek", "Lime"]),
+                    ndjson_row("Toast"),
+                ]
+            ),
+        )
+
+        self._import(path, "--batch-size", "2")
+
+        recipes = Recipe.objects.filter(user=self.user).order_by("id")
+        self.assertEqual(
+            [recipe.title for recipe in recipes], ["Soup", "Salad", "Toast"]
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertIn(existing, recipes[1].tags.all())
+        self.assertEqual(
+            sorted(recipes[1].ingredients.values_list("name", flat=True)),
+            ["Leek", "Lime"],
+        )
+        self.assertEqual(Ingredient.objects.count(), 2)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_import_matches_names_ignoring_case(self):
+        """Test imported names reuse objects differing only in case"""
+        existing = Ingredient.objects.create(user=self.user, name="Salt")
+        path = self._write(
+            "recipes.ndjson",
+            ndjson_row("Chips", ["Snack", "SNACK"], ["salt", "SALT"]),
+        )
+
+        self._import(path)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(list(recipe.ingredients.all()), [existing])
+        self.assertEqual(
+            list(recipe.tags.values_list("name", flat=True)), ["Snack"]
+        )
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+    def test_import_updates_stats(self):
+        """Test imported recipes and links are counted"""
+        get_recipe_stats(self.user)
+        path = self._write(
+            "recipes.ndjson",
+            "\n".join(
+                [
+                    ndjson_row("Soup", ["Vegan", "Vegan"], ["Leek"]),
+                    ndjson_row("Salad", ["Vegan"]),
+                ]
+            ),
+        )
+
+        self._import(path)
+
+        stats = get_recipe_stats(self.user)
+        self.assertEqual(
+            (stats.recipe_count, str(stats.total_price)), (2, "9.00")
+        )
+        self.assertEqual(Tag.objects.get(name="Vegan").recipe_count, 2)
+        self.assertEqual(Ingredient.objects.get(name="Leek").recipe_count, 1)
+
+    def test_import_csv_export_roundtrip(self):
+        """Test a CSV export of one user imports into another"""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Pie", time_minutes=30, price="7.25"
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Sweet"))
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        res = client.get(reverse("recipe:recipe-export"), {"format": "csv"})
+        path = self._write(
+            "recipes.csv", b"".join(res.streaming_content).decode()
+        )
+        self.user = get_user_model().objects.create_user(
+            "copy@recipe.com", "testpass1234"
+        )
+
+        self._import(path)
+
+        copy = Recipe.objects.get(user=self.user)
+        self.assertEqual(
+            (copy.title, copy.time_minutes, str(copy.price)),
+            ("Pie", 30, "7.25"),
+        )
+        self.assertEqual(copy.tags.get().name, "Sweet")
+        self.assertEqual(copy.tags.get().user, self.user)
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test rows recorded in the checkpoint are skipped"""
+        path = self._write(
+            "recipes.ndjson",
+            "\n".join(ndjson_row(title) for title in ("A", "B", "C")),
+        )
+        write_checkpoint(self.user, path, 2)
+
+        self._import(path)
+
+        titles = Recipe.objects.values_list("title", flat=True)
+        self.assertEqual(list(titles), ["C"])
+
+    def test_import_invalid_row_keeps_checkpoint(self):
+        """Test a bad row stops the import after the committed batches"""
+        path = self._write(
+            "recipes.ndjson",
+            "\n".join(
+                [ndjson_row("A"), '{"title": "B", "price": "1"}']
+            ),
+        )
+
+        with self.assertRaisesMessage(CommandError, "line 2"):
+            self._import(path, "--batch-size", "1")
+
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(read_checkpoint(self.user, path), 1)
+
+    def test_rows_checked_against_field_limits(self):
+        """Test values the database would reject fail on their line"""
+        valid = json.loads(ndjson_row("A"))
+        long_name = "x" * 256
+        for change in (
+            {"price": "NaN"},
+            {"price": "Infinity"},
+            {"price": "1234.5"},
+            {"price": "1.234"},
+            {"time_minutes": "ten"},
+            {"title": long_name},
+            {"link": long_name},
+            {"tags": [long_name]},
+            {"ingredients": [long_name]},
+        ):
+            path = self._write(
+                "recipes.ndjson",
+                "\n".join([ndjson_row("A"), json.dumps({**valid, **change})]),
+            )
+
+            with self.assertRaisesMessage(CommandError, "line 2"):
+                self._import(path, "--batch-size", "1")
+
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertFalse(Tag.objects.exists())
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_failed_batch_keeps_checkpoint(self):
+        """Test the checkpoint only advances with committed batches"""
+        path = self._write(
+            "recipes.ndjson",
+            "\n".join(ndjson_row(title) for title in ("A", "B")),
+        )
+
+        with mock.patch(
+            "recipe.importer.update_search_vectors",
+            side_effect=[None, RuntimeError("crash")],
+        ):
+            with self.assertRaises(RuntimeError):
+                self._import(path, "--batch-size", "1")
+
+        self.assertEqual(read_checkpoint(self.user, path), 1)
+        self._import(path, "--batch-size", "1")
+
+        titles = Recipe.objects.order_by("id").values_list("title", flat=True)
+        self.assertEqual(list(titles), ["A", "B"])
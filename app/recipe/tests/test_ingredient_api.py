@@ -43,7 +43,7 @@ class PrivateIngredientAPITests(TestCase):
         ingredients = Ingredient.objects.all().order_by("-name")
         serialzer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serialzer.data)
+        self.assertEqual(res.data["results"], serialzer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test ingredients for the current authenticated user are returned"""
@@ -56,8 +56,8 @@ class PrivateIngredientAPITests(TestCase):
 
         res = self.client.get(INGREDIENT_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], ingredients.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], ingredients.name)
 
         client2 = APIClient()
         client2.force_authenticate(user=user2)
@@ -65,7 +65,7 @@ class PrivateIngredientAPITests(TestCase):
         instance = Ingredient.objects.get(name="Vinegar")
         serializer = IngredientSerializer(instance)
         self.assertEqual(res2.status_code, status.HTTP_200_OK)
-        self.assertEqual(res2.data[0], serializer.data)
+        self.assertEqual(res2.data["results"][0], serializer.data)
 
     def test_create_ingredient_successful(self):
         """Test create a new ingredient"""
@@ -97,8 +97,8 @@ class PrivateIngredientAPITests(TestCase):
 
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
 
     def test_retrieve_ingredients_assigned_unique(self):
         """Test filtering ingredients by assinged returns unique items"""
@@ -114,4 +114,23 @@ class PrivateIngredientAPITests(TestCase):
         recipe2.ingredients.add(ingredient)
 
         res = self.client.get(INGREDIENT_URL, {"assigned_only": 1})
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_retrieve_ingredients_with_counts(self):
+        """Test ingredients are listed with their recipe counts"""
+        ingredient = Ingredient.objects.create(user=self.user, name="Apples")
+        Ingredient.objects.create(user=self.user, name="Oranges")
+        recipe = Recipe.objects.create(
+            title="Apple pie", time_minutes=30, price=15.00, user=self.user
+        )
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(INGREDIENT_URL, {"with_counts": 1})
+
+        self.assertEqual(
+            [
+                (item["name"], item["recipe_count"])
+                for item in res.data["results"]
+            ],
+            [("Oranges", 0), ("Apples", 1)],
+        )
@@ -0,0 +1,215 @@
+"""
+Tests for case-insensitive tag and ingredient names
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+
+TAGS_URL = reverse("recipe:tag-list")
+TAG_BULK_URL = reverse("recipe:tag-bulk")
+TAG_UPSERT_URL = reverse("recipe:tag-upsert")
+INGREDIENT_UPSERT_URL = reverse("recipe:ingredient-upsert")
+RECIPES_URL = reverse("recipe:recipe-list")
+RECIPES_BULK_URL = reverse("recipe:recipe-bulk")
+
+
+class NameApiTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_duplicate_name_rejected(self):
+        """Test a name differing only in case cannot be created"""
+        Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.client.post(TAGS_URL, {"name": "VEGAN"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("name", res.data)
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_same_name_for_other_user(self):
+        """Test names are only unique per user"""
+        other = get_user_model().objects.create_user("o@o.com", "pass4321")
+        Tag.objects.create(user=other, name="Vegan")
+
+        res = self.client.post(TAGS_URL, {"name": "vegan"})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_duplicate_names_rejected(self):
+        """Test bulk writes report names used twice or already taken"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        tag = Tag.objects.create(user=self.user, name="Spicy")
+
+        res = self.client.post(
+            TAG_BULK_URL,
+            [{"name": "Hot"}, {"name": "hot"}, {"name": "vegan"}],
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [sorted(errors) for errors in res.data], [["name"]] * 3
+        )
+
+        res = self.client.patch(
+            TAG_BULK_URL, [{"id": tag.id, "name": "SPICY"}], format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_upsert_names(self):
+        """Test upserts reuse names ignoring case and keep input order"""
+        existing = Ingredient.objects.create(user=self.user, name="Salt")
+
+        res = self.client.post(
+            INGREDIENT_UPSERT_URL,
+            {"names": ["Pepper", "salt", "PEPPER", "Oil"]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["name"] for row in res.data], ["Pepper", "Salt", "Oil"]
+        )
+        self.assertEqual(res.data[1]["id"], existing.id)
+
+        again = self.client.post(
+            INGREDIENT_UPSERT_URL, {"names": ["oil", "pepper"]}, format="json"
+        )
+
+        self.assertEqual(
+            [row["id"] for row in again.data],
+            [res.data[2]["id"], res.data[0]["id"]],
+        )
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_upsert_non_ascii_names(self):
+        """Test names are matched the way the database lowercases them"""
+        res = self.client.post(
+            TAG_UPSERT_URL, {"names": ["Éclair", "ÉCLAIR"]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        again = self.client.post(
+            TAG_UPSERT_URL, {"names": ["ÉCLAIR", "Éclair"]}, format="json"
+        )
+        self.assertEqual(
+            sorted(row["id"] for row in again.data),
+            sorted(row["id"] for row in res.data),
+        )
+
+        res = self.client.post(
+            RECIPES_URL,
+            {
+                "title": "Pastry",
+                "time_minutes": 30,
+                "price": "7.00",
+                "tags": ["Éclair", "ÉCLAIR"],
+                "ingredients": [],
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.count(), len(again.data))
+
+    def test_upsert_invalid(self):
+        """Test an empty or malformed batch is rejected"""
+        res = self.client.post(TAG_UPSERT_URL, {"names": []}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TAG_UPSERT_URL, {"names": [""]}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_recipe_with_names(self):
+        """Test recipes accept tag and ingredient names next to ids"""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        payload = {
+            "title": "Curry",
+            "time_minutes": 30,
+            "price": "7.00",
+            "tags": [vegan.id, "VEGAN", "Spicy"],
+            "ingredients": ["Rice"],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data["id"])
+        self.assertEqual(
+            sorted(recipe.tags.values_list("name", flat=True)),
+            ["Spicy", "Vegan"],
+        )
+        self.assertEqual(
+            list(recipe.ingredients.values_list("name", flat=True)),
+            ["Rice"],
+        )
+        self.assertEqual(Tag.objects.get(name="Spicy").recipe_count, 1)
+
+    def test_invalid_recipe_creates_no_names(self):
+        """Test names are only created for otherwise valid recipes"""
+        payload = {"title": "", "tags": ["Spicy"], "ingredients": []}
+
+        res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_invalid_bulk_item_creates_no_names(self):
+        """Test names of a bulk write are only created if all items pass"""
+        payload = [
+            {
+                "title": "Curry",
+                "time_minutes": 30,
+                "price": "7.00",
+                "tags": ["Spicy"],
+                "ingredients": ["Rice"],
+            },
+            {"title": "", "tags": ["Sweet"], "ingredients": []},
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.exists())
+        self.assertFalse(Ingredient.objects.exists())
+
+
+class MergeDuplicateNamesTests(TestCase):
+    def test_merge_duplicates(self):
+        """Test duplicates are merged into the oldest object"""
+        user = get_user_model().objects.create_user("t@t.com", "pass4321")
+        salt = Ingredient.objects.create(user=user, name="Salt")
+        lower = Ingredient.objects.create(user=user, name="salt")
+        upper = Ingredient.objects.create(user=user, name="SALT")
+        both = Recipe.objects.create(
+            user=user, title="Both", time_minutes=5, price=1
+        )
+        both.ingredients.add(salt, lower)
+        single = Recipe.objects.create(
+            user=user, title="Single", time_minutes=5, price=1
+        )
+        single.ingredients.add(upper)
+
+        out = StringIO()
+        call_command("merge_duplicate_names", stdout=out)
+
+        self.assertIn("Merged 2 duplicate ingredients", out.getvalue())
+        self.assertEqual(list(Ingredient.objects.all()), [salt])
+        self.assertEqual(list(both.ingredients.all()), [salt])
+        self.assertEqual(list(single.ingredients.all()), [salt])
+        salt.refresh_from_db()
+        self.assertEqual(salt.recipe_count, 2)
@@ -1,20 +1,42 @@
+import csv
+import io
+import json
 import tempfile
 import os
+from unittest import mock
+from types import SimpleNamespace
+from datetime import timedelta
 
 from PIL import Image
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db.models import Case, FloatField, Value, When
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import Recipe, RecipeImageJob, Tag, Ingredient
 
+from core.storage import rendition_name
+from core.tests.utils import sample_recipe
+from recipe import images
+from recipe.cache import bump_cache_version
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.views import RecipeViewSet
 
 
 RECIPES_URL = reverse("recipe:recipe-list")
+RECIPES_BULK_URL = reverse("recipe:recipe-bulk")
+RECIPES_EXPORT_URL = reverse("recipe:recipe-export")
+
+# Maximum number of queries allowed per endpoint, independent of row count
+# (one of them computes the ETag)
+QUERY_BUDGETS = {"list": 4, "retrieve": 4}
 
 
 def image_upload_ulr(recipe_id):
@@ -38,11 +60,17 @@ def sample_ingredient(user, name="Cinnamon"):
     return Ingredient.objects.create(user=user, name=name)
 
 
-def sample_recipe(user, **params):
-    """Create and return a sample recipe"""
-    defaults = {"title": "Sample Recipe", "time_minutes": 10, "price": 5.00}
-    defaults.update(params)
-    return Recipe.objects.create(user=user, **defaults)
+def sample_recipes_with_relations(user, count):
+    """Create recipes that each have a tag and an ingredient"""
+    recipes = []
+    for i in range(count):
+        recipe = sample_recipe(user=user, title=f"Recipe {i}")
+        recipe.tags.add(sample_tag(user=user, name=f"Tag {i}"))
+        recipe.ingredients.add(
+            sample_ingredient(user=user, name=f"Ingredient {i}")
+        )
+        recipes.append(recipe)
+    return recipes
 
 
 class PublicRecipeAPITests(TestCase):
@@ -83,7 +111,7 @@ class PrivateRecipeAPITests(TestCase):
 
         res = self.client.get(RECIPES_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_recipe_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -100,9 +128,9 @@ class PrivateRecipeAPITests(TestCase):
 
         res = self.client.get(RECIPES_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
-        self.assertEqual(res.data.pop()["title"], "Corn Soup")
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"], serializer.data)
+        self.assertEqual(res.data["results"].pop()["title"], "Corn Soup")
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -211,6 +239,484 @@ class PrivateRecipeAPITests(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_list_recipes_query_budget(self):
+        """Test listing recipes costs the same queries for any row count"""
+        sample_recipes_with_relations(self.user, 1)
+        with self.assertNumQueries(QUERY_BUDGETS["list"]):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        sample_recipes_with_relations(self.user, 10)
+        with self.assertNumQueries(QUERY_BUDGETS["list"]):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_recipe_query_budget(self):
+        """Test retrieving a recipe detail stays within the query budget"""
+        recipe = sample_recipes_with_relations(self.user, 1)[0]
+        recipe.tags.add(sample_tag(user=self.user, name="Extra"))
+
+        with self.assertNumQueries(QUERY_BUDGETS["retrieve"]):
+            res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["tags"]), 2)
+
+    def test_list_recipes_sparse_fields(self):
+        """Test ?fields= limits the rendered keys and loaded relations"""
+        sample_recipes_with_relations(self.user, 3)
+
+        with self.assertNumQueries(QUERY_BUDGETS["list"] - 2):
+            res = self.client.get(RECIPES_URL, {"fields": "id,title,price"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for item in res.data["results"]:
+            self.assertEqual(set(item), {"id", "title", "price"})
+
+    def test_list_recipes_expand_tags(self):
+        """Test ?expand=tags nests tag objects in the list"""
+        recipe = sample_recipes_with_relations(self.user, 1)[0]
+
+        with self.assertNumQueries(QUERY_BUDGETS["list"]):
+            res = self.client.get(RECIPES_URL, {"expand": "tags"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = [
+            {"id": tag.id, "name": tag.name} for tag in recipe.tags.all()
+        ]
+        self.assertEqual(res.data["results"][0]["tags"], expected)
+        self.assertIsInstance(res.data["results"][0]["ingredients"][0], int)
+
+    def test_retrieve_recipe_sparse_fields(self):
+        """Test ?fields= applies to the recipe detail"""
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.get(detail_url(recipe.id), {"fields": "title,tags"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"title": recipe.title, "tags": []})
+
+    def test_list_recipes_unknown_field(self):
+        """Test requesting an unknown field is rejected"""
+        res = self.client.get(RECIPES_URL, {"fields": "id,secret"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", res.data)
+
+    def _list_content(self, params, fast):
+        """Return the raw list response with or without the fast path"""
+        bump_cache_version(self.user.pk)
+        with override_settings(RECIPE_FAST_LIST=fast):
+            res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.content
+
+    def test_fast_list_matches_serializer(self):
+        """Test the values() list path renders exactly like the serializer"""
+        recipes = sample_recipes_with_relations(self.user, 3)
+        recipes[0].tags.add(sample_tag(user=self.user, name="Extra"))
+        sample_recipe(user=self.user, title="Plain", link="https://x.com")
+
+        for params in (
+            {},
+            {"fields": "id,price,tags"},
+            {"search": "recipe", "ordering": "title"},
+            {"page_size": 2},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self._list_content(params, fast=True),
+                    self._list_content(params, fast=False),
+                )
+
+    def test_recipes_cursor_pagination(self):
+        """Test paging through recipes with the cursor links"""
+        recipes = [
+            sample_recipe(user=self.user, title=f"Recipe {i}")
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPES_URL, {"page_size": 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item["id"] for item in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids.extend(item["id"] for item in res.data["results"])
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_recipes_cursor_pagination_with_ordering(self):
+        """Test the cursor seeks on the requested ordering field"""
+        for minutes in (30, 10, 20):
+            sample_recipe(user=self.user, time_minutes=minutes)
+
+        res = self.client.get(
+            RECIPES_URL, {"ordering": "time_minutes", "page_size": 2}
+        )
+        minutes = [item["time_minutes"] for item in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        minutes.extend(item["time_minutes"] for item in res.data["results"])
+
+        self.assertEqual(minutes, [10, 20, 30])
+        self.assertIsNone(res.data["next"])
+
+    def test_ordering_independent_of_fields(self):
+        """Test ?fields= neither limits nor breaks the ordering"""
+        for link in ("https://b.com", "https://c.com", "https://a.com"):
+            sample_recipe(user=self.user, link=link)
+
+        for fast in (True, False):
+            for ordering in ("link", "title,-link"):
+                with self.subTest(fast=fast, ordering=ordering):
+                    bump_cache_version(self.user.pk)
+                    with override_settings(RECIPE_FAST_LIST=fast):
+                        res = self.client.get(
+                            RECIPES_URL,
+                            {
+                                "fields": "id",
+                                "ordering": ordering,
+                                "page_size": 2,
+                            },
+                        )
+                        ids = [item["id"] for item in res.data["results"]]
+                        res = self.client.get(res.data["next"])
+                    ids.extend(item["id"] for item in res.data["results"])
+
+                    links = Recipe.objects.in_bulk(ids)
+                    self.assertEqual(
+                        [links[pk].link for pk in ids],
+                        [
+                            "https://a.com",
+                            "https://b.com",
+                            "https://c.com",
+                        ][:: 1 if ordering == "link" else -1],
+                    )
+
+    def test_ranked_search_pagination(self):
+        """Test ranked results with tied ranks are paged by number"""
+        recipes = [sample_recipe(user=self.user) for i in range(5)]
+        recipes.append(sample_recipe(user=self.user, title="Best"))
+
+        def ranked(queryset, text):
+            # Stands in for the Postgres ranking, with many tied ranks
+            return queryset.annotate(
+                rank=Case(
+                    When(title="Best", then=Value(0.9)),
+                    default=Value(0.1),
+                    output_field=FloatField(),
+                )
+            )
+
+        for fast in (True, False):
+            with override_settings(RECIPE_FAST_LIST=fast), mock.patch(
+                "recipe.views.search_recipes", ranked
+            ):
+                bump_cache_version(self.user.pk)
+                res = self.client.get(
+                    RECIPES_URL, {"search": "recipe", "page_size": 2}
+                )
+                ids = [item["id"] for item in res.data["results"]]
+                while res.data["next"]:
+                    res = self.client.get(res.data["next"])
+                    ids.extend(item["id"] for item in res.data["results"])
+
+            self.assertEqual(
+                ids,
+                [recipes[-1].id] + [r.id for r in reversed(recipes[:-1])],
+            )
+            self.assertEqual(res.data["count"], 6)
+
+    def test_filter_recipes_by_tags_returns_unique(self):
+        """Test a recipe matching several tags is returned once"""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name="Vegan")
+        tag2 = sample_tag(user=self.user, name="Dessert")
+        ingredient = sample_ingredient(user=self.user)
+        recipe.tags.add(tag1, tag2)
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {"tags": f"{tag1.id},{tag2.id}", "ingredients": ingredient.id},
+        )
+
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["id"], recipe.id)
+
+    def test_filter_recipes_matching_all_tags(self):
+        """Test match=all returns only recipes having every tag"""
+        tag1 = sample_tag(user=self.user, name="Vegan")
+        tag2 = sample_tag(user=self.user, name="Dessert")
+        recipe1 = sample_recipe(user=self.user, title="Vegan brownies")
+        recipe1.tags.add(tag1, tag2)
+        recipe2 = sample_recipe(user=self.user, title="Vegan curry")
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(
+            RECIPES_URL, {"tags": f"{tag1.id},{tag2.id}", "match": "all"}
+        )
+
+        ids = [item["id"] for item in res.data["results"]]
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_filter_unknown_match_rejected(self):
+        """Test ?match= only accepts any or all"""
+        tag = sample_tag(user=self.user)
+
+        res = self.client.get(RECIPES_URL, {"tags": tag.id, "match": "al"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("match", res.data)
+
+    def test_related_ids_resolved_in_one_query(self):
+        """Test submitted tag/ingredient ids cost one query per field"""
+        tags = [sample_tag(user=self.user, name=f"T{i}") for i in range(5)]
+        ingredients = [
+            sample_ingredient(user=self.user, name=f"I{i}") for i in range(5)
+        ]
+        payload = {
+            "title": "Stew",
+            "time_minutes": 60,
+            "price": "9.00",
+            "tags": [tag.id for tag in tags],
+            "ingredients": [ingredient.id for ingredient in ingredients],
+        }
+        serializer = RecipeSerializer(
+            data=payload, context={"request": SimpleNamespace(user=self.user)}
+        )
+
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data["tags"], tags)
+
+    def test_create_recipe_with_other_users_tags_fails(self):
+        """Test tags of other users are rejected and reported together"""
+        user2 = get_user_model().objects.create_user(
+            "other@test.com", "testpass4321"
+        )
+        tag = sample_tag(user=self.user)
+        other1 = sample_tag(user=user2, name="Other 1")
+        other2 = sample_tag(user=user2, name="Other 2")
+        payload = {
+            "title": "Avocado toast",
+            "tags": [tag.id, other1.id, other2.id],
+            "time_minutes": 5,
+            "price": 4.00,
+        }
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f"{other1.id}, {other2.id}", str(res.data["tags"][0]))
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_search_recipes(self):
+        """Test searching titles and linked tag/ingredient names"""
+        curry = sample_recipe(user=self.user, title="Thai red curry")
+        soup = sample_recipe(user=self.user, title="Tomato soup")
+        soup.tags.add(sample_tag(user=self.user, name="Vegan"))
+        toast = sample_recipe(user=self.user, title="Cheese toast")
+        toast.ingredients.add(sample_ingredient(user=self.user, name="Chili"))
+
+        def search(text):
+            res = self.client.get(RECIPES_URL, {"search": text})
+            return [item["id"] for item in res.data["results"]]
+
+        self.assertEqual(search("curry"), [curry.id])
+        self.assertEqual(search("vegan"), [soup.id])
+        self.assertEqual(search("chili"), [toast.id])
+        self.assertEqual(search("cheese chili"), [toast.id])
+        self.assertEqual(search("cheese curry"), [])
+
+
+class RecipeBulkAPITests(TestCase):
+    """Test the bulk recipe endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "bulk@recipe.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_create_recipes(self):
+        """Test creating several recipes with their tags at once"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                "title": f"Recipe {i}",
+                "time_minutes": 10,
+                "price": "5.00",
+                "tags": [tag.id],
+                "ingredients": [ingredient.id],
+            }
+            for i in range(3)
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [tag])
+            self.assertEqual(list(recipe.ingredients.all()), [ingredient])
+        self.assertEqual(
+            [item["tags"] for item in res.data], [[tag.id]] * 3
+        )
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test an invalid item rolls back the whole batch"""
+        item = {
+            "time_minutes": 10,
+            "price": "5.00",
+            "tags": [],
+            "ingredients": [],
+        }
+        payload = [{"title": "Valid", **item}, {"title": "", **item}]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("title", res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update_recipes(self):
+        """Test partially updating several recipes at once"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        payload = [
+            {"id": recipe1.id, "title": "Updated"},
+            {"id": recipe2.id, "tags": [tag.id]},
+        ]
+
+        res = self.client.patch(RECIPES_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        self.assertEqual(recipe1.title, "Updated")
+        self.assertEqual(list(recipe2.tags.all()), [tag])
+        self.assertEqual(res.data[1]["tags"], [tag.id])
+
+    def test_bulk_update_other_users_recipe_fails(self):
+        """Test recipes of other users are reported as not found"""
+        user2 = get_user_model().objects.create_user(
+            "other@recipe.com", "testpass4321"
+        )
+        recipe = sample_recipe(user=self.user)
+        other = sample_recipe(user=user2)
+        payload = [
+            {"id": recipe.id, "title": "Mine"},
+            {"id": other.id, "title": "Theirs"},
+        ]
+
+        res = self.client.patch(RECIPES_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("id", res.data[1])
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.title, "Mine")
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting several recipes at once"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        recipe3 = sample_recipe(user=self.user)
+
+        res = self.client.delete(
+            RECIPES_BULK_URL, {"ids": [recipe1.id, recipe2.id]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Recipe.objects.all()), [recipe3])
+
+    def test_bulk_invalid_ids_rejected(self):
+        """Test malformed ids are reported per item instead of failing"""
+        recipe = sample_recipe(user=self.user)
+        payload = [{"id": [recipe.id]}, {"id": recipe.id}, {"id": 0}]
+
+        res = self.client.patch(RECIPES_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data,
+            [{"id": ["Invalid id."]}, {}, {"id": ["Invalid id."]}],
+        )
+
+        res = self.client.delete(
+            RECIPES_BULK_URL, {"ids": [[recipe.id], {}]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, [{"id": ["Invalid id."]}] * 2)
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+
+class RecipeExportTests(TestCase):
+    """Test streaming the recipe catalogue export"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "export@recipe.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.recipes = sample_recipes_with_relations(self.user, 5)
+        self.recipes[0].tags.add(sample_tag(user=self.user, name="Apple"))
+        other = get_user_model().objects.create_user(
+            "other@recipe.com", "testpass1234"
+        )
+        sample_recipe(user=other, title="Hidden")
+
+    def _export(self, export_format):
+        res = self.client.get(RECIPES_EXPORT_URL, {"format": export_format})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return b"".join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test exporting one JSON document per recipe"""
+        lines = self._export("ndjson").splitlines()
+
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [row["id"] for row in rows], [r.id for r in self.recipes]
+        )
+        self.assertEqual(rows[0]["tags"], ["Apple", "Tag 0"])
+        self.assertEqual(rows[0]["ingredients"], ["Ingredient 0"])
+        self.assertEqual(rows[0]["price"], "5.00")
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV with joined names"""
+        rows = list(csv.DictReader(io.StringIO(self._export("csv"))))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["title"], "Recipe 0")
+        self.assertEqual(rows[0]["tags"], "Apple|Tag 0")
+
+    def test_export_empty_csv_has_header(self):
+        """Test an empty catalogue still exports the CSV header"""
+        Recipe.objects.filter(user=self.user).delete()
+
+        content = self._export("csv")
+
+        self.assertEqual(
+            content.strip(),
+            "id,title,time_minutes,price,link,tags,ingredients",
+        )
+
+    def test_export_queries_per_chunk(self):
+        """Test linked names are fetched once per chunk of recipes"""
+        with mock.patch.object(RecipeViewSet, "export_chunk_size", 2):
+            with self.assertNumQueries(1 + 2 * 3):
+                self._export("ndjson")
+
+    def test_export_unknown_format(self):
+        """Test unsupported export formats are not found"""
+        res = self.client.get(RECIPES_EXPORT_URL, {"format": "xml"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class RecipeImageUploadTests(TestCase):
     def setUp(self):
@@ -222,8 +728,25 @@ class RecipeImageUploadTests(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        for rendition, info in self.recipe.image_variants.items():
+            for fmt in info["formats"]:
+                default_storage.delete(
+                    rendition_name(self.recipe.image.name, rendition, fmt)
+                )
         self.recipe.image.delete()
 
+    def _upload_and_process(self, size=(10, 10), **save_kwargs):
+        """Upload a JPEG to the recipe and run the processing queue"""
+        url = image_upload_ulr(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            img = Image.new("RGB", size)
+            img.save(ntf, format="JPEG", **save_kwargs)
+            ntf.seek(0)
+            self.client.post(url, {"image": ntf}, format="multipart")
+        call_command("process_image_jobs", "--once", "--workers", "0")
+        self.recipe.refresh_from_db()
+
     def test_upload_image_to_recipe(self):
         """Test uploading an image to recipe"""
         url = image_upload_ulr(self.recipe.id)
@@ -233,10 +756,69 @@ class RecipeImageUploadTests(TestCase):
             ntf.seek(0)
             res = self.client.post(url, {"image": ntf}, format="multipart")
 
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data["status"], RecipeImageJob.PENDING)
+        call_command("process_image_jobs", "--once", "--workers", "0")
+
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn("image", res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        res = self.client.get(res.data["status_url"])
+        self.assertEqual(res.data["status"], RecipeImageJob.DONE)
+
+    def test_processed_image_metadata_stripped(self):
+        """Test processing removes EXIF metadata and writes renditions"""
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker"
+        self._upload_and_process(size=(2000, 1000), exif=exif)
+
+        with Image.open(self.recipe.image.path) as processed:
+            self.assertNotIn("exif", processed.info)
+        large_path = self.recipe.image.path.replace(".jpg", "_large.jpg")
+        with Image.open(large_path) as large:
+            self.assertEqual(large.size, (1600, 800))
+
+    def test_image_variants_in_recipe_list(self):
+        """Test list items expose the renditions with their sizes"""
+        self._upload_and_process(size=(1000, 500))
+
+        res = self.client.get(RECIPES_URL)
+
+        variants = res.data["results"][0]["image_variants"]
+        self.assertEqual(set(variants), {"thumb", "medium", "large"})
+        self.assertEqual(
+            (variants["thumb"]["width"], variants["thumb"]["height"]),
+            (200, 100),
+        )
+        self.assertTrue(variants["thumb"]["jpeg"].endswith("_thumb.jpg"))
+
+    def test_fast_list_image_variants(self):
+        """Test the values() list path renders the same rendition URLs"""
+        self._upload_and_process(size=(1000, 500))
+
+        with override_settings(RECIPE_FAST_LIST=False):
+            expected = self.client.get(RECIPES_URL).content
+        bump_cache_version(self.user.pk)
+        with override_settings(RECIPE_FAST_LIST=True):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.content, expected)
+
+    def test_backfill_image_renditions(self):
+        """Test renditions are created for images uploaded before"""
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", (400, 400)).save(ntf, format="JPEG")
+            ntf.seek(0)
+            self.recipe.image.save("legacy.jpg", ntf)
+
+        call_command("backfill_image_renditions", "--workers", "0")
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants["medium"]["width"], 400)
+        self.assertTrue(
+            default_storage.exists(
+                rendition_name(self.recipe.image.name, "thumb", "JPEG")
+            )
+        )
 
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image"""
@@ -244,6 +826,100 @@ class RecipeImageUploadTests(TestCase):
         res = self.client.post(url, {"image": "notimage"}, format="multipart")
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def _upload(self, recipe):
+        """Queue a JPEG upload of a recipe and return its job"""
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", (10, 10)).save(ntf, format="JPEG")
+            ntf.seek(0)
+            self.client.post(
+                image_upload_ulr(recipe.id), {"image": ntf}, format="multipart"
+            )
+        return RecipeImageJob.objects.get(recipe=recipe)
+
+    def test_abandoned_job_claimed_again(self):
+        """Test jobs of a dead worker are processed after the timeout"""
+        job = self._upload(self.recipe)
+        claimed_at = timezone.now() - timedelta(seconds=60)
+        RecipeImageJob.objects.filter(pk=job.pk).update(
+            status=RecipeImageJob.PROCESSING, claimed_at=claimed_at
+        )
+
+        with override_settings(
+            RECIPE_IMAGE={**settings.RECIPE_IMAGE, "CLAIM_TIMEOUT": 120}
+        ):
+            call_command("process_image_jobs", "--once", "--workers", "0")
+        job.refresh_from_db()
+        self.assertEqual(job.status, RecipeImageJob.PROCESSING)
+
+        with override_settings(
+            RECIPE_IMAGE={**settings.RECIPE_IMAGE, "CLAIM_TIMEOUT": 30}
+        ):
+            call_command("process_image_jobs", "--once", "--workers", "0")
+        job.refresh_from_db()
+        self.assertEqual(job.status, RecipeImageJob.DONE)
+
+    def test_recipe_deleted_while_processing(self):
+        """Test results for a deleted recipe are dropped"""
+        recipe = sample_recipe(user=self.user, title="Gone")
+        job = self._upload(recipe)
+        render_many = images.render_many
+
+        def delete_then_render(*args):
+            recipe.delete()
+            return render_many(*args)
+
+        with mock.patch.object(images, "render_many", delete_then_render):
+            self.assertEqual(images.process_pending_jobs(workers=0), 1)
+
+        self.assertFalse(RecipeImageJob.objects.exists())
+        self.assertFalse(default_storage.exists(job.source))
+        self.assertEqual(images.process_pending_jobs(workers=0), 0)
+
+    def test_reclaimed_job_not_finished_twice(self):
+        """Test a worker whose claim timed out leaves the job alone"""
+        job = self._upload(self.recipe)
+        render_many = images.render_many
+
+        def reclaim_then_render(*args):
+            RecipeImageJob.objects.filter(pk=job.pk).update(
+                claimed_at=timezone.now() + timedelta(seconds=1)
+            )
+            return render_many(*args)
+
+        with mock.patch.object(images, "render_many", reclaim_then_render):
+            images.process_pending_jobs(workers=0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, RecipeImageJob.PROCESSING)
+        self.assertTrue(default_storage.exists(job.source))
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+        default_storage.delete(job.source)
+
+    def test_failed_job_outputs_deleted(self):
+        """Test outputs written before a processing error are removed"""
+        job = self._upload(self.recipe)
+        render_many = images.render_many
+        names = []
+
+        def render_then_fail(args, workers):
+            names.extend(name for *_, name in args)
+            results = render_many(args, workers)
+            return {
+                key: (renditions, "boom")
+                for key, (renditions, _) in results.items()
+            }
+
+        with mock.patch.object(images, "render_many", render_then_fail):
+            images.process_pending_jobs(workers=0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, RecipeImageJob.FAILED)
+        (name,) = names
+        for path in [name, *images.rendition_names(name)]:
+            self.assertFalse(default_storage.exists(path), path)
+        self.assertFalse(default_storage.exists(job.source))
+
     def test_filter_recipes_by_tags(self):
         """Test returning recipes with specific tags"""
         recipe1 = sample_recipe(user=self.user, title="Thai vegetable curry")
@@ -259,9 +935,9 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
 
     def test_filter_recipes_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -280,9 +956,9 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
 
     # @classmethod
     # def setUpTestData(cls):
@@ -0,0 +1,204 @@
+"""
+Tests for the counter backed recipe stats
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeStats, Tag
+from recipe.stats import get_recipe_stats, rebuild_recipe_stats
+
+
+STATS_URL = reverse("recipe:stats-list")
+
+
+def recipe_detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class RecipeStatsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "stats@recipe.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = Tag.objects.create(user=self.user, name="Quick")
+        self.leek = Ingredient.objects.create(user=self.user, name="Leek")
+
+    def _create_recipe(self, title, time_minutes, price, tags, ingredients):
+        res = self.client.post(
+            reverse("recipe:recipe-list"),
+            {
+                "title": title,
+                "time_minutes": time_minutes,
+                "price": price,
+                "tags": [tag.id for tag in tags],
+                "ingredients": [ingredient.id for ingredient in ingredients],
+            },
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return Recipe.objects.get(id=res.data["id"])
+
+    def _counters(self):
+        stats = get_recipe_stats(self.user)
+        return (
+            (stats.recipe_count, stats.total_time_minutes, stats.total_price),
+            dict(Tag.objects.values_list("name", "recipe_count")),
+            dict(Ingredient.objects.values_list("name", "recipe_count")),
+        )
+
+    def assertCountersMatchRebuild(self):
+        counters = self._counters()
+        rebuild_recipe_stats([self.user.pk])
+        self.assertEqual(counters, self._counters())
+
+    def test_counters_follow_recipe_changes(self):
+        """Test signals keep the counters equal to a full rebuild"""
+        get_recipe_stats(self.user)
+        soup = self._create_recipe(
+            "Soup", 20, "4.50", [self.vegan, self.quick], [self.leek]
+        )
+        self._create_recipe("Salad", 10, "3.00", [self.vegan], [])
+        self.assertEqual(
+            self._counters(),
+            (
+                (2, 30, 7.5),
+                {"Vegan": 2, "Quick": 1},
+                {"Leek": 1},
+            ),
+        )
+
+        self.client.patch(
+            recipe_detail_url(soup.id),
+            {"price": "6.00", "tags": [self.quick.id]},
+        )
+        self.assertCountersMatchRebuild()
+        soup.tags.remove(self.vegan)
+        self.quick.recipe_set.clear()
+        self.assertCountersMatchRebuild()
+        self.client.delete(recipe_detail_url(soup.id))
+        self.assertCountersMatchRebuild()
+        self.assertEqual(
+            self._counters(),
+            ((1, 10, 3), {"Vegan": 1, "Quick": 0}, {"Leek": 0}),
+        )
+
+    def test_bulk_create_counted(self):
+        """Test bulk created recipes are counted"""
+        get_recipe_stats(self.user)
+        payload = [
+            {
+                "title": f"Recipe {i}",
+                "time_minutes": 5,
+                "price": "1.00",
+                "tags": [self.vegan.id],
+                "ingredients": [],
+            }
+            for i in range(3)
+        ]
+
+        self.client.post(
+            reverse("recipe:recipe-bulk"), payload, format="json"
+        )
+
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 3)
+        self.assertEqual(get_recipe_stats(self.user).recipe_count, 3)
+
+    def test_bulk_update_and_delete_counted(self):
+        """Test bulk updates and deletes apply their deltas"""
+        get_recipe_stats(self.user)
+        bulk_url = reverse("recipe:recipe-bulk")
+        res = self.client.post(
+            bulk_url,
+            [
+                {
+                    "title": f"Recipe {i}",
+                    "time_minutes": 5,
+                    "price": "1.00",
+                    "tags": [self.vegan.id],
+                    "ingredients": [self.leek.id],
+                }
+                for i in range(3)
+            ],
+            format="json",
+        )
+        ids = [item["id"] for item in res.data]
+
+        self.client.patch(
+            bulk_url,
+            [
+                {"id": ids[0], "price": "2.50", "tags": [self.quick.id]},
+                {"id": ids[1], "time_minutes": 15},
+                {"id": ids[2], "ingredients": [], "tags": []},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(
+            self._counters(),
+            (
+                (3, 25, 4.5),
+                {"Vegan": 1, "Quick": 1},
+                {"Leek": 2},
+            ),
+        )
+        self.assertCountersMatchRebuild()
+
+        self.client.delete(bulk_url, {"ids": ids[:2]}, format="json")
+
+        self.assertEqual(
+            self._counters(),
+            ((1, 5, 1), {"Vegan": 0, "Quick": 0}, {"Leek": 0}),
+        )
+        self.assertCountersMatchRebuild()
+
+    def test_stats_endpoint(self):
+        """Test the endpoint reports counts and averages"""
+        self._create_recipe("Soup", 20, "4.50", [self.vegan], [self.leek])
+        self._create_recipe("Salad", 11, "3.00", [self.vegan], [])
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["recipe_count"], 2)
+        self.assertEqual(res.data["avg_time_minutes"], 15.5)
+        self.assertEqual(res.data["avg_price"], "3.75")
+        self.assertEqual(
+            [(tag["name"], tag["recipe_count"]) for tag in res.data["tags"]],
+            [("Vegan", 2), ("Quick", 0)],
+        )
+        self.assertEqual(res.data["ingredients"][0]["recipe_count"], 1)
+
+    def test_stats_endpoint_query_count(self):
+        """Test reading stats does not aggregate the catalogue"""
+        get_recipe_stats(self.user)
+
+        with self.assertNumQueries(3):
+            self.client.get(STATS_URL)
+
+    def test_stats_of_empty_catalogue(self):
+        """Test averages are null without recipes"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["recipe_count"], 0)
+        self.assertIsNone(res.data["avg_price"])
+
+    def test_rebuild_command(self):
+        """Test the command repairs drifted counters"""
+        self._create_recipe("Soup", 20, "4.50", [self.vegan], [self.leek])
+        Tag.objects.update(recipe_count=42)
+        RecipeStats.objects.update(recipe_count=42)
+
+        call_command("rebuild_recipe_stats", stdout=StringIO())
+
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 1)
+        self.assertEqual(get_recipe_stats(self.user).recipe_count, 1)
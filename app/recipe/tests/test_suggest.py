@@ -0,0 +1,163 @@
+"""
+Tests for the tag and ingredient name suggestion endpoints
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Tag
+from recipe.names import lower_names
+from recipe.suggest import (
+    PrefixTrie,
+    SuggestionCache,
+    suggest_from_db,
+    suggestion_cache,
+    trie_rows,
+)
+
+
+TAG_SUGGEST_URL = reverse("recipe:tag-suggest")
+INGREDIENT_SUGGEST_URL = reverse("recipe:ingredient-suggest")
+
+
+class SuggestApiTests(TestCase):
+    def setUp(self):
+        suggestion_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, model, name, recipe_count=0, user=None):
+        obj = model.objects.create(user=user or self.user, name=name)
+        model.objects.filter(pk=obj.pk).update(recipe_count=recipe_count)
+        return obj
+
+    def names(self, res):
+        return [row["name"] for row in res.data]
+
+    def test_login_required(self):
+        """Test that login is required for suggestions"""
+        res = APIClient().get(TAG_SUGGEST_URL, {"q": "s"})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prefix_matches_ranked_by_usage(self):
+        """Test names are matched case-insensitively and ranked by use"""
+        self.create(Ingredient, "Salt", 3)
+        self.create(Ingredient, "salmon", 7)
+        self.create(Ingredient, "Sage", 3)
+        self.create(Ingredient, "Sea salt", 9)
+        other = get_user_model().objects.create_user("o@o.com", "pass4321")
+        self.create(Ingredient, "Saffron", 50, user=other)
+
+        res = self.client.get(INGREDIENT_SUGGEST_URL, {"q": "SA"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(res), ["salmon", "Sage", "Salt"])
+        self.assertEqual(
+            set(res.data[0]), {"id", "name", "recipe_count"}
+        )
+        self.assertEqual(res.data[0]["recipe_count"], 7)
+
+    def test_limit(self):
+        """Test the number of suggestions is limited"""
+        for index in range(5):
+            self.create(Tag, f"Tag {index}", index)
+
+        res = self.client.get(TAG_SUGGEST_URL, {"q": "tag", "limit": 2})
+
+        self.assertEqual(self.names(res), ["Tag 4", "Tag 3"])
+
+    def test_invalid_params(self):
+        """Test a missing query or a too large limit is rejected"""
+        res = self.client.get(TAG_SUGGEST_URL)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(TAG_SUGGEST_URL, {"q": "a", "limit": 1000})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hot_user_served_from_trie(self):
+        """Test repeated lookups switch to the trie and see new names"""
+        self.create(Tag, "Vegan", 2)
+        self.create(Tag, "Vegetarian", 5)
+        for _ in range(suggestion_cache.hot_after):
+            res = self.client.get(TAG_SUGGEST_URL, {"q": "veg"})
+            self.assertEqual(self.names(res), ["Vegetarian", "Vegan"])
+
+        # Only the prefix is lowercased by the database
+        with self.assertNumQueries(1):
+            res = self.client.get(TAG_SUGGEST_URL, {"q": "vege"})
+        self.assertEqual(self.names(res), ["Vegetarian"])
+
+        self.client.post(reverse("recipe:tag-list"), {"name": "Veggie"})
+        res = self.client.get(TAG_SUGGEST_URL, {"q": "vegg"})
+
+        self.assertEqual(self.names(res), ["Veggie"])
+
+    def test_non_ascii_prefix_same_on_both_paths(self):
+        """Test the trie and the database lowercase names alike"""
+        self.create(Tag, "Épice", 1)
+        self.create(Tag, "épinard", 2)
+
+        results = [
+            self.names(self.client.get(TAG_SUGGEST_URL, {"q": "É"}))
+            for _ in range(suggestion_cache.hot_after + 1)
+        ]
+
+        self.assertTrue(results[0])
+        self.assertEqual(results, [results[0]] * len(results))
+
+
+class PrefixTrieTests(TestCase):
+    def test_trie_matches_database(self):
+        """Test the trie returns the same ranking as the database"""
+        user = get_user_model().objects.create_user("t@t.com", "pass4321")
+        rng = random.Random(0)
+        for index in range(200):
+            name = "".join(rng.choice("abcAB ") for _ in range(6))
+            Tag.objects.create(user=user, name=name.strip() or "a")
+        for tag in Tag.objects.all():
+            Tag.objects.filter(pk=tag.pk).update(
+                recipe_count=rng.randrange(4)
+            )
+        queryset = Tag.objects.filter(user=user)
+        trie = PrefixTrie(trie_rows(queryset), 10)
+        prefixes = ["", "a", "AB", "ba", "c", "abca", "b a", "abcab"]
+
+        for prefix in lower_names(prefixes).values():
+            for limit in (3, 10):
+                self.assertEqual(
+                    trie.search(prefix, limit),
+                    suggest_from_db(queryset, prefix, limit),
+                    prefix,
+                )
+
+    def test_total_names_bounded(self):
+        """Test least recently used tries are dropped to fit the budget"""
+        cache = SuggestionCache(max_total_names=5, hot_after=1)
+        users = [
+            get_user_model().objects.create_user(f"{i}@t.com", "pass4321")
+            for i in range(3)
+        ]
+        for user in users:
+            for index in range(2):
+                Tag.objects.create(user=user, name=f"Tag {index}")
+            cache.suggest(Tag.objects.filter(user=user), user.pk, "t", 5)
+
+        tries = [
+            entry["trie"] is not None for entry in cache._entries.values()
+        ]
+        self.assertEqual(tries, [True, True])
+        self.assertEqual(cache.total_names, 4)
+
+        # Lowercasing the prefix and the database lookup
+        with self.assertNumQueries(2):
+            cache.suggest(
+                Tag.objects.filter(user=users[2]), users[2].pk, "t", 20
+            )
@@ -1,3 +1,5 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -44,7 +46,7 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are for the authenticated user"""
@@ -55,8 +57,8 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], tag.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], tag.name)
 
     def test_create_tag_successful(self):
         """Test creating a new tag"""
@@ -90,8 +92,8 @@ class PrivateTagsApiTests(TestCase):
 
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
 
     def test_retrieve_tags_assigned_unique(self):
         """Test filtering tags by assigned returns unique items"""
@@ -107,4 +109,100 @@ class PrivateTagsApiTests(TestCase):
         recipe2.tags.add(tag)
 
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_retrieve_tags_with_counts(self):
+        """Test assigned tags are listed with their recipe counts"""
+        tag = Tag.objects.create(user=self.user, name="Breakfast")
+        Tag.objects.create(user=self.user, name="Lunch")
+        for title in ("Pancakes", "Porridge"):
+            recipe = Recipe.objects.create(
+                title=title, time_minutes=5, price=3.00, user=self.user
+            )
+            recipe.tags.add(tag)
+
+        # Response validators + the tag page, no per-tag count queries
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                TAGS_URL,
+                {"assigned_only": 1, "with_counts": 1, "fields": "name"},
+            )
+
+        self.assertEqual(
+            res.data["results"], [{"name": "Breakfast", "recipe_count": 2}]
+        )
+
+    def test_list_params_validated(self):
+        """Test boolean params accept true/false words and reject others"""
+        Tag.objects.create(user=self.user, name="Lunch")
+
+        res = self.client.get(
+            TAGS_URL, {"with_counts": "true", "assigned_only": "false"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"][0]["recipe_count"], 0)
+
+        res = self.client.get(TAGS_URL, {"with_counts": "maybe"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("with_counts", res.data)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": "2"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tags_cursor_pagination(self):
+        """Test paging through tags ordered by name"""
+        for name in ("Apple", "Banana", "Cherry"):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {"page_size": 2})
+        names = [item["name"] for item in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        names.extend(item["name"] for item in res.data["results"])
+
+        self.assertEqual(names, ["Cherry", "Banana", "Apple"])
+        self.assertIsNone(res.data["next"])
+
+    def test_tags_sparse_fields(self):
+        """Test ?fields= limits the keys rendered for tags"""
+        Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.client.get(TAGS_URL, {"fields": "name"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [{"name": "Vegan"}])
+
+    def test_bulk_create_tags(self):
+        """Test creating several tags at once"""
+        payload = [{"name": "Vegan"}, {"name": "Dessert"}]
+
+        res = self.client.post(
+            reverse("recipe:tag-bulk"), payload, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        names = Tag.objects.filter(user=self.user).values_list(
+            "name", flat=True
+        )
+        self.assertEqual(sorted(names), ["Dessert", "Vegan"])
+
+    def test_bulk_rename_reindexes_recipes(self):
+        """Test renaming tags in bulk reindexes their recipes"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5.00
+        )
+        recipe.tags.add(tag)
+        Recipe.objects.create(
+            user=self.user, title="Steak", time_minutes=10, price=5.00
+        )
+
+        with mock.patch("recipe.views.update_search_vectors") as update:
+            res = self.client.patch(
+                reverse("recipe:tag-bulk"),
+                [{"id": tag.id, "name": "Plant based"}],
+                format="json",
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        (queryset,), _ = update.call_args
+        self.assertEqual(list(queryset), [recipe])
@@ -9,6 +9,10 @@ router = DefaultRouter()
 router.register("tags", views.TagViewSet)
 router.register("ingredients", views.IngredientViewSet)
 router.register("recipes", views.RecipeViewSet)
+router.register(
+    "image-jobs", views.RecipeImageJobViewSet, basename="image-job"
+)
+router.register("stats", views.RecipeStatsViewSet, basename="stats")
 
 app_name = "recipe"
 urlpatterns = [path("", include(router.urls))]
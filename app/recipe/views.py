@@ -1,39 +1,249 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import IntegerField
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status, filters
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 
-from core.models import Tag, Ingredient, Recipe
+from core.models import Tag, Ingredient, Recipe, RecipeImageJob
 
 from recipe import serializers
+from recipe.cache import CachedResponseMixin
+from recipe.export import EXPORT_FIELDS, RELATED_FIELDS, export_rows
+from recipe.fastpath import recipe_rows, render_recipes
+from recipe.images import save_pending_upload
+from recipe.names import RECIPE_FIELDS, upsert_names
+from recipe.search import search_recipes, update_search_vectors
+from recipe.stats import get_recipe_stats
+from recipe.suggest import suggestion_cache
+from recipe.pagination import (
+    RankedSearchPagination,
+    RecipeAttrCursorPagination,
+    RecipeCursorPagination,
+)
+from recipe.renderers import CSVRenderer, NDJSONRenderer
+
+
+# Column of the M2M through table pointing at the related object
+RELATED_FILTER_COLUMNS = {"tags": "tag_id", "ingredients": "ingredient_id"}
+
+
+class BulkModelMixin:
+    """Create, update or delete a list of objects in one transaction
+
+    POST takes a list of objects, PATCH a list of partial objects with
+    their ``id`` and DELETE ``{"ids": [...]}``. Nothing is written unless
+    every item is valid; errors are reported per item, in input order.
+    """
+
+    bulk_max_items = 1000
+
+    @action(methods=["POST", "PATCH", "DELETE"], detail=False, url_path="bulk")
+    def bulk(self, request):
+        """Bulk create, update or delete objects"""
+        items = (
+            request.data.get("ids")
+            if request.method == "DELETE" and hasattr(request.data, "get")
+            else request.data
+        )
+        if not isinstance(items, list):
+            return Response(
+                {"non_field_errors": ["Expected a list of items."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {
+                    "non_field_errors": [
+                        f"Ensure there are at most {self.bulk_max_items} "
+                        "items."
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            if request.method == "POST":
+                return self.bulk_create(items)
+            elif request.method == "PATCH":
+                return self.bulk_update(items)
+            return self.bulk_destroy(items)
+
+    def _get_bulk_instances(self, ids):
+        """Return the user's objects by id, the parsed ids and per-item
+        id errors"""
+        id_field = IntegerField(min_value=1)
+        pks = []
+        for value in ids:
+            try:
+                pks.append(id_field.run_validation(value))
+            except ValidationError:
+                pks.append(None)
+        instances = self.get_queryset().in_bulk(
+            [pk for pk in pks if pk is not None]
+        )
+        errors = []
+        seen = set()
+        for pk in pks:
+            if pk is None:
+                errors.append({"id": ["Invalid id."]})
+            elif pk in seen:
+                errors.append({"id": ["Duplicate id."]})
+            elif pk not in instances:
+                errors.append({"id": ["Not found."]})
+            else:
+                errors.append({})
+            seen.add(pk)
+        return instances, pks, errors
+
+    def perform_bulk_save(self, serializer, **kwargs):
+        serializer.save(**kwargs)
+
+    def bulk_create(self, items):
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_save(serializer, user=self.request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, items):
+        ids = [
+            item.get("id") if hasattr(item, "get") else None for item in items
+        ]
+        instances, pks, errors = self._get_bulk_instances(ids)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(
+            [instances[pk] for pk in pks], data=items, many=True, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_save(serializer)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def bulk_destroy(self, ids):
+        _, pks, errors = self._get_bulk_instances(ids)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        self.queryset.model.objects.filter(
+            user=self.request.user, id__in=pks
+        ).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class BaseRecipeAttrViewSet(
-    viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin
+    BulkModelMixin,
+    CachedResponseMixin,
+    viewsets.GenericViewSet,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
 ):
     """Base viewset for user owned recipe attributes"""
 
     # authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
+
+    def _filter_assigned(self, queryset):
+        """Keep objects linked to at least one recipe
+
+        Uses a semi-join (EXISTS) on the recipe M2M through table, so
+        objects are never duplicated and no DISTINCT is needed.
+        """
+        links = queryset.model.recipe_set
+        column = links.field.m2m_reverse_field_name()
+        return queryset.filter(
+            Exists(links.through.objects.filter(**{column: OuterRef("pk")}))
+        )
+
+    def _list_params(self):
+        """Return the validated ?assigned_only= and ?with_counts="""
+        if not hasattr(self, "_validated_list_params"):
+            query = serializers.RecipeAttrQuerySerializer(
+                data=self.request.query_params
+            )
+            query.is_valid(raise_exception=True)
+            self._validated_list_params = query.validated_data
+        return self._validated_list_params
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method in SAFE_METHODS:
+            context["with_counts"] = self._list_params()["with_counts"]
+        return context
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
-        assigned_only = bool(
-            int(self.request.query_params.get("assigned_only", 0))
-        )
+        params = self._list_params()
         queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+        if params["assigned_only"]:
+            queryset = self._filter_assigned(queryset)
+        serializer_class = self.get_serializer_class()
+        fields = serializer_class.requested_fields(self.request)
+        if fields is not None:
+            columns = serializer_class.model_columns(fields)
+            if params["with_counts"]:
+                columns.add("recipe_count")
+            queryset = queryset.only(*columns, "name")
 
-        return (
-            queryset.filter(user=self.request.user)
-            .order_by("-name")
-            .distinct()
-        )
+        return queryset.filter(user=self.request.user).order_by("-name")
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_bulk_save(self, serializer, **kwargs):
+        """Bulk renames skip model signals, so reindex linked recipes"""
+        renamed = serializer.instance is not None
+        super().perform_bulk_save(serializer, **kwargs)
+        if renamed:
+            field = RECIPE_FIELDS[self.queryset.model]
+            ids = [obj.pk for obj in serializer.instance]
+            linked = Recipe.objects.filter(**{f"{field}__in": ids})
+            update_search_vectors(
+                Recipe.objects.filter(pk__in=linked.values("pk"))
+            )
+
+    @action(methods=["POST"], detail=False, url_path="upsert")
+    def upsert(self, request):
+        """Get or create objects by name, ignoring case
+
+        Idempotent: returns one object per distinct name, in input order.
+        """
+        serializer = serializers.NameUpsertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = serializer.validated_data["names"]
+        model = self.queryset.model
+        ids = upsert_names(model, request.user, names)
+        objs = model.objects.in_bulk(ids.values())
+        serializer = self.get_serializer(
+            [objs[pk] for pk in dict.fromkeys(ids[name] for name in names)],
+            many=True,
+        )
+        return Response(serializer.data)
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="suggest",
+        serializer_class=serializers.RecipeAttrCountSerializer,
+    )
+    def suggest(self, request):
+        """Return the most used names starting with ?q="""
+        query = serializers.SuggestQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        rows = suggestion_cache.suggest(
+            self.queryset.filter(user=request.user),
+            request.user.pk,
+            query.validated_data["q"],
+            query.validated_data["limit"],
+        )
+        return Response(self.get_serializer(rows, many=True).data)
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     queryset = Tag.objects.all()
@@ -52,33 +262,154 @@ that will always work when you run tests
 """
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    BulkModelMixin, CachedResponseMixin, viewsets.ModelViewSet
+):
     """Manage recipes in the database"""
 
     queryset = Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
     # authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
+    # Search results ranked on Postgres, unless ordered explicitly
+    search_pagination_class = RankedSearchPagination
     filter_backends = [filters.OrderingFilter]
+    # Listed explicitly, so ?fields= does not narrow the valid orderings
+    ordering_fields = ["id", "title", "time_minutes", "price", "link"]
     ordering = ["-id"]
+    # Recipes read per server-side cursor fetch by the export
+    export_chunk_size = 2000
 
     def _parmas_to_ints(self, qs):
         """Convert a list of string IDs to a list of integers"""
         return [int(str_id) for str_id in qs.split(",")]
 
+    def _filter_by_related(self, queryset, field, ids, match):
+        """Filter recipes linked to any/all of the given related ids
+
+        Uses semi-joins (EXISTS) on the M2M through table, so recipes are
+        never duplicated and no DISTINCT is needed.
+        """
+        through = getattr(Recipe, field).through
+        related_column = RELATED_FILTER_COLUMNS[field]
+        links = through.objects.filter(recipe_id=OuterRef("pk"))
+        if match == "all":
+            for related_id in set(ids):
+                queryset = queryset.filter(
+                    Exists(links.filter(**{related_column: related_id}))
+                )
+            return queryset
+
+        return queryset.filter(
+            Exists(links.filter(**{f"{related_column}__in": ids}))
+        )
+
+    def _prefetch_for_action(self, queryset):
+        """Load only the columns and relations the serializer of the
+        current action renders, honouring ?fields= and ?expand="""
+        if self.action not in ("list", "retrieve") or self._use_fast_list():
+            return queryset
+
+        serializer_class = self.get_serializer_class()
+        fields = serializer_class.requested_fields(self.request)
+        expanded = serializer_class.expanded_fields(self.request)
+        if fields is None:
+            fields = serializer_class.Meta.fields
+            queryset = queryset.defer("search_vector")
+        else:
+            queryset = queryset.only(
+                *serializer_class.model_columns(fields),
+                *self._ordering_columns(),
+            )
+
+        for name, model in (("tags", Tag), ("ingredients", Ingredient)):
+            if name not in fields:
+                continue
+            if self.action == "retrieve" or name in expanded:
+                related_fields = ("id", "name")
+            else:
+                related_fields = ("id",)
+            related = model.objects.only(*related_fields).order_by("id")
+            queryset = queryset.prefetch_related(Prefetch(name, related))
+        return queryset
+
+    def _ordering_columns(self):
+        """Return the columns the cursor paginator reads from rows"""
+        ordering = self.request.query_params.get(
+            filters.OrderingFilter.ordering_param, ""
+        )
+        columns = [term.strip().lstrip("-") for term in ordering.split(",")]
+        return [name for name in columns if name in self.ordering_fields]
+
     def get_queryset(self):
         tags = self.request.query_params.get("tags")
         ingredients = self.request.query_params.get("ingredients")
+        query = serializers.RecipeFilterQuerySerializer(
+            data=self.request.query_params
+        )
+        query.is_valid(raise_exception=True)
+        match = query.validated_data["match"]
+        search = self.request.query_params.get("search")
         queryset = self.queryset
+        if search:
+            queryset = search_recipes(queryset, search)
         if tags:
             tag_ids = self._parmas_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_by_related(
+                queryset, "tags", tag_ids, match
+            )
         if ingredients:
             ingredient_ids = self._parmas_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = self._filter_by_related(
+                queryset, "ingredients", ingredient_ids, match
+            )
+
+        queryset = self._prefetch_for_action(queryset)
 
         return queryset.filter(user=self.request.user)
 
+    def _use_fast_list(self):
+        """Whether the list can be rendered by the values() fast path"""
+        return (
+            self.action == "list"
+            and settings.RECIPE_FAST_LIST
+            and not self.serializer_class.expanded_fields(self.request)
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self._use_fast_list():
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(self.fast_list, request, *args, **kwargs)
+
+    def fast_list(self, request, *args, **kwargs):
+        """List recipes from value rows, matching RecipeSerializer output"""
+        # Validates ?fields= and resolves the field set like the serializer
+        fields = tuple(self.get_serializer().fields)
+        rows = recipe_rows(
+            self.filter_queryset(self.get_queryset()),
+            fields,
+            self._ordering_columns(),
+        )
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(
+            render_recipes(page, fields, request)
+        )
+
+    def paginate_queryset(self, queryset):
+        ordering_param = filters.OrderingFilter.ordering_param
+        if (
+            "rank" in queryset.query.annotations
+            and ordering_param not in self.request.query_params
+        ):
+            self._paginator = self.search_pagination_class()
+        return super().paginate_queryset(queryset)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
     def get_serializer_class(self):
         """Return appropriate serializer class by action"""
         if self.action == "retrieve":
@@ -91,14 +422,80 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_bulk_save(self, serializer, **kwargs):
+        """Bulk writes skip model signals, so reindex recipes here"""
+        super().perform_bulk_save(serializer, **kwargs)
+        ids = [recipe.pk for recipe in serializer.instance]
+        update_search_vectors(Recipe.objects.filter(pk__in=ids))
+
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
-        """Upload an image to a recipe"""
+        """Queue an uploaded image for processing and attach it later"""
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            source = save_pending_upload(serializer.validated_data["image"])
+            job = RecipeImageJob.objects.create(recipe=recipe, source=source)
+            data = serializers.RecipeImageJobSerializer(job).data
+            data["status_url"] = request.build_absolute_uri(
+                reverse("recipe:image-job-detail", args=[job.id])
+            )
+            return Response(data, status=status.HTTP_202_ACCEPTED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="export",
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export(self, request):
+        """Stream the user's recipes as NDJSON or CSV (?format=)"""
+        renderer = request.accepted_renderer
+        queryset = self.filter_queryset(self.get_queryset())
+        # Rows are read while streaming, after the request routing ended
+        rows = export_rows(
+            queryset.using(queryset.db), self.export_chunk_size
+        )
+        response = StreamingHttpResponse(
+            renderer.stream(rows, EXPORT_FIELDS + RELATED_FIELDS),
+            content_type=renderer.media_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="recipes.{renderer.format}"'
+        )
+        return response
+
+
+class RecipeImageJobViewSet(
+    viewsets.GenericViewSet, mixins.RetrieveModelMixin
+):
+    """Report the status of recipe image processing jobs"""
+
+    queryset = RecipeImageJob.objects.all()
+    serializer_class = serializers.RecipeImageJobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return self.queryset.filter(recipe__user=self.request.user)
+
+
+class RecipeStatsViewSet(viewsets.GenericViewSet):
+    """Report recipe counts and averages from maintained counters"""
+
+    serializer_class = serializers.RecipeStatsSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def list(self, request):
+        stats = get_recipe_stats(request.user)
+        for field, model in (("tags", Tag), ("ingredients", Ingredient)):
+            setattr(
+                stats,
+                field,
+                model.objects.filter(user=request.user)
+                .order_by("-recipe_count", "name")
+                .values("id", "name", "recipe_count"),
+            )
+        return Response(self.get_serializer(stats).data)
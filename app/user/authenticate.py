@@ -4,6 +4,9 @@ from rest_framework import exceptions
 from rest_framework.authentication import CSRFCheck, TokenAuthentication
 from rest_framework.authentication import get_authorization_header
 
+from core.routers import primary_reads
+from user.cache import token_cache
+
 
 def enforce_csrf(request):
     check = CSRFCheck()
@@ -51,3 +54,14 @@ class CustomAuthentication(TokenAuthentication):
 
         enforce_csrf(request)
         return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, key):
+        """Resolve a token through the lookup cache before the database"""
+        credentials = token_cache.get(key)
+        if credentials is None:
+            # Tokens are read from the primary: a replica lagging behind
+            # a login would reject the new token
+            with primary_reads():
+                credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+        return credentials
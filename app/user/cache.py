@@ -0,0 +1,176 @@
+"""
+Token -> user lookup cache for CustomAuthentication.
+
+Entries live in a per-process TTL/LRU map and, optionally, in a shared
+Django cache so other workers can skip the Token + User query too. With
+a shared tier every invalidation also bumps a shared generation; other
+workers re-read it at most every GENERATION_CHECK_INTERVAL seconds and
+drop their local entries when it changed, which bounds how long a
+revoked token or deactivated user is served from another worker.
+Without a shared tier only the TTL bounds it.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core import metrics
+
+
+GENERATION_KEY = "auth:token:generation"
+
+
+class TokenCache:
+    """Two tier TTL/LRU cache of (user, token) pairs keyed by token"""
+
+    def __init__(
+        self,
+        ttl=60,
+        max_entries=10000,
+        shared_alias=None,
+        generation_check_interval=1,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared_alias = shared_alias
+        self.generation_check_interval = generation_check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._generation_checked = float("-inf")
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        config = settings.AUTH_TOKEN
+        return cls(
+            ttl=config.get("CACHE_TTL", 60),
+            max_entries=config.get("CACHE_MAX_ENTRIES", 10000),
+            shared_alias=config.get("SHARED_CACHE_ALIAS"),
+            generation_check_interval=config.get(
+                "GENERATION_CHECK_INTERVAL", 1
+            ),
+        )
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _shared_key(self, key):
+        return "auth:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+    def _sync_generation(self, now):
+        """Drop the local tier when another worker invalidated a token"""
+        if now - self._generation_checked < self.generation_check_interval:
+            return
+        generation = self.shared.get(GENERATION_KEY, 0)
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+            self._generation = generation
+            self._generation_checked = now
+
+    def get(self, key):
+        """Return the cached (user, token) pair of a token key or None"""
+        now = time.monotonic()
+        if self.shared is not None:
+            self._sync_generation(now)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, credentials = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    # Requests must not share (and mutate) one instance
+                    return copy.deepcopy(credentials)
+                del self._entries[key]
+
+        if self.shared is not None:
+            credentials = self.shared.get(self._shared_key(key))
+            if credentials is not None:
+                self._store(key, credentials, now)
+                with self._lock:
+                    self.shared_hits += 1
+                return copy.deepcopy(credentials)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, credentials):
+        """Cache the (user, token) pair of a token key"""
+        # The caller goes on using (and may mutate) its instance
+        self._store(key, copy.deepcopy(credentials), time.monotonic())
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), credentials, self.ttl)
+
+    def _store(self, key, credentials, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, credentials)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop a token key from both tiers"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+            self.shared.add(GENERATION_KEY, 0, timeout=None)
+            self.shared.incr(GENERATION_KEY)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters; every hit is one saved auth query"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": (
+                    (self.hits + self.shared_hits) / lookups if lookups else 0
+                ),
+            }
+
+
+token_cache = TokenCache.from_settings()
+
+
+def _lookup_samples():
+    stats = token_cache.stats()
+    return [
+        ({"result": result}, stats[counter])
+        for result, counter in (
+            ("hit", "hits"),
+            ("shared_hit", "shared_hits"),
+            ("miss", "misses"),
+        )
+    ]
+
+
+metrics.REGISTRY.callback(
+    "auth_token_cache_lookups_total",
+    "Token cache lookups of this process by result.",
+    "counter",
+    _lookup_samples,
+)
+metrics.REGISTRY.callback(
+    "auth_token_cache_entries",
+    "Tokens in the local tier of the token cache.",
+    "gauge",
+    lambda: [({}, token_cache.stats()["entries"])],
+)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.cache import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Forget a deleted token (also sent for tokens of deleted users)"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Forget the tokens of an updated or deactivated user"""
+    if created:
+        return
+    keys = Token.objects.filter(user_id=instance.pk).values_list(
+        "key", flat=True
+    )
+    for key in keys:
+        token_cache.invalidate(key)
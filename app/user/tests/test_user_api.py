@@ -1,10 +1,15 @@
+from django.core.cache import caches
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core import metrics
+from user.cache import TokenCache, token_cache
+
 
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:login")
@@ -156,3 +161,101 @@ class PrivateUserAPITests(TestCase):
         self.assertEqual(self.user.name, payload["name"])
         self.assertTrue(self.user.check_password(payload["password"]))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class TokenCacheTests(TestCase):
+    """Test the token lookup cache of CustomAuthentication"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user(email="test@test.com", password="testpass")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_repeated_requests_skip_token_query(self):
+        """Test the second request is authenticated from the cache"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        stats = token_cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_deleted_token_invalidated(self):
+        """Test a deleted token is rejected after being cached"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test a deactivated user is rejected after being cached"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_updated_user_invalidated(self):
+        """Test updates to the user are visible on the next request"""
+        self.client.get(ME_URL)
+        self.user.name = "New name"
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data["name"], "New name")
+
+    def test_lookup_metrics_exported(self):
+        """Test hit and miss counters are exposed on the metrics registry"""
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+
+        body = metrics.REGISTRY.render()
+
+        self.assertIn('auth_token_cache_lookups_total{result="hit"} 1', body)
+        self.assertIn(
+            'auth_token_cache_lookups_total{result="miss"} 1', body
+        )
+        self.assertIn("auth_token_cache_entries 1", body)
+
+    def test_invalidation_reaches_other_workers(self):
+        """Test a token invalidated by one process leaves the others"""
+        caches["default"].clear()
+        worker_a = TokenCache(
+            shared_alias="default", generation_check_interval=0
+        )
+        worker_b = TokenCache(
+            shared_alias="default", generation_check_interval=0
+        )
+        worker_a.set("key", ("user", "token"))
+        self.assertEqual(worker_b.get("key"), ("user", "token"))
+
+        worker_a.invalidate("key")
+
+        self.assertIsNone(worker_b.get("key"))
+
+    def test_cached_credentials_never_shared(self):
+        """Test no tier hands out an instance a request may mutate"""
+        caches["default"].clear()
+        worker_a = TokenCache(shared_alias="default")
+        worker_b = TokenCache(shared_alias="default")
+        user = create_user(email="other@test.com", password="testpass")
+        credentials = (user, Token.objects.create(user=user))
+
+        worker_a.set("key", credentials)
+        user.name = "Mutated"
+        from_shared = worker_b.get("key")
+        from_shared[0].name = "Mutated"
+
+        self.assertNotEqual(worker_a.get("key")[0].name, "Mutated")
+        self.assertNotEqual(worker_b.get("key")[0].name, "Mutated")
@@ -5,6 +5,13 @@ server {
         alias /vol/static;
     }
 
+    # recipe images are content-addressed, so their URLs never change
+    location /static/media/uploads/recipe/ {
+        alias /vol/static/media/uploads/recipe/;
+        expires max;
+        add_header Cache-Control "public, immutable";
+    }
+
     location / {
         uwsgi_pass            ${APP_HOST}:${APP_PORT};
         include               /etc/nginx/uwsgi_params;